@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Almacén de resultados por segmentos - Solo anexar, exportaciones en streaming
+
+Cada lote de registros procesados se escribe como un segmento nuevo en una
+carpeta de resultados (segmento_000001.json, segmento_000002.json...). Cada
+segmento guarda los datos por columnas ({"filas": n, "columnas": {nombre:
+[valores]}}) y se escribe en un temporal, con fsync, y se renombra: un corte
+a mitad de ejecución pierde como mucho el lote en curso y nunca deja un
+segmento a medias.
+
+Cada segmento guarda además las claves de sus registros ("claves", las del
+diario de registros). El diario anota el estado final después de anexar el
+segmento, así que un corte entre ambos deja registros almacenados que el
+diario aún ve en curso: al reanudar se saltan también las claves ya
+almacenadas (AlmacenResultados.claves), sin duplicarlos ni volver a
+asignarles números.
+
+El generador ya no guarda todos los registros en memoria hasta el final: los
+JSON, XLSX y CSV RESULT se generan recorriendo los segmentos uno a uno, al
+terminar la ejecución o cuando se pida:
+
+    python3 SCRIPTS/almacen_resultados.py <carpeta_resultados> --json --xlsx \
+        --csv-entrada DATA/archivo.csv
+"""
+
+import argparse
+import json
+import os
+import textwrap
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+
+PREFIJO_SEGMENTO = 'segmento_'
+
+# Columnas de resultado anexadas a las del CSV de entrada en el CSV RESULT
+COLUMNAS_RESULTADO = (
+    'correo_original', 'numero_pasaporte', 'ruta_foto', 'imagen_usada',
+    'pasaporte_visual', 'estado', 'motivo_no_generado',
+)
+COLUMNAS_META = ('meta_total_registros', 'meta_timestamp')
+
+TAMANO_BLOQUE_ENTRADA = 5000  # Filas del CSV de entrada leídas por bloque al exportar
+
+
+class AlmacenResultados:
+    """Resultados de una ejecución como segmentos por columnas en una carpeta"""
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        segmentos = self.segmentos()
+        self._siguiente = int(segmentos[-1].stem[len(PREFIJO_SEGMENTO):]) + 1 if segmentos else 1
+        # Contadores acumulados (incluye segmentos de una ejecución anterior en la misma carpeta)
+        self.total_registros = 0
+        self.generados = 0
+        self.omitidos = 0
+        self.claves = set()  # Claves de registro de todos los segmentos
+        for ruta in self.segmentos():
+            segmento = self._leer(ruta)
+            self._contar(segmento['columnas'], segmento['filas'])
+            self.claves.update(c for c in segmento.get('claves', ()) if c is not None)
+
+    def _contar(self, columnas, filas):
+        self.total_registros += filas
+        estados = columnas.get('estado', [])
+        self.generados += sum(1 for e in estados if e == 'generado')
+        self.omitidos += sum(1 for e in estados if e == 'omitido')
+
+    def segmentos(self):
+        return sorted(self.directorio.glob(f'{PREFIJO_SEGMENTO}*.json'))
+
+    def anexar(self, registros, claves=None):
+        """Escribe un lote de registros (dicts) como un segmento nuevo
+
+        `claves` (una por registro, None si no tiene) quedan en el segmento para
+        reconocer los registros ya almacenados al reanudar.
+        """
+        if not registros:
+            return None
+        nombres = list(dict.fromkeys(clave for r in registros for clave in r))
+        columnas = {nombre: [r.get(nombre) for r in registros] for nombre in nombres}
+        segmento = {'filas': len(registros), 'columnas': columnas}
+        if claves is not None:
+            segmento['claves'] = list(claves)
+
+        ruta = self.directorio / f'{PREFIJO_SEGMENTO}{self._siguiente:06d}.json'
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(segmento, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+        self._siguiente += 1
+        self._contar(columnas, len(registros))
+        if claves is not None:
+            self.claves.update(c for c in claves if c is not None)
+        return ruta
+
+    @staticmethod
+    def _leer(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def iterar_segmentos(self):
+        """(columnas, filas) de cada segmento, en orden de escritura"""
+        for ruta in self.segmentos():
+            segmento = self._leer(ruta)
+            yield segmento['columnas'], segmento['filas']
+
+    def iterar_registros(self):
+        for columnas, filas in self.iterar_segmentos():
+            nombres = list(columnas)
+            for i in range(filas):
+                yield {nombre: columnas[nombre][i] for nombre in nombres}
+
+    def iterar_dataframes(self):
+        for columnas, _filas in self.iterar_segmentos():
+            yield pd.DataFrame(columnas)
+
+    def columnas(self):
+        """Unión de columnas de todos los segmentos, en orden de aparición"""
+        nombres = {}
+        for columnas, _filas in self.iterar_segmentos():
+            nombres.update(dict.fromkeys(columnas))
+        return list(nombres)
+
+    def exportar_json(self, ruta):
+        """Lista JSON (indent=2) con todos los registros, escrita registro a registro"""
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for i, registro in enumerate(self.iterar_registros()):
+                texto = json.dumps(registro, ensure_ascii=False, indent=2, default=str)
+                f.write((',\n' if i else '\n') + textwrap.indent(texto, '  '))
+            f.write('\n]' if self.total_registros else ']')
+        return ruta
+
+    def exportar_xlsx(self, ruta):
+        """Excel con una fila por registro, con openpyxl en modo write_only"""
+        if Workbook is None:
+            raise RuntimeError("openpyxl no está instalado")
+        nombres = self.columnas()
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet()
+        hoja.append(nombres)
+        for columnas, filas in self.iterar_segmentos():
+            valores = [columnas.get(nombre, [None] * filas) for nombre in nombres]
+            for fila in zip(*valores):
+                hoja.append(list(fila))
+        libro.save(ruta)
+        return ruta
+
+    def _bloques_resultado(self):
+        """DataFrames con solo COLUMNAS_RESULTADO (texto, vacío si falta), segmento a segmento"""
+        for columnas, filas in self.iterar_segmentos():
+            df = pd.DataFrame({
+                c: ['' if v is None else str(v) for v in columnas.get(c, [None] * filas)]
+                for c in COLUMNAS_RESULTADO
+            })
+            if 'estado' not in columnas:
+                df['estado'] = ['generado' if v else 'omitido' for v in df['pasaporte_visual']]
+            yield df
+
+    def exportar_resultado_csv(self, ruta, timestamp, csv_entrada=None, df_entrada=None):
+        """CSV RESULT: filas de entrada + COLUMNAS_RESULTADO, con fila meta al inicio
+
+        La entrada se lee por bloques (`csv_entrada`) o se toma de `df_entrada`, y se
+        empareja por posición con los resultados, como el concat por columnas anterior.
+        """
+        if df_entrada is not None:
+            total_entrada = len(df_entrada)
+            bloques_entrada = (df_entrada.iloc[i:i + TAMANO_BLOQUE_ENTRADA]
+                               for i in range(0, total_entrada, TAMANO_BLOQUE_ENTRADA))
+            columnas_entrada = list(df_entrada.columns)
+        else:
+            columnas_entrada = list(pd.read_csv(csv_entrada, dtype=str, keep_default_na=False, nrows=0).columns)
+            total_entrada = sum(len(b) for b in pd.read_csv(
+                csv_entrada, dtype=str, keep_default_na=False, usecols=[0], chunksize=TAMANO_BLOQUE_ENTRADA
+            ))
+            bloques_entrada = pd.read_csv(
+                csv_entrada, dtype=str, keep_default_na=False, chunksize=TAMANO_BLOQUE_ENTRADA
+            )
+
+        nombres = columnas_entrada + [c for c in COLUMNAS_RESULTADO if c not in columnas_entrada]
+        nombres += [c for c in COLUMNAS_META if c not in nombres]
+        total = max(total_entrada, self.total_registros)
+
+        meta = {c: '' for c in nombres}
+        meta['meta_total_registros'] = str(total)
+        meta['meta_timestamp'] = timestamp
+        pd.DataFrame([meta], columns=nombres).to_csv(ruta, index=False, encoding='utf-8')
+
+        entrada = _Emparejador(bloques_entrada, columnas_entrada)
+        resultados = _Emparejador(self._bloques_resultado(), list(COLUMNAS_RESULTADO))
+        escritas = 0
+        while escritas < total:
+            n = min(TAMANO_BLOQUE_ENTRADA, total - escritas)
+            parte_entrada = entrada.tomar(n)
+            parte_resultado = resultados.tomar(n)
+            # Columnas de resultado que ya existían en la entrada quedan duplicadas como en el concat
+            bloque = pd.concat([parte_entrada, parte_resultado], axis=1)
+            for c in COLUMNAS_META:
+                if c not in bloque.columns:
+                    bloque[c] = ''
+            bloque.to_csv(ruta, index=False, header=False, encoding='utf-8', mode='a')
+            escritas += n
+        return ruta
+
+
+class _Emparejador:
+    """Entrega exactamente n filas por llamada a partir de un iterador de DataFrames
+    (rellenando con '' cuando se agota)"""
+
+    def __init__(self, bloques, columnas):
+        self._bloques = iter(bloques)
+        self._columnas = columnas
+        self._pendiente = pd.DataFrame(columns=columnas)
+
+    def tomar(self, n):
+        partes = []
+        faltan = n
+        while faltan > 0:
+            if self._pendiente.empty:
+                siguiente = next(self._bloques, None)
+                if siguiente is None:
+                    partes.append(pd.DataFrame('', index=range(faltan), columns=self._columnas))
+                    break
+                self._pendiente = siguiente
+            parte = self._pendiente.iloc[:faltan]
+            self._pendiente = self._pendiente.iloc[faltan:]
+            partes.append(parte)
+            faltan -= len(parte)
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=self._columnas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta una carpeta de resultados por segmentos")
+    parser.add_argument("carpeta", help="Carpeta con los segmento_*.json")
+    parser.add_argument("--json", action="store_true", help="Exportar JSON")
+    parser.add_argument("--xlsx", action="store_true", help="Exportar Excel")
+    parser.add_argument("--csv-entrada", help="CSV de entrada para generar el CSV RESULT")
+    args = parser.parse_args()
+
+    almacen = AlmacenResultados(args.carpeta)
+    print(f" {almacen.total_registros} registros en {len(almacen.segmentos())} segmentos "
+          f"({almacen.generados} generados, {almacen.omitidos} omitidos)")
+    nombre = almacen.directorio.name
+    if args.json:
+        print(f" JSON: {almacen.exportar_json(almacen.directorio.parent / f'{nombre}.json')}")
+    if args.xlsx:
+        print(f" Excel: {almacen.exportar_xlsx(almacen.directorio.parent / f'{nombre}.xlsx')}")
+    if args.csv_entrada:
+        ruta = almacen.directorio.parent / f"{Path(args.csv_entrada).stem}_RESULT_{nombre}.csv"
+        print(f" CSV RESULT: {almacen.exportar_resultado_csv(ruta, nombre, csv_entrada=args.csv_entrada)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Asignador Único - Números sin colisiones entre registros, procesos y ejecuciones
+
+Recorre el rango [mínimo, máximo] en el orden de una permutación pseudoaleatoria
+con clave (red de Feistel sobre la potencia de 4 inmediatamente superior, con
+cycle-walking para quedarse dentro del rango). El i-ésimo número entregado es
+minimo + P(i), y como P es biyectiva dos índices distintos nunca dan el mismo
+número.
+
+Estado persistente (JSON en OUTPUT/logs): solo la clave y el cursor, es decir,
+O(1) en memoria y disco sin importar cuántos números se hayan entregado. Cada
+proceso reserva bloques de índices con el archivo bloqueado (fcntl/msvcrt), así
+que varios workers y ejecuciones reanudadas comparten el mismo rango sin repetir.
+Los índices de un bloque reservado y no usado (p. ej. al cortar la ejecución) se
+pierden, pero nunca se reutilizan.
+"""
+
+import json
+import os
+import secrets
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from sintesis_campos import GAMMA_SPLITMIX, splitmix64
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+RONDAS_FEISTEL = 6
+TAMANO_BLOQUE = 1000  # Índices reservados por acceso al archivo de estado
+
+
+class PermutacionFeistel:
+    """Permutación biyectiva con clave de [0, tamano)"""
+
+    def __init__(self, tamano, clave, rondas=RONDAS_FEISTEL):
+        if tamano < 1:
+            raise ValueError("El rango de la permutación debe tener al menos un elemento")
+        self.tamano = int(tamano)
+        bits = max(2, int(self.tamano - 1).bit_length())
+        self.medio = (bits + 1) // 2  # bits de cada mitad (dominio 4^medio >= tamano)
+        self.mascara = np.uint64((1 << self.medio) - 1)
+        base = np.uint64(int(clave) & 0xFFFFFFFFFFFFFFFF)
+        with np.errstate(over='ignore'):
+            self.subclaves = [splitmix64(base + np.uint64(i + 1) * GAMMA_SPLITMIX) for i in range(rondas)]
+
+    def _feistel(self, x):
+        medio = np.uint64(self.medio)
+        izquierda = x >> medio
+        derecha = x & self.mascara
+        for subclave in self.subclaves:
+            izquierda, derecha = derecha, izquierda ^ (splitmix64(derecha ^ subclave) & self.mascara)
+        return (izquierda << medio) | derecha
+
+    def permutar(self, indices):
+        """P(i) para un array de índices en [0, tamano)"""
+        x = self._feistel(np.asarray(indices, dtype=np.uint64))
+        # Cycle-walking: reaplicar sobre los que caen fuera del rango (media < 4 vueltas)
+        fuera = x >= np.uint64(self.tamano)
+        while fuera.any():
+            x[fuera] = self._feistel(x[fuera])
+            fuera = x >= np.uint64(self.tamano)
+        return x.astype(np.int64)
+
+
+class AsignadorUnico:
+    """Entrega números únicos de [minimo, maximo] con estado clave + cursor en disco"""
+
+    def __init__(self, ruta_estado, minimo, maximo, tamano_bloque=TAMANO_BLOQUE):
+        self.ruta_estado = Path(ruta_estado)
+        self.ruta_lock = self.ruta_estado.with_name(self.ruta_estado.name + '.lock')
+        self.minimo = int(minimo)
+        self.maximo = int(maximo)
+        self.tamano_bloque = tamano_bloque
+        self._permutacion = None
+        self._pendientes = []  # rangos [inicio, fin) de índices ya reservados por este proceso
+        self._lock = threading.Lock()
+
+    @property
+    def tamano(self):
+        return self.maximo - self.minimo + 1
+
+    def _bloquear(self, f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _desbloquear(self, f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _leer_estado(self):
+        if not self.ruta_estado.exists():
+            return {'clave': secrets.randbits(64), 'cursor': 0, 'minimo': self.minimo, 'maximo': self.maximo}
+        with open(self.ruta_estado, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        if (estado.get('minimo'), estado.get('maximo')) != (self.minimo, self.maximo):
+            raise ValueError(
+                f"{self.ruta_estado.name} corresponde al rango {estado.get('minimo')}-{estado.get('maximo')}, "
+                f"no a {self.minimo}-{self.maximo}"
+            )
+        return estado
+
+    def _escribir_estado(self, estado):
+        temporal = self.ruta_estado.with_name(self.ruta_estado.name + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta_estado)
+
+    def _reservar_indices(self, cantidad):
+        """Avanza el cursor compartido `cantidad` posiciones y devuelve el rango reservado"""
+        self.ruta_estado.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.ruta_lock, 'a+') as lock:
+            self._bloquear(lock)
+            try:
+                estado = self._leer_estado()
+                inicio = int(estado['cursor'])
+                if inicio + cantidad > self.tamano:
+                    raise RuntimeError(
+                        f"Rango {self.minimo}-{self.maximo} agotado: quedan {self.tamano - inicio} números"
+                    )
+                estado['cursor'] = inicio + cantidad
+                self._escribir_estado(estado)
+            finally:
+                self._desbloquear(lock)
+        if self._permutacion is None:
+            self._permutacion = PermutacionFeistel(self.tamano, estado['clave'])
+        return inicio, inicio + cantidad
+
+    def reservar(self, cantidad):
+        """Devuelve un array con `cantidad` números únicos"""
+        cantidad = int(cantidad)
+        if cantidad <= 0:
+            return np.empty(0, dtype=np.int64)
+        with self._lock:
+            disponibles = sum(fin - inicio for inicio, fin in self._pendientes)
+            if disponibles < cantidad:
+                faltan = cantidad - disponibles
+                self._pendientes.append(self._reservar_indices(max(faltan, self.tamano_bloque)))
+
+            indices = []
+            while cantidad > 0:
+                inicio, fin = self._pendientes[0]
+                tomar = min(cantidad, fin - inicio)
+                indices.append(np.arange(inicio, inicio + tomar, dtype=np.uint64))
+                if inicio + tomar == fin:
+                    self._pendientes.pop(0)
+                else:
+                    self._pendientes[0] = (inicio + tomar, fin)
+                cantidad -= tomar
+            permutacion = self._permutacion
+        return self.minimo + permutacion.permutar(np.concatenate(indices))
+
+    def olvidar_pendientes(self):
+        """Descarta los bloques ya reservados en memoria (en un hijo tras fork son los del padre)"""
+        with self._lock:
+            self._pendientes = []
+
+    def siguiente(self):
+        """Un único número (para generación registro a registro)"""
+        return int(self.reservar(1)[0])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark de colocación de hilos (SCRIPTS/colocacion_hilos.py)
+
+Mide registros/s y p95 de latencia del render concurrente para varias
+disposiciones de hilos:
+- hilos de render (--hilos 1,2,4)
+- afinidad: cada hilo fijado a su bloque de núcleos físicos, o libre
+- hilos nativos por trabajador: los del plan (núcleos / hilos) o todos los
+  núcleos para cada biblioteca (comportamiento anterior, sobresuscrito)
+
+Cada disposición se mide en un subproceso propio: las variables de BLAS/OpenMP
+solo cuentan antes de importar numpy y la sesión de ONNX Runtime fija sus
+hilos al crearse. Las fotos del pool solo se leen.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from colocacion_hilos import (
+    VARIABLES_HILOS_NATIVOS, fijar_entorno_nativo, cpus_disponibles, planificar, limitar_hilos_nativos,
+)
+
+
+def medir(hilos, afinidad, nativos, registros, rondas):
+    """Mide una disposición en este proceso (debe llamarse antes de importar numpy)"""
+    plan = planificar(hilos, afinidad=afinidad)
+    hilos_nativos = plan.hilos_por_trabajador if nativos == 'plan' else len(cpus_disponibles())
+    fijar_entorno_nativo(hilos_nativos)
+
+    from concurrent.futures import ThreadPoolExecutor
+    from script_maestro_integrado import ScriptMaestroIntegrado, silenciar_hilo
+    from verificar_deteccion_proxy import listar_pool, percentil
+    from prueba_estres_render import construir_registros
+
+    base_path = Path(__file__).resolve().parent.parent
+    fotos = listar_pool(base_path)
+    if not fotos:
+        raise RuntimeError(f"No se encontraron fotos en {base_path / 'DATA'}")
+    limitar_hilos_nativos(hilos_nativos)
+    maestro = ScriptMaestroIntegrado(hilos_onnx=hilos_nativos)
+    lote = construir_registros(fotos, registros)
+
+    def renderizar(registro):
+        t0 = time.perf_counter()
+        with silenciar_hilo():
+            maestro.render(registro)
+        return time.perf_counter() - t0
+
+    latencias = []
+    with ThreadPoolExecutor(max_workers=hilos, initializer=plan.inicializador()) as executor:
+        # Calentamiento: un render por hilo (detectores por hilo, fuentes, plantilla)
+        list(executor.map(renderizar, lote[:hilos]))
+        t0 = time.perf_counter()
+        for _ in range(rondas):
+            latencias.extend(executor.map(renderizar, lote))
+        segundos = time.perf_counter() - t0
+
+    return {
+        'hilos': hilos,
+        'afinidad': plan.afinidad,
+        'hilos_nativos': hilos_nativos,
+        'plan': repr(plan),
+        'registros_s': round(len(latencias) / segundos, 3),
+        'p95_s': round(percentil(latencias, 95), 3),
+        'media_s': round(sum(latencias) / len(latencias), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento del render según la disposición de hilos")
+    parser.add_argument("--hilos", default="1,2,4", help="Hilos de render a probar, separados por comas (default: 1,2,4)")
+    parser.add_argument("--registros", type=int, default=24, help="Registros sintéticos por ronda (default: 24)")
+    parser.add_argument("--rondas", type=int, default=2, help="Rondas medidas por disposición (default: 2)")
+    parser.add_argument("--salida", help="Ruta opcional para guardar el reporte JSON")
+    # Modo interno: medir una sola disposición y escribir el resultado JSON en stdout
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--sin-afinidad", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--nativos", choices=("plan", "todos"), default="plan", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        resultado = medir(args.medir, not args.sin_afinidad, args.nativos, args.registros, args.rondas)
+        print(json.dumps(resultado))
+        return 0
+
+    nucleos = len(cpus_disponibles())
+    print(" Benchmark de colocación de hilos")
+    print(f"   CPUs disponibles: {nucleos} | Registros: {args.registros} x {args.rondas} rondas")
+
+    disposiciones = []
+    for hilos in (int(h) for h in args.hilos.split(',') if h.strip()):
+        disposiciones += [
+            (hilos, True, 'plan'),
+            (hilos, False, 'plan'),
+            (hilos, False, 'todos'),
+        ]
+
+    # Sin las variables de hilos del entorno actual: cada subproceso fija las suyas
+    entorno = {k: v for k, v in os.environ.items() if k not in VARIABLES_HILOS_NATIVOS}
+    resultados = []
+    for hilos, afinidad, nativos in disposiciones:
+        comando = [sys.executable, str(Path(__file__).resolve()), "--medir", str(hilos),
+                   "--nativos", nativos, "--registros", str(args.registros), "--rondas", str(args.rondas)]
+        if not afinidad:
+            comando.append("--sin-afinidad")
+        proceso = subprocess.run(comando, capture_output=True, text=True, env=entorno)
+        ultima = proceso.stdout.strip().splitlines()[-1:] if proceso.stdout else []
+        try:
+            resultado = json.loads(ultima[0])
+        except (IndexError, ValueError):
+            print(f"   ️ {hilos} hilos, afinidad {afinidad}, nativos {nativos}: falló "
+                  f"({proceso.stderr.strip().splitlines()[-1:] or 'sin salida'})")
+            continue
+        resultados.append(resultado)
+        print(f"   {hilos} hilos | afinidad {'sí' if resultado['afinidad'] else 'no'} | "
+              f"{resultado['hilos_nativos']:>2} nativos: {resultado['registros_s']:.2f} reg/s, "
+              f"p95 {resultado['p95_s']:.2f}s")
+
+    if not resultados:
+        print(" No se pudo medir ninguna disposición")
+        return 1
+    mejor = max(resultados, key=lambda r: r['registros_s'])
+    print(f"\n Mejor disposición: {mejor['hilos']} hilos, afinidad {'sí' if mejor['afinidad'] else 'no'}, "
+          f"{mejor['hilos_nativos']} hilos nativos ({mejor['registros_s']:.2f} reg/s)")
+    print(f"   {mejor['plan']}")
+
+    if args.salida:
+        reporte = {'cpus': nucleos, 'resultados': resultados, 'mejor': mejor}
+        Path(args.salida).write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f" Reporte guardado en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
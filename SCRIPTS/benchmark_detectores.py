@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark de backends de detección de cara (SCRIPTS/detectores_cara.py)
+
+Mide sobre el pool de fotos (DATA/Imagenes_Mujeres, DATA/Imagenes_Hombres):
+- latencia media y p95 por backend
+- tasa de detección
+- concordancia con Face Mesh (referencia): error del centro de ojos y del ancho
+  de cara, ambos como fracción del ancho de cara de referencia
+
+Para cada backend sugiere el factor de ancho que lo alinea con Face Mesh
+(mediana de ancho_referencia / medida_nativa) y recomienda como backend por
+defecto el más rápido que cumple la tolerancia con ese factor.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from detectores_cara import backends_disponibles, obtener_detector
+from verificar_deteccion_proxy import listar_pool, percentil
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y concordancia de los backends de detección de cara")
+    parser.add_argument("--limite", type=int, default=100, help="Máximo de fotos del pool a evaluar (default: 100)")
+    parser.add_argument("--lado-max-proxy", type=int, default=0,
+                        help="Lado máximo del proxy de detección (0 = resolución completa)")
+    parser.add_argument("--tolerancia", type=float, default=0.05,
+                        help="Error p95 máximo aceptable como fracción del ancho de cara (default: 0.05)")
+    parser.add_argument("--salida", help="Ruta opcional para guardar el reporte JSON")
+    args = parser.parse_args()
+
+    base_path = Path(__file__).resolve().parent.parent
+    fotos = listar_pool(base_path, args.limite)
+    if not fotos:
+        print(f" No se encontraron fotos en {base_path / 'DATA'}")
+        return 1
+
+    backends = backends_disponibles()
+    print(" Benchmark de detectores de cara")
+    print(f"   Fotos: {len(fotos)} | Backends: {backends} | Proxy: {args.lado_max_proxy or 'completo'}")
+
+    imagenes = []
+    for ruta in fotos:
+        try:
+            with Image.open(ruta) as img:
+                imagenes.append((ruta.name, np.array(img.convert('RGBA'))))
+        except Exception as e:
+            print(f"   ️ No se pudo leer {ruta.name}: {e}")
+    if not imagenes:
+        print(" No se pudo leer ninguna foto del pool")
+        return 1
+
+    # Detecciones por backend (la primera llamada crea la instancia; se excluye del tiempo)
+    detecciones = {}
+    tiempos = {}
+    for backend in backends:
+        detector = obtener_detector(backend)
+        detector.detectar(imagenes[0][1], args.lado_max_proxy)
+        detecciones[backend] = {}
+        tiempos[backend] = []
+        for nombre, arr in imagenes:
+            t0 = time.perf_counter()
+            detecciones[backend][nombre] = detector.detectar(arr, args.lado_max_proxy)
+            tiempos[backend].append(time.perf_counter() - t0)
+
+    referencia = detecciones.get('face_mesh')
+    resultados = []
+    for backend in backends:
+        detector = obtener_detector(backend)
+        errores_centro = []
+        razones_ancho = []
+        for nombre, _ in imagenes:
+            geometria = detecciones[backend][nombre]
+            ref = referencia.get(nombre) if referencia else None
+            if geometria is None or ref is None:
+                continue
+            dx = geometria['centro_ojos'][0] - ref['centro_ojos'][0]
+            dy = geometria['centro_ojos'][1] - ref['centro_ojos'][1]
+            errores_centro.append(float(np.hypot(dx, dy)) / ref['ancho_cara'])
+            razones_ancho.append(ref['ancho_cara'] / geometria['ancho_cara'])
+
+        # Factor sugerido y error de ancho residual una vez aplicado
+        ajuste = statistics.median(razones_ancho) if razones_ancho else 1.0
+        factor_sugerido = detector.factor_ancho * ajuste
+        errores_ancho = [abs(r / ajuste - 1.0) for r in razones_ancho]
+
+        detectadas = sum(1 for g in detecciones[backend].values() if g is not None)
+        resultados.append({
+            'backend': backend,
+            'latencia_ms': statistics.mean(tiempos[backend]) * 1000,
+            'latencia_p95_ms': percentil(tiempos[backend], 95) * 1000,
+            'tasa_deteccion': detectadas / len(imagenes),
+            'error_centro_p95': percentil(errores_centro, 95),
+            'error_ancho_p95': percentil(errores_ancho, 95),
+            'factor_actual': detector.factor_ancho,
+            'factor_sugerido': round(factor_sugerido, 3),
+        })
+
+    print("\n backend               lat(ms)  p95(ms)  detección  err_centro_p95  err_ancho_p95  factor")
+    for r in resultados:
+        print(f" {r['backend']:20s}  {r['latencia_ms']:7.1f}  {r['latencia_p95_ms']:7.1f}  "
+              f"{r['tasa_deteccion']:9.1%}  {r['error_centro_p95']:14.4f}  {r['error_ancho_p95']:13.4f}  "
+              f"{r['factor_actual']:.2f} → {r['factor_sugerido']:.3f}")
+
+    tasa_ref = max((r['tasa_deteccion'] for r in resultados if r['backend'] == 'face_mesh'), default=0.0)
+    aceptables = [
+        r for r in resultados
+        if r['tasa_deteccion'] >= tasa_ref
+        and not np.isnan(r['error_centro_p95']) and r['error_centro_p95'] <= args.tolerancia
+        and not np.isnan(r['error_ancho_p95']) and r['error_ancho_p95'] <= args.tolerancia
+    ]
+    recomendado = min(aceptables, key=lambda r: r['latencia_ms']) if aceptables else None
+    if recomendado:
+        sugerencia = {
+            'deteccion_rostro': {
+                'backend': recomendado['backend'],
+                'factores_ancho': {r['backend']: r['factor_sugerido'] for r in resultados},
+            }
+        }
+        print(f"\n Backend recomendado: {recomendado['backend']} ({recomendado['latencia_ms']:.1f} ms)")
+        print(json.dumps(sugerencia, indent=2))
+    else:
+        print("\n️ Ningún backend cumple la tolerancia; mantener face_mesh")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({'fotos': len(imagenes), 'tolerancia': args.tolerancia,
+                       'resultados': resultados, 'recomendado': recomendado}, f, indent=2, ensure_ascii=False)
+        print(f" Reporte guardado: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -82,14 +82,11 @@ def main():
     resultado, t_refinar = medir(maestro.refinar_contorno, img_sin_fondo, repeticiones=3)
     img_refinada = resultado
 
-    resultado, t_det = medir(maestro.detectar_cara_y_escalar, img_refinada, repeticiones=3)
-    img_proc = resultado
-
-    # Recortar al contenedor configurado
+    # Detectar cara + colocar en el contenedor configurado (un solo remuestreo)
     foto_config = maestro.config['field_mapping'].get('ruta_foto', {})
     target_w = foto_config.get('size', {}).get('width', 350)
     target_h = foto_config.get('size', {}).get('height', 450)
-    resultado, t_rec = medir(maestro.recortar_imagen_por_contenedor, img_proc, target_w, target_h, repeticiones=3)
+    resultado, t_rec = medir(maestro.recortar_imagen_por_contenedor, img_refinada, target_w, target_h, repeticiones=3)
     img_rec = resultado
 
     resultado, t_fx = medir(maestro.aplicar_efectos_imagen, img_rec, repeticiones=3)
@@ -100,13 +97,16 @@ def main():
     print("\n⏱️ Tiempos por etapa (promedio de 3):")
     print(resumen("remover_fondo_rembg", t_rembg))
     print(resumen("refinar_contorno", t_refinar))
-    print(resumen("detectar_cara_y_escalar", t_det))
-    print(resumen("recortar_imagen", t_rec))
+    print(resumen("detectar+colocar_imagen", t_rec))
     print(resumen("aplicar_efectos", t_fx))
 
     # Medir end-to-end generación de un pasaporte
     resultado, t_full = medir(maestro.generar_gafete_integrado, ruta_foto, repeticiones=3)
     print(resumen("E2E generar_gafete", t_full))
+    copias = maestro.ultimo_resumen_copias or {}
+    print(f"Copias de buffer por pasaporte: {copias.get('copias', 0)} ({copias.get('mb_copiados', 0):.2f} MB)")
+    for etapa, nbytes in copias.get('detalle', {}).items():
+        print(f"   {etapa:24s} {bytes_a_mb(nbytes):8.2f} MB")
 
     # Memoria
     proceso = psutil.Process()
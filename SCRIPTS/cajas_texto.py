@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Cajas de tinta de los campos de texto - ¿Se puede componer el pasaporte por capas?
+
+El render por capas pega la capa de foto sobre la capa de texto (plantilla +
+textos). Da el mismo resultado que el orden original (foto primero, textos
+encima) solo si ningún texto puede dibujar tinta dentro del contenedor de la
+foto. La caja de tinta de cada campo sale de las métricas reales de su fuente
+y de cómo lo dibuja ScriptMaestroIntegrado:
+
+- texto horizontal (insertar_texto_*, nombre, TIPO, PAÍS, code, MRZ): desde
+  el punto de anclaje hacia la derecha, con el alto de los glifos posibles
+  (getbbox de cada carácter), el grosor de simular_negritas y, si lo hay, el
+  padding del difuminado. El ancho depende del dato y no se acota: un texto a
+  la izquierda de la foto y a su altura siempre cuenta como solapado
+- fechas con contenedores individuales: un anclaje por elemento y separador
+- números verticales rotados: el peor número del asignador (DIGITOS_PASAPORTE
+  cifras) medido con su fuente, escala y espaciado
+- firma: el rectángulo del campo (insertar_firma_texto la escala y la fija
+  dentro de él)
+
+Uso: python SCRIPTS/cajas_texto.py comprueba CONFIG/config.json y termina con
+código 1 si algún campo invade la foto (el render por capas quedaría
+desactivado).
+"""
+
+import json
+import math
+import string
+import sys
+from pathlib import Path
+
+from PIL import ImageFont
+
+
+# Caracteres que pueden llegar a un campo de texto (datos en mayúsculas, fechas, MRZ)
+CARACTERES_TEXTO = string.ascii_letters + string.digits + 'ÁÉÍÓÚÑÜáéíóúñü<-/.,'
+# Cifras de los números de pasaporte del asignador (100000000..199999999)
+DIGITOS_PASAPORTE = 9
+# Posición por defecto de cada elemento de una fecha (insertar_fecha_con_contenedores_individuales)
+ELEMENTOS_FECHA = {'dia': 0, 'mes_es': 33, 'mes_en': 76, 'año': 119}
+# Desplazamiento del texto dentro de su capa temporal (insertar_code_negritas)
+DESPLAZAMIENTO_CODE = (6, 10)
+
+
+def _grosor(thickness):
+    """Píxeles que simular_negritas añade antes y después del glifo"""
+    t = int(thickness or 0)
+    return -((-t) // 2), t // 2
+
+
+def _extension(font, caracteres=CARACTERES_TEXTO):
+    """(izquierda, arriba, abajo) de la tinta de un texto con esos caracteres dibujado en (0, 0)"""
+    cajas = [font.getbbox(c) for c in caracteres]
+    return min(c[0] for c in cajas), min(c[1] for c in cajas), max(c[3] for c in cajas)
+
+
+def _fuente_campo(campo, config, obtener_fuente, por_defecto='Arial'):
+    nombre_fuente = config.get('fonts', {}).get('font_mapping', {}).get(campo.get('layer_name'), por_defecto)
+    tamano = campo.get('render_size_pt', campo.get('font_size', 12))
+    return obtener_fuente(nombre_fuente, tamano)
+
+
+def _caja_horizontal(font, ax, ay, campo, nombre):
+    """Caja de tinta de un texto horizontal anclado en (ax, ay)"""
+    izquierda, arriba, abajo = _extension(font)
+    if nombre == 'code':
+        ax, ay = ax + DESPLAZAMIENTO_CODE[0], ay + DESPLAZAMIENTO_CODE[1]
+    if nombre.startswith('codigo_mrz'):
+        antes = despues = 0  # draw.text directo, sin negritas
+    else:
+        antes, despues = _grosor(campo.get('bold_thickness', 0.7))
+    if campo.get('stretch_to_fit'):
+        # Capa redimensionada a fit_width x alto del texto, pegada en el anclaje
+        return ax, ay, ax + campo.get('fit_width', campo['position'].get('ancho', 0)), ay + abajo - arriba
+    escala_y = campo.get('scale_y', 1.0)
+    if campo.get('scale_x', 1.0) != 1.0 or escala_y != 1.0:
+        return ax, ay, math.inf, ay + (abajo - arriba) * escala_y
+    caja = [ax + izquierda - antes, ay + arriba - antes, math.inf, ay + abajo + despues]
+    if campo.get('blur_radius', 0) > 0:
+        # Letras difuminadas pegadas desde (x - padding, y - padding)
+        padding = campo.get('blur_padding', {}).get('normal', 5)
+        caja[0] = min(caja[0], ax - padding)
+        caja[1] = min(caja[1], ay - padding)
+        caja[3] = max(caja[3], ay + abajo - arriba + padding)
+    return tuple(caja)
+
+
+def _caja_fecha(nombre, campo, config, obtener_fuente):
+    """Unión de las cajas de los elementos y separadores de una fecha con contenedores individuales"""
+    pos = campo['position']
+    contenedores = campo.get('contenedores_individuales', {})
+    nombre_fuente = campo.get('font_name', 'Arial')
+    cajas = []
+    for elemento, x_defecto in ELEMENTOS_FECHA.items():
+        cfg = contenedores.get(elemento, {})
+        font = obtener_fuente(nombre_fuente, cfg.get('render_size_pt', cfg.get('font_size', 12)))
+        izquierda, arriba, abajo = _extension(font, string.ascii_letters + string.digits + 'ÁÉÍÓÚÑáéíóúñ')
+        ax = pos['x'] + cfg.get('x', x_defecto) + cfg.get('text_x', 0)
+        ay = pos['y'] + cfg.get('y', 0) + cfg.get('text_y', 0)
+        cajas.append((ax + izquierda, ay + arriba, math.inf, ay + abajo))
+    for i in range(1, len(ELEMENTOS_FECHA)):
+        cfg = contenedores.get(f'separador{i}', {})
+        font = obtener_fuente(nombre_fuente, cfg.get('render_size_pt', cfg.get('font_size', 12)))
+        x1, y1, x2, y2 = font.getbbox('/')
+        ax = pos['x'] + cfg.get('x', 0) + cfg.get('text_x', 0)
+        ay = pos['y'] + cfg.get('y', 0) + cfg.get('text_y', 0)
+        cajas.append((ax + x1, ay + y1, ax + x2, ay + y2))
+    # Fecha sin el formato de 4 partes: texto horizontal normal en la posición del campo
+    cajas.append(_caja_horizontal(_fuente_campo(campo, config, obtener_fuente), pos['x'] + pos.get('offset_x', 0),
+                                  pos['y'] + pos.get('offset_y', 0), campo, nombre))
+    return _union(cajas)
+
+
+def _caja_vertical(campo, config, obtener_fuente):
+    """Caja del número de pasaporte rotado (capa única o letra a letra con espaciado)"""
+    pos = campo['position']
+    font = _fuente_campo(campo, config, obtener_fuente)
+    escala_x, escala_y = campo.get('scale_x', 1.0), campo.get('scale_y', 1.0)
+    ax, ay = pos['x'] + pos.get('offset_x', 0), pos['y'] + pos.get('offset_y', 0)
+    cajas_numero = [font.getbbox(d * DIGITOS_PASAPORTE) for d in string.digits]
+    ancho = max(c[2] - c[0] for c in cajas_numero)
+    alto = max(c[3] - c[1] for c in cajas_numero)
+    # Capa (ancho + 5) x (alto + 5) escalada y rotada 90°: ancho y alto se intercambian
+    cajas = [(ax, ay, ax + (alto + 5) * escala_y, ay + (ancho + 5) * escala_x)]
+    espaciado = campo.get('letter_spacing', 0)
+    if espaciado:
+        cajas_cifra = [font.getbbox(d) for d in string.digits]
+        ancho_cifra = max(c[2] - c[0] for c in cajas_cifra) * escala_x + 10
+        alto_cifra = max(c[3] - c[1] for c in cajas_cifra) * escala_y + 10
+        cajas.append((ax, ay, ax + alto_cifra, ay + DIGITOS_PASAPORTE * (ancho_cifra + max(0, espaciado))))
+    return _union(cajas)
+
+
+def _union(cajas):
+    return (min(c[0] for c in cajas), min(c[1] for c in cajas),
+            max(c[2] for c in cajas), max(c[3] for c in cajas))
+
+
+def caja_tinta(nombre, campo, config, obtener_fuente):
+    """(x1, y1, x2, y2) donde el campo puede dibujar tinta; math.inf en la dirección en que crece el dato"""
+    pos = campo['position']
+    if nombre == 'firma_texto':
+        return pos['x'], pos['y'] - 4, pos['x'] + pos['ancho'], pos['y'] + pos['alto']
+    if campo.get('rotation'):
+        return _caja_vertical(campo, config, obtener_fuente)
+    if 'contenedores_individuales' in campo:
+        return _caja_fecha(nombre, campo, config, obtener_fuente)
+    if nombre.startswith('codigo_mrz'):
+        ax, ay = pos['x'], pos['y']
+        font = _fuente_campo(campo, config, obtener_fuente, 'OCR-B10PitchBT Regular.otf')
+    else:
+        ax, ay = pos['x'] + pos.get('offset_x', 0), pos['y'] + pos.get('offset_y', 0)
+        font = _fuente_campo(campo, config, obtener_fuente)
+    return _caja_horizontal(font, ax, ay, campo, nombre)
+
+
+def caja_foto(config):
+    foto = config.get('field_mapping', {}).get('ruta_foto')
+    if not foto:
+        return None
+    x, y = foto['position']['x'], foto['position']['y']
+    return x, y, x + foto['size']['width'], y + foto['size']['height']
+
+
+def campos_sobre_foto(config, obtener_fuente):
+    """Campos cuya tinta puede caer dentro del contenedor de la foto ([] = capas separables)
+
+    Un campo cuya fuente no se puede cargar cuenta como solapado.
+    """
+    foto = caja_foto(config)
+    if foto is None:
+        return ['ruta_foto']
+    fx, fy, fx2, fy2 = foto
+    solapados = []
+    for nombre, campo in config.get('field_mapping', {}).items():
+        if nombre == 'ruta_foto' or not campo.get('position'):
+            continue
+        try:
+            x, y, x2, y2 = caja_tinta(nombre, campo, config, obtener_fuente)
+        except (AttributeError, OSError, KeyError):
+            solapados.append(nombre)
+            continue
+        if x < fx2 and fx < x2 and y < fy2 and fy < y2:
+            solapados.append(nombre)
+    return solapados
+
+
+def fuentes_proyecto(base_path):
+    """obtener_fuente(nombre, pt) con las fuentes de TEMPLATE/Fuentes_Base (96 DPI, como el script maestro)"""
+    fuentes_dir = Path(base_path) / 'TEMPLATE' / 'Fuentes_Base'
+    cache = {}
+
+    def obtener_fuente(nombre, tamano_pt):
+        clave = (nombre, tamano_pt)
+        if clave not in cache:
+            archivo = 'Arial.ttf' if nombre == 'Arial' else nombre
+            cache[clave] = ImageFont.truetype(str(fuentes_dir / archivo), int(tamano_pt / 72 * 96))
+        return cache[clave]
+
+    return obtener_fuente
+
+
+def cargar_config(base_path):
+    with open(Path(base_path) / 'CONFIG' / 'config.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def comprobar_proyecto(base_path):
+    """campos_sobre_foto de CONFIG/config.json con las fuentes del proyecto"""
+    return campos_sobre_foto(cargar_config(base_path), fuentes_proyecto(base_path))
+
+
+def main():
+    base_path = Path(__file__).resolve().parent.parent
+    config = cargar_config(base_path)
+    obtener_fuente = fuentes_proyecto(base_path)
+    foto = caja_foto(config)
+    print(f" Contenedor de la foto: x {foto[0]}..{foto[2]}, y {foto[1]}..{foto[3]}")
+    for nombre, campo in config.get('field_mapping', {}).items():
+        if nombre == 'ruta_foto' or not campo.get('position'):
+            continue
+        x, y, x2, y2 = caja_tinta(nombre, campo, config, obtener_fuente)
+        print(f"   {nombre}: x {x:g}..{x2:g}, y {y:g}..{y2:g}")
+    solapados = campos_sobre_foto(config, obtener_fuente)
+    if solapados:
+        print(f" Campos sobre la foto: {', '.join(solapados)} (render por capas desactivado)")
+        return 1
+    print(" Ningún campo invade la foto: render por capas disponible")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Colocación de hilos - CPU por trabajador de render y límites de hilos nativos
+
+Con varios hilos de render, cada biblioteca nativa (ONNX Runtime de rembg,
+OpenCV, BLAS de numpy) lanzaba por su cuenta tantos hilos como núcleos y se
+pisaban entre sí. Este módulo (solo biblioteca estándar, importable antes que
+numpy) reparte los núcleos:
+
+- fijar_entorno_nativo(): variables OMP/MKL/OpenBLAS/numexpr para un proceso
+  que aún no ha importado numpy, cv2 u onnxruntime (benchmark_colocacion)
+- planificar(hilos): divide los núcleos físicos disponibles (agrupando los
+  hermanos SMT) en un bloque contiguo por trabajador
+- PlanColocacion.inicializador(): initializer de ThreadPoolExecutor que fija la
+  afinidad de cada hilo a su bloque (en Linux sched_setaffinity es por hilo)
+- hilos_por_trabajador: lo que se pasa a OpenCV, a la sesión de ONNX Runtime y
+  a BLAS (con threadpoolctl) mediante limitar_hilos_nativos, solo cuando hay un
+  plan con varios trabajadores; LimitesNativos.restaurar() devuelve los valores
+  anteriores (nada se fija al importar: quien no reparte núcleos usa todos)
+"""
+
+import itertools
+import os
+import threading
+from pathlib import Path
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+VARIABLES_HILOS_NATIVOS = (
+    'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+)
+
+RUTA_TOPOLOGIA = Path('/sys/devices/system/cpu')
+
+
+def fijar_entorno_nativo(hilos=1, sobrescribir=False):
+    """Límite de hilos de BLAS/OpenMP para las bibliotecas que aún no se han importado
+
+    Sin sobrescribir solo rellena las variables que no estén ya definidas (el
+    entorno del usuario manda). Devuelve {variable: valor anterior o None} de
+    las que cambió, para restaurar_entorno_nativo.
+    """
+    anteriores = {}
+    for variable in VARIABLES_HILOS_NATIVOS:
+        if sobrescribir or variable not in os.environ:
+            anteriores[variable] = os.environ.get(variable)
+            os.environ[variable] = str(hilos)
+    return anteriores
+
+
+def restaurar_entorno_nativo(anteriores):
+    for variable, valor in anteriores.items():
+        if valor is None:
+            os.environ.pop(variable, None)
+        else:
+            os.environ[variable] = valor
+
+
+def cpus_disponibles():
+    """CPUs lógicas que el proceso puede usar (respeta taskset/cgroups en Linux)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def nucleos_fisicos(cpus=None):
+    """CPUs agrupadas por núcleo físico ([[0, 8], [1, 9], ...]); sin topología, un grupo por CPU"""
+    cpus = cpus_disponibles() if cpus is None else list(cpus)
+    grupos = {}
+    for cpu in cpus:
+        topologia = RUTA_TOPOLOGIA / f'cpu{cpu}' / 'topology'
+        try:
+            paquete = int((topologia / 'physical_package_id').read_text())
+            nucleo = int((topologia / 'core_id').read_text())
+        except (OSError, ValueError):
+            paquete, nucleo = 0, cpu
+        grupos.setdefault((paquete, nucleo), []).append(cpu)
+    return [sorted(g) for _clave, g in sorted(grupos.items(), key=lambda item: min(item[1]))]
+
+
+class PlanColocacion:
+    """Bloque de CPUs de cada trabajador y hilos nativos que le corresponden"""
+
+    def __init__(self, trabajadores, afinidad=True):
+        self.trabajadores = [tuple(cpus) for cpus in trabajadores]
+        self.afinidad = afinidad and hasattr(os, 'sched_setaffinity')
+        self.hilos_por_trabajador = max(1, min(len(cpus) for cpus in self.trabajadores))
+        self._siguiente = itertools.count()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        bloques = ' | '.join(','.join(map(str, cpus)) for cpus in self.trabajadores)
+        return (f"PlanColocacion({len(self.trabajadores)} trabajadores x {self.hilos_por_trabajador} hilos; "
+                f"CPUs {bloques}; afinidad {'sí' if self.afinidad else 'no'})")
+
+    def cpus_de(self, indice):
+        return self.trabajadores[indice % len(self.trabajadores)]
+
+    def inicializador(self):
+        """initializer para ThreadPoolExecutor: cada hilo nuevo toma el siguiente bloque"""
+        def inicializar():
+            with self._lock:
+                indice = next(self._siguiente)
+            if self.afinidad:
+                fijar_afinidad(self.cpus_de(indice))
+        return inicializar
+
+
+def planificar(hilos, cpus=None, afinidad=True):
+    """Reparte los núcleos físicos en `hilos` bloques contiguos (hermanos SMT juntos)
+
+    Con más trabajadores que núcleos se reparten CPUs lógicas; con más
+    trabajadores que CPUs, los bloques se comparten en rueda.
+    """
+    hilos = max(1, hilos)
+    nucleos = nucleos_fisicos(cpus)
+    if hilos > len(nucleos):
+        nucleos = [[cpu] for grupo in nucleos for cpu in grupo]
+    if hilos >= len(nucleos):
+        return PlanColocacion([nucleos[i % len(nucleos)] for i in range(hilos)], afinidad)
+    por_trabajador, sobrantes = divmod(len(nucleos), hilos)
+    trabajadores = []
+    inicio = 0
+    for i in range(hilos):
+        fin = inicio + por_trabajador + (1 if i < sobrantes else 0)
+        trabajadores.append([cpu for grupo in nucleos[inicio:fin] for cpu in grupo])
+        inicio = fin
+    return PlanColocacion(trabajadores, afinidad)
+
+
+def fijar_afinidad(cpus):
+    """Fija la afinidad del hilo que llama (en Linux, pid 0 = hilo actual); False si no se puede"""
+    try:
+        os.sched_setaffinity(0, set(cpus))
+        return True
+    except (AttributeError, OSError):
+        return False
+
+
+class LimitesNativos:
+    """Límites de hilos aplicados por limitar_hilos_nativos; restaurar() deja los anteriores"""
+
+    def __init__(self, hilos):
+        self.hilos = hilos
+        self._entorno = {}
+        self._hilos_cv2 = None
+        self._limitador = None
+
+    def aplicar(self):
+        # Entorno: para subprocesos y runtimes OpenMP que aún no se hayan cargado
+        self._entorno = fijar_entorno_nativo(self.hilos, sobrescribir=True)
+        try:
+            import cv2
+            self._hilos_cv2 = cv2.getNumThreads()
+            cv2.setNumThreads(self.hilos)
+        except Exception:
+            self._hilos_cv2 = None
+        if threadpool_limits is not None:
+            try:
+                self._limitador = threadpool_limits(limits=self.hilos)
+            except Exception:
+                self._limitador = None
+        return self
+
+    def restaurar(self):
+        restaurar_entorno_nativo(self._entorno)
+        self._entorno = {}
+        if self._hilos_cv2 is not None:
+            try:
+                import cv2
+                cv2.setNumThreads(self._hilos_cv2)
+            except Exception:
+                pass
+            self._hilos_cv2 = None
+        if self._limitador is not None:
+            self._limitador.restore_original_limits()
+            self._limitador = None
+
+
+def limitar_hilos_nativos(hilos):
+    """Ajusta en caliente OpenCV, BLAS (con threadpoolctl) y el entorno a `hilos` hilos por trabajador
+
+    Devuelve los LimitesNativos aplicados para poder restaurarlos.
+    """
+    return LimitesNativos(hilos).aplicar()
@@ -1,7 +1,9 @@
+import hashlib
+import json
 import os
 import shutil
 import sys
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 import pandas as pd
 
@@ -49,6 +51,11 @@ NOMBRES_ES_DICT = {
     "valentina": "Femenino",
 }
 
+# Caché persistente nombre normalizado → (género, fuente), compartida entre libros
+RUTA_CACHE_GENEROS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, "OUTPUT", "logs", "cache_generos.json"
+)
+
 
 def normalizar_nombre_bruto(nombre_bruto: str) -> str:
     if not isinstance(nombre_bruto, str):
@@ -96,6 +103,70 @@ def inferir_genero_por_nombre(primer_nombre: str, detector: Optional[object]) ->
     return "Desconocido", "sin_coincidencia"
 
 
+def firma_inferencia() -> str:
+    # Cambia si cambia el diccionario o la disponibilidad de unidecode/gender-guesser:
+    # en ese caso la caché guardada deja de ser válida
+    base = json.dumps(
+        [sorted(NOMBRES_ES_DICT.items()), unidecode is not None, gender is not None], ensure_ascii=False
+    )
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def cargar_cache_generos(ruta_cache: str = RUTA_CACHE_GENEROS) -> Dict[str, Tuple[str, str]]:
+    try:
+        with open(ruta_cache, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if datos.get("firma") != firma_inferencia():
+        return {}
+    return {nombre: tuple(valor) for nombre, valor in datos.get("nombres", {}).items()}
+
+
+def guardar_cache_generos(cache: Dict[str, Tuple[str, str]], ruta_cache: str = RUTA_CACHE_GENEROS) -> None:
+    try:
+        os.makedirs(os.path.dirname(ruta_cache), exist_ok=True)
+        temporal = f"{ruta_cache}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"firma": firma_inferencia(), "nombres": cache}, f, ensure_ascii=False)
+        os.replace(temporal, ruta_cache)
+    except OSError as e:
+        print(f"No se pudo guardar la caché de géneros: {e}")
+
+
+def crear_detector() -> Optional[object]:
+    if gender is None:
+        return None
+    try:
+        return gender.Detector(case_sensitive=False)
+    except Exception:
+        return None
+
+
+def inferir_generos(primeros_nombres: pd.Series, cache: Dict[str, Tuple[str, str]]) -> pd.Series:
+    # Infiere una sola vez por nombre distinto (normalizado) y mapea el resultado a todas las filas.
+    # Los nombres nuevos se añaden a `cache`; el detector solo se crea si hace falta.
+    genero_por_nombre = {}
+    pendientes = {}
+    for bruto in primeros_nombres.unique():
+        nombre_norm = normalizar_nombre_bruto(bruto)
+        if nombre_norm in cache:
+            genero_por_nombre[bruto] = cache[nombre_norm][0]
+        else:
+            pendientes.setdefault(nombre_norm, []).append(bruto)
+
+    if pendientes:
+        detector = crear_detector()
+        for nombre_norm, brutos in pendientes.items():
+            # inferir_genero_por_nombre es idempotente sobre un nombre ya normalizado
+            resultado = inferir_genero_por_nombre(nombre_norm, detector)
+            cache[nombre_norm] = resultado
+            for bruto in brutos:
+                genero_por_nombre[bruto] = resultado[0]
+
+    return primeros_nombres.map(genero_por_nombre)
+
+
 def detectar_columnas(df: pd.DataFrame) -> Tuple[Optional[str], Optional[str]]:
     # Se asume: primera columna es género a completar si su nombre sugiere género
     posibles_genero = {"genero", "género", "sexo", "gender"}
@@ -135,7 +206,9 @@ def crear_backup(ruta_xlsx: str) -> Optional[str]:
         return None
 
 
-def procesar_xlsx_en_sitio(ruta_xlsx: str) -> Tuple[int, int]:
+def procesar_xlsx_en_sitio(
+    ruta_xlsx: str, cache: Optional[Dict[str, Tuple[str, str]]] = None
+) -> Tuple[int, int]:
     # Cargar DataFrame (primera hoja por defecto)
     df = pd.read_excel(ruta_xlsx)
 
@@ -147,28 +220,32 @@ def procesar_xlsx_en_sitio(ruta_xlsx: str) -> Tuple[int, int]:
         df.insert(0, "Género", None)
         col_genero = "Género"
 
-    # Inicializar detector si está disponible
-    detector = None
-    if gender is not None:
-        try:
-            detector = gender.Detector(case_sensitive=False)
-        except Exception:
-            detector = None
-
-    completados = 0
-    total_faltantes = 0
+    # Sin caché explícita se usa (y actualiza) la persistente en disco
+    cache_persistente = cache is None
+    if cache_persistente:
+        cache = cargar_cache_generos()
 
     # Completar únicamente faltantes o vacíos
-    for idx, fila in df.iterrows():
-        val_genero = fila.get(col_genero)
-        if pd.isna(val_genero) or (isinstance(val_genero, str) and not val_genero.strip()):
-            total_faltantes += 1
-            nombre_bruto = str(fila.get(col_nombre, ""))
-            primer_nombre = extraer_primer_nombre(nombre_bruto)
-            genero_inferido, _fuente = inferir_genero_por_nombre(primer_nombre, detector)
-            if genero_inferido != "Desconocido":
-                df.at[idx, col_genero] = genero_inferido
-                completados += 1
+    generos = df[col_genero]
+    faltantes = generos.isna() | generos.map(lambda v: isinstance(v, str) and not v.strip())
+    total_faltantes = int(faltantes.sum())
+
+    # Primer nombre calculado una vez por valor distinto de la columna (mismo str() que fila a fila)
+    codigos, valores = pd.factorize(df.loc[faltantes, col_nombre], use_na_sentinel=False)
+    primeros_unicos = pd.Index([extraer_primer_nombre(str(v)) for v in valores], dtype=object)
+    primeros_nombres = pd.Series(primeros_unicos.take(codigos), index=df.index[faltantes.to_numpy()])
+    inferidos = inferir_generos(primeros_nombres, cache)
+    inferidos = inferidos[inferidos != "Desconocido"]
+    completados = len(inferidos)
+
+    # Escritura en bloque (la columna pasa a object si era numérica/vacía)
+    if completados:
+        if df[col_genero].dtype != object:
+            df[col_genero] = df[col_genero].astype(object)
+        df.loc[inferidos.index, col_genero] = inferidos
+
+    if cache_persistente:
+        guardar_cache_generos(cache)
 
     # Guardar de vuelta en el mismo archivo, reemplazando la primera hoja
     # Usamos engine openpyxl para mayor compatibilidad
@@ -200,14 +277,22 @@ def seleccionar_archivo_ui() -> Optional[str]:
 
 def main():
     if len(sys.argv) > 1:
-        ruta = sys.argv[1]
+        rutas = sys.argv[1:]
     else:
-        ruta = seleccionar_archivo_ui()
+        rutas = [seleccionar_archivo_ui()]
 
-    if not ruta:
+    if not rutas[0]:
         print("No se seleccionó archivo.")
         return
 
+    # Varios libros en la misma ejecución comparten la caché en memoria
+    cache = cargar_cache_generos()
+    for ruta in rutas:
+        procesar_ruta(ruta, cache)
+    guardar_cache_generos(cache)
+
+
+def procesar_ruta(ruta: str, cache: Dict[str, Tuple[str, str]]) -> None:
     if not os.path.isfile(ruta):
         print(f"Ruta inválida: {ruta}")
         return
@@ -219,7 +304,7 @@ def main():
         print("No se pudo crear backup (continuando con precaución)...")
 
     try:
-        completados, faltantes = procesar_xlsx_en_sitio(ruta)
+        completados, faltantes = procesar_xlsx_en_sitio(ruta, cache)
         msg = (
             f"Completados {completados} de {faltantes} géneros faltantes. "
             f"Archivo actualizado: {ruta}"
@@ -53,12 +53,12 @@ def main():
     # Importar generador principal y utilidades
     sys.path.append(str(base))
     from generador_pasaportes_masivo import GeneradorPasaportesMasivo
+    from procesador_xlsx import leer_xlsx
 
     generador = GeneradorPasaportesMasivo(str(base))
 
-    # Cargar el XLSX existente
-    df = pd.read_excel(xlsx_path, dtype=str)
-    df = df.fillna("")
+    # Cargar el XLSX existente (lector por bloques en streaming; celdas vacías → "")
+    df = leer_xlsx(xlsx_path)
 
     # Backup de seguridad antes de modificar en sitio
     ts_backup = datetime.now().strftime("%Y%m%d_%H%M%S")
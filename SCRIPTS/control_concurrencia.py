@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Control de concurrencia adaptativo (AIMD) - Registros en vuelo por lote de render
+
+En lugar de fijar el paralelismo al arrancar, el número de registros que se
+despachan a la vez crece mientras el rendimiento mejora y se reduce cuando la
+latencia o la memoria empeoran:
+
+- aumento aditivo (+incremento) si el rendimiento del lote (registros/s) mejora
+  al menos MEJORA_MINIMA respecto al mejor visto con menos registros en vuelo
+- reducción multiplicativa (x factor) si el p95 de latencia por registro pasa de
+  TOLERANCIA_P95 veces el mejor p95 observado, si el rendimiento cae más de
+  CAIDA_MAXIMA sin haber cambiado el nivel o si el gobernador de memoria pide
+  contener o reciclar
+- retroceso de un paso si con este nivel se rinde menos que con uno inferior;
+  ese nivel queda como techo hasta la siguiente reducción multiplicativa
+- se mantiene en otro caso (meseta: más registros en vuelo no rinden más)
+
+Cada decisión se anota en un JSONL (OUTPUT/logs/concurrencia_<ts>.jsonl) y
+resumen() da la concurrencia estable del host: la más frecuente en las
+últimas decisiones.
+"""
+
+import json
+import math
+import time
+from collections import Counter
+from pathlib import Path
+
+
+MEJORA_MINIMA = 0.05   # Mejora relativa de rendimiento para seguir subiendo
+CAIDA_MAXIMA = 0.15    # Caída relativa de rendimiento que provoca una reducción
+TOLERANCIA_P95 = 2.0   # p95 permitido frente al mejor p95 observado
+VENTANA_ESTABLE = 20   # Decisiones recientes para calcular la concurrencia estable
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = max(0, math.ceil(p / 100.0 * len(ordenados)) - 1)
+    return ordenados[k]
+
+
+class ControladorConcurrencia:
+    """Ajusta los registros en vuelo por lote con incremento aditivo y reducción multiplicativa"""
+
+    def __init__(self, minimo=1, maximo=8, inicial=None, incremento=1, factor=0.5, ruta_log=None):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.en_vuelo = min(self.maximo, max(self.minimo, inicial or self.minimo))
+        self.incremento = incremento
+        self.factor = factor
+        self.ruta_log = Path(ruta_log) if ruta_log else None
+        self.mejor_p95 = None
+        self.rendimiento_anterior = None
+        self.nivel_anterior = None
+        # Mejor rendimiento visto con cada número de registros en vuelo
+        self.rendimiento_por_nivel = {}
+        # Nivel máximo a probar tras un retroceso (None = hasta maximo)
+        self.techo = None
+        self.decisiones = []
+
+    def observar(self, registros, segundos, latencias, presion='normal', rss_mb=None):
+        """Registra un lote terminado y decide cuántos registros despachar en el siguiente
+
+        Args:
+            registros: registros renderizados en el lote
+            segundos: duración total del lote (despacho a último resultado)
+            latencias: segundos de render de cada registro
+            presion: 'normal', 'contener' o 'reciclar' (GobernadorMemoria.presion)
+            rss_mb: RSS del proceso tras el lote, solo para el registro
+
+        Returns:
+            registros en vuelo para el siguiente lote
+        """
+        if not registros or segundos <= 0:
+            return self.en_vuelo
+        rendimiento = registros / segundos
+        p95 = percentil(latencias, 95)
+        nivel = self.en_vuelo
+        mejor_anterior = max(
+            (r for n, r in self.rendimiento_por_nivel.items() if n < nivel), default=None
+        )
+        self.rendimiento_por_nivel[nivel] = max(rendimiento, self.rendimiento_por_nivel.get(nivel, 0.0))
+        if p95 > 0:
+            self.mejor_p95 = p95 if self.mejor_p95 is None else min(self.mejor_p95, p95)
+
+        if presion != 'normal':
+            decision, motivo = 'reducir', f'memoria ({presion})'
+        elif self.mejor_p95 and p95 > self.mejor_p95 * TOLERANCIA_P95:
+            decision, motivo = 'reducir', f'p95 {p95:.2f}s > {TOLERANCIA_P95}x {self.mejor_p95:.2f}s'
+        elif mejor_anterior is not None and rendimiento < mejor_anterior * (1 - MEJORA_MINIMA):
+            decision, motivo = 'retroceder', 'rinde menos que con menos registros en vuelo'
+        elif self.nivel_anterior == nivel and rendimiento < self.rendimiento_anterior * (1 - CAIDA_MAXIMA):
+            decision, motivo = 'reducir', 'caída de rendimiento'
+        elif (mejor_anterior is None or rendimiento >= mejor_anterior * (1 + MEJORA_MINIMA)) \
+                and nivel < min(self.maximo, self.techo or self.maximo):
+            decision, motivo = 'aumentar', 'el rendimiento mejora'
+        else:
+            decision, motivo = 'mantener', 'meseta de rendimiento'
+
+        if decision == 'reducir':
+            self.en_vuelo = max(self.minimo, int(self.en_vuelo * self.factor))
+            self.techo = None
+        elif decision == 'retroceder':
+            self.en_vuelo = max(self.minimo, self.en_vuelo - self.incremento)
+            self.techo = self.en_vuelo
+        elif decision == 'aumentar':
+            self.en_vuelo = min(self.maximo, self.en_vuelo + self.incremento)
+        self.rendimiento_anterior = rendimiento
+        self.nivel_anterior = nivel
+
+        entrada = {
+            'ts': round(time.time(), 3),
+            'en_vuelo': nivel,
+            'siguiente': self.en_vuelo,
+            'decision': decision,
+            'motivo': motivo,
+            'registros': registros,
+            'registros_s': round(rendimiento, 3),
+            'p95_s': round(p95, 3),
+            'rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+        }
+        self.decisiones.append(entrada)
+        self._anotar(entrada)
+        return self.en_vuelo
+
+    def _anotar(self, entrada):
+        if self.ruta_log is None:
+            return
+        try:
+            self.ruta_log.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.ruta_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        except OSError:
+            self.ruta_log = None
+
+    def concurrencia_estable(self):
+        """Registros en vuelo más frecuentes en las últimas decisiones"""
+        recientes = [d['en_vuelo'] for d in self.decisiones[-VENTANA_ESTABLE:]]
+        if not recientes:
+            return self.en_vuelo
+        return Counter(recientes).most_common(1)[0][0]
+
+    def resumen(self):
+        return {
+            'en_vuelo_estable': self.concurrencia_estable(),
+            'en_vuelo_actual': self.en_vuelo,
+            'maximo': self.maximo,
+            'decisiones': dict(Counter(d['decision'] for d in self.decisiones)),
+            'mejor_p95_s': round(self.mejor_p95, 3) if self.mejor_p95 else None,
+            'log': str(self.ruta_log) if self.ruta_log else None,
+        }
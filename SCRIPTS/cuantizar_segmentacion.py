@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Cuantización INT8 del modelo de segmentación y comparación FP32 / INT8
+
+1. Genera (o reutiliza con --reusar) la copia cuantizada dinámicamente de los
+   pesos FP32 de rembg en segmentacion.ruta_int8 de CONFIG/config.json.
+2. Sobre el pool de fotos (DATA/Imagenes_Mujeres, DATA/Imagenes_Hombres) mide
+   con las mismas opciones de sesión (segmentacion.sesion_onnx):
+   - latencia media y p95 de la inferencia de cada modelo
+   - concordancia de máscaras: IoU de la máscara binarizada (alfa >= 128) y
+     error absoluto medio del alfa (fracción de 255)
+3. Recomienda INT8 si el IoU p5 y el error medio cumplen las tolerancias.
+
+Para usarlo en producción: "int8": true en la sección segmentacion.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from sesion_segmentacion import (
+    config_segmentacion, crear_sesion, cuantizar_modelo, ruta_int8, ruta_modelo_fp32,
+)
+from verificar_deteccion_proxy import listar_pool, percentil
+
+
+def cargar_config(base_path):
+    with open(base_path / 'CONFIG' / 'config.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def medir(sesion, imagenes):
+    """Máscaras (uint8) y latencias de sesion.predict sobre las imágenes"""
+    mascaras, latencias = [], []
+    sesion.predict(imagenes[0][1])  # Calentamiento (arena y optimización del grafo)
+    for _nombre, img in imagenes:
+        t0 = time.perf_counter()
+        mascara = sesion.predict(img)[0]
+        latencias.append(time.perf_counter() - t0)
+        mascaras.append(np.asarray(mascara, dtype=np.uint8))
+    return mascaras, latencias
+
+
+def concordancia(a, b):
+    """(IoU de las máscaras binarizadas, error absoluto medio del alfa en [0, 1])"""
+    ba, bb = a >= 128, b >= 128
+    union = np.logical_or(ba, bb).sum()
+    iou = np.logical_and(ba, bb).sum() / union if union else 1.0
+    error = np.abs(a.astype(np.int16) - b.astype(np.int16)).mean() / 255.0
+    return float(iou), float(error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cuantiza a INT8 el modelo de segmentación y lo compara con FP32")
+    parser.add_argument("--limite", type=int, default=50, help="Máximo de fotos del pool a comparar (default: 50)")
+    parser.add_argument("--reusar", action="store_true", help="No volver a cuantizar si el modelo INT8 ya existe")
+    parser.add_argument("--sin-comparar", action="store_true", help="Solo generar el modelo INT8")
+    parser.add_argument("--tolerancia-iou", type=float, default=0.97,
+                        help="IoU p5 mínimo de las máscaras INT8 frente a FP32 (default: 0.97)")
+    parser.add_argument("--tolerancia-error", type=float, default=0.02,
+                        help="Error medio de alfa máximo, fracción de 255 (default: 0.02)")
+    parser.add_argument("--salida", help="Ruta opcional para guardar el reporte JSON")
+    args = parser.parse_args()
+
+    base_path = Path(__file__).resolve().parent.parent
+    config = cargar_config(base_path)
+    seccion = config_segmentacion(config)
+    destino = ruta_int8(config, base_path)
+
+    if destino.exists() and args.reusar:
+        print(f" Modelo INT8 existente: {destino}")
+    else:
+        origen = ruta_modelo_fp32(seccion['modelo'])
+        print(f" Cuantizando {origen.name} → {destino}")
+        t0 = time.perf_counter()
+        metadatos = cuantizar_modelo(origen, destino)
+        print(f"   {metadatos['mb_fp32']} MB → {metadatos['mb_int8']} MB en {time.perf_counter() - t0:.1f}s")
+    if args.sin_comparar:
+        return 0
+
+    fotos = listar_pool(base_path, args.limite)
+    if not fotos:
+        print(f" No se encontraron fotos en {base_path / 'DATA'}")
+        return 1
+    imagenes = []
+    for ruta in fotos:
+        try:
+            with Image.open(ruta) as img:
+                imagenes.append((ruta.name, img.convert('RGB')))
+        except Exception as e:
+            print(f"   ️ No se pudo leer {ruta.name}: {e}")
+    if not imagenes:
+        print(" No se pudo leer ninguna foto del pool")
+        return 1
+
+    proveedores = ['CPUExecutionProvider']
+    config_fp32 = dict(config, segmentacion=dict(seccion, int8=False))
+    config_int8 = dict(config, segmentacion=dict(seccion, int8=True))
+    sesion_fp32, _ = crear_sesion(config_fp32, base_path, proveedores)
+    sesion_int8, _ = crear_sesion(config_int8, base_path, proveedores)
+
+    print(f" Comparando FP32 e INT8 sobre {len(imagenes)} fotos "
+          f"(opciones: {json.dumps(seccion['sesion_onnx'], ensure_ascii=False)})")
+    mascaras_fp32, latencias_fp32 = medir(sesion_fp32, imagenes)
+    mascaras_int8, latencias_int8 = medir(sesion_int8, imagenes)
+
+    ious, errores, peores = [], [], []
+    for (nombre, _img), a, b in zip(imagenes, mascaras_fp32, mascaras_int8):
+        iou, error = concordancia(a, b)
+        ious.append(iou)
+        errores.append(error)
+        peores.append((iou, nombre))
+
+    reporte = {
+        'fotos': len(imagenes),
+        'fp32': {'media_s': round(float(np.mean(latencias_fp32)), 4), 'p95_s': round(percentil(latencias_fp32, 95), 4)},
+        'int8': {'media_s': round(float(np.mean(latencias_int8)), 4), 'p95_s': round(percentil(latencias_int8, 95), 4)},
+        'iou_medio': round(float(np.mean(ious)), 4),
+        'iou_p5': round(percentil(ious, 5), 4),
+        'error_alfa_medio': round(float(np.mean(errores)), 4),
+        'peores': [nombre for _iou, nombre in sorted(peores)[:5]],
+    }
+    aceleracion = reporte['fp32']['media_s'] / reporte['int8']['media_s'] if reporte['int8']['media_s'] else 0.0
+    reporte['aceleracion'] = round(aceleracion, 2)
+    reporte['recomendar_int8'] = (
+        reporte['iou_p5'] >= args.tolerancia_iou
+        and reporte['error_alfa_medio'] <= args.tolerancia_error
+        and aceleracion > 1.0
+    )
+
+    print(f"   FP32: {reporte['fp32']['media_s'] * 1000:.1f} ms media, p95 {reporte['fp32']['p95_s'] * 1000:.1f} ms")
+    print(f"   INT8: {reporte['int8']['media_s'] * 1000:.1f} ms media, p95 {reporte['int8']['p95_s'] * 1000:.1f} ms "
+          f"(x{aceleracion:.2f})")
+    print(f"   Máscaras: IoU medio {reporte['iou_medio']:.4f}, p5 {reporte['iou_p5']:.4f}; "
+          f"error de alfa medio {reporte['error_alfa_medio'] * 100:.2f}%")
+    if reporte['recomendar_int8']:
+        print(' INT8 dentro de tolerancia y más rápido: activar con "int8": true en segmentacion')
+    else:
+        print(f" Mantener FP32 (fotos con peor IoU: {', '.join(reporte['peores'])})")
+
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f" Reporte guardado en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Detectores de Cara - Registro de backends con una interfaz común
+
+Backends disponibles:
+- 'haar': cv2.CascadeClassifier (frontalface_default)
+- 'mediapipe_deteccion': MediaPipe FaceDetection (keypoints de ojos)
+- 'face_mesh': MediaPipe Face Mesh (esquinas de ojos 33/362)
+
+Todos devuelven la misma geometría en píxeles de la imagen original:
+    {'centro_ojos': (x, y), 'ancho_cara': w, 'caja': (x, y, w, h), 'backend': nombre}
+
+'ancho_cara' es la medida nativa de cada backend multiplicada por su factor de
+ancho, calibrado para coincidir con la definición de Face Mesh (2.5 × distancia
+entre landmarks 33 y 362). SCRIPTS/benchmark_detectores.py sugiere los factores.
+
+Las instancias se crean una sola vez por hilo y se reutilizan (obtener_detector):
+los grafos de MediaPipe no admiten llamadas concurrentes, así que cada hilo de
+render obtiene la suya; en un proceso de un solo hilo equivale a una por proceso.
+"""
+
+import abc
+import threading
+
+import cv2
+import numpy as np
+
+try:
+    import mediapipe as mp
+except Exception:
+    mp = None
+
+
+# Factor medida nativa → ancho de cara equivalente a Face Mesh
+FACTORES_ANCHO_DEFECTO = {
+    'face_mesh': 2.5,            # distancia horizontal entre landmarks 33 y 362
+    'mediapipe_deteccion': 2.5,  # distancia horizontal entre keypoints de ojos
+    'haar': 1.0,                 # ancho de la caja del cascade
+}
+
+# Altura relativa de los ojos dentro de la caja de Haar (frontalface_default)
+FRACCION_OJOS_HAAR = 0.4
+
+
+class DetectorCara(abc.ABC):
+    """Interfaz común: reduce a proxy, detecta y proyecta a la resolución original"""
+
+    nombre = ''
+
+    def __init__(self, factor_ancho=None):
+        self.factor_ancho = factor_ancho if factor_ancho is not None else FACTORES_ANCHO_DEFECTO[self.nombre]
+
+    def detectar(self, arr, lado_max_proxy=0, contador=None):
+        """Detecta la cara en un ndarray RGB/RGBA uint8.
+
+        Args:
+            arr: imagen HxWx3 (RGB) o HxWx4 (RGBA)
+            lado_max_proxy: si > 0, detectar sobre un proxy con ese lado máximo
+            contador: ContadorCopias opcional para registrar la conversión de color
+
+        Returns:
+            dict con la geometría común, o None si no hay rostro
+        """
+        arr = np.asarray(arr)
+        h, w = arr.shape[:2]
+        lado_max = max(h, w)
+        if lado_max_proxy and lado_max > lado_max_proxy:
+            factor = lado_max_proxy / lado_max
+            tam_proxy = (max(1, round(w * factor)), max(1, round(h * factor)))
+            arr = cv2.resize(arr, tam_proxy, interpolation=cv2.INTER_AREA)
+
+        normalizado = self._detectar_normalizado(arr, contador)
+        if normalizado is None:
+            return None
+
+        # Coordenadas normalizadas [0, 1] → píxeles de la imagen original
+        cx, cy = normalizado['centro_ojos']
+        bx, by, bw, bh = normalizado['caja']
+        return {
+            'centro_ojos': (cx * w, cy * h),
+            'ancho_cara': max(normalizado['medida'] * w * self.factor_ancho, 1e-6),
+            'caja': (round(bx * w), round(by * h), round(bw * w), round(bh * h)),
+            'backend': self.nombre,
+        }
+
+    @abc.abstractmethod
+    def _detectar_normalizado(self, arr, contador):
+        """Devuelve centro_ojos, medida (fracción del ancho) y caja normalizados, o None"""
+
+    def cerrar(self):
+        """Libera recursos nativos del backend (si los tiene)"""
+        pass
+
+    @staticmethod
+    def _a_rgb(arr, contador, etapa):
+        if arr.shape[2] == 4:
+            arr = cv2.cvtColor(arr, cv2.COLOR_RGBA2RGB)
+            if contador is not None:
+                contador.registrar(etapa, arr.nbytes)
+        return arr
+
+
+class DetectorHaar(DetectorCara):
+    """Cascade de Haar frontal; la cara más grande de detectMultiScale"""
+
+    nombre = 'haar'
+
+    def __init__(self, factor_ancho=None):
+        super().__init__(factor_ancho)
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    def _detectar_normalizado(self, arr, contador):
+        codigo = cv2.COLOR_RGBA2GRAY if arr.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        gray = cv2.cvtColor(arr, codigo)
+        if contador is not None:
+            contador.registrar('deteccion_gris', gray.nbytes)
+        faces = self.cascade.detectMultiScale(gray, 1.1, 4)
+        if len(faces) == 0:
+            return None
+
+        # Tomar la cara más grande
+        x, y, fw, fh = max(faces, key=lambda f: f[2] * f[3])
+        h, w = gray.shape[:2]
+        return {
+            'centro_ojos': ((x + fw / 2) / w, (y + fh * FRACCION_OJOS_HAAR) / h),
+            'medida': fw / w,
+            'caja': (x / w, y / h, fw / w, fh / h),
+        }
+
+
+class DetectorMediaPipeDeteccion(DetectorCara):
+    """MediaPipe FaceDetection (short range); usa los keypoints de ambos ojos"""
+
+    nombre = 'mediapipe_deteccion'
+
+    def __init__(self, factor_ancho=None, model_selection=0):
+        super().__init__(factor_ancho)
+        self.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=model_selection,
+            min_detection_confidence=0.5
+        )
+
+    def _detectar_normalizado(self, arr, contador):
+        results = self.detector.process(self._a_rgb(arr, contador, 'deteccion_rgb'))
+        if not results.detections:
+            return None
+
+        deteccion = max(results.detections, key=lambda d: d.score[0] if d.score else 0)
+        datos = deteccion.location_data
+        ojo_der, ojo_izq = datos.relative_keypoints[0], datos.relative_keypoints[1]
+        caja = datos.relative_bounding_box
+        return {
+            'centro_ojos': ((ojo_der.x + ojo_izq.x) / 2, (ojo_der.y + ojo_izq.y) / 2),
+            'medida': abs(ojo_izq.x - ojo_der.x),
+            'caja': (caja.xmin, caja.ymin, caja.width, caja.height),
+        }
+
+    def cerrar(self):
+        self.detector.close()
+
+
+class DetectorFaceMesh(DetectorCara):
+    """MediaPipe Face Mesh; esquinas de ojos 33 y 362 (refinamiento de iris opcional)"""
+
+    nombre = 'face_mesh'
+
+    def __init__(self, factor_ancho=None, refinar_iris=True):
+        super().__init__(factor_ancho)
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=1,
+            refine_landmarks=refinar_iris,
+            min_detection_confidence=0.5
+        )
+
+    def _detectar_normalizado(self, arr, contador):
+        results = self.face_mesh.process(self._a_rgb(arr, contador, 'deteccion_rgb'))
+        if not results.multi_face_landmarks:
+            return None
+
+        landmarks = results.multi_face_landmarks[0].landmark
+        left_eye, right_eye = landmarks[33], landmarks[362]
+        xs = [p.x for p in landmarks]
+        ys = [p.y for p in landmarks]
+        return {
+            'centro_ojos': ((left_eye.x + right_eye.x) / 2, (left_eye.y + right_eye.y) / 2),
+            'medida': abs(right_eye.x - left_eye.x),
+            'caja': (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)),
+        }
+
+    def cerrar(self):
+        self.face_mesh.close()
+
+
+BACKENDS = {
+    DetectorHaar.nombre: DetectorHaar,
+    DetectorMediaPipeDeteccion.nombre: DetectorMediaPipeDeteccion,
+    DetectorFaceMesh.nombre: DetectorFaceMesh,
+}
+
+_locales = threading.local()
+_todas_las_instancias = []
+_lock_instancias = threading.Lock()
+
+
+def backends_disponibles():
+    """Nombres de backends utilizables en este entorno"""
+    if mp is None or not hasattr(mp, 'solutions'):
+        return [DetectorHaar.nombre]
+    return list(BACKENDS)
+
+
+def obtener_detector(nombre='face_mesh', **opciones):
+    """Devuelve la instancia cacheada del backend (una por hilo y combinación de opciones)"""
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend de detección desconocido: {nombre} (disponibles: {', '.join(BACKENDS)})")
+
+    instancias = getattr(_locales, 'instancias', None)
+    if instancias is None:
+        instancias = _locales.instancias = {}
+
+    clave = (nombre, tuple(sorted(opciones.items())))
+    detector = instancias.get(clave)
+    if detector is None:
+        detector = BACKENDS[nombre](**opciones)
+        instancias[clave] = detector
+        with _lock_instancias:
+            _todas_las_instancias.append(detector)
+    return detector
+
+
+def cerrar_detectores():
+    """Cierra todas las instancias creadas (de cualquier hilo) y vacía la cache del hilo actual.
+
+    Llamar solo cuando ningún hilo esté detectando.
+    """
+    with _lock_instancias:
+        for detector in _todas_las_instancias:
+            try:
+                detector.cerrar()
+            except Exception:
+                pass
+        _todas_las_instancias.clear()
+    _locales.instancias = {}
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Diario de registros - Journal de escritura anticipada para reanudar tras un corte
+
+Un archivo JSONL por CSV de entrada (o partición) en la carpeta de resultados:
+
+    {"tipo": "inicio", "semilla": ..., "almacen": ..., "csv": ..., "bytes_csv": ..., "huella_csv": {...}}
+    {"k": "<clave>", "e": "en_curso", "foto": "..."}
+    {"k": "<clave>", "e": "generado", "salida": "...", "foto": "..."}
+
+La clave de cada registro es la de sintesis_campos.claves_registro (CORREO +
+número de aparición), así que no depende de la posición en el CSV. Las
+entradas se escriben en un buffer y se sincronizan con fsync por lotes
+(cada FSYNC_CADA entradas o al cerrar cada lote de resultados): el estado
+final de un registro solo se anota después de anexar su lote al almacén de
+resultados, de modo que un registro marcado como completado nunca falta en
+los resultados. Un corte entre los dos pasos deja registros almacenados que
+aquí siguen en curso; el generador también salta las claves que ya guarda
+el almacén (AlmacenResultados.claves).
+
+Solo se reanuda un diario del mismo CSV: mismo tamaño (comprobación
+rápida) y misma huella_csv (mtime_ns y sha256 del primer y el último
+bloque de BYTES_HUELLA_CSV). Un CSV editado con el mismo tamaño no
+reutiliza resultados viejos de filas cambiadas en campos distintos del
+CORREO.
+
+Al reanudar, los registros completados se descartan con una búsqueda O(1) por
+registro y los que quedaron en curso se vuelven a encolar. El tiempo de
+reanudación depende del diario, no del tamaño del CSV ni de los RESULT.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+
+FSYNC_CADA = 64  # Entradas como máximo entre dos fsync
+ESTADOS_FINALES = ('generado', 'omitido')
+BYTES_HUELLA_CSV = 64 * 1024  # Bytes del principio y del final del CSV que entran en su huella
+
+
+def huella_csv(ruta, bloque=BYTES_HUELLA_CSV):
+    """{'mtime_ns', 'extremos'}: huella barata del contenido del CSV (sin leerlo entero)"""
+    estado = os.stat(ruta)
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        h.update(f.read(bloque))
+        if estado.st_size > bloque:
+            f.seek(max(bloque, estado.st_size - bloque))
+            h.update(f.read(bloque))
+    return {'mtime_ns': estado.st_mtime_ns, 'extremos': h.hexdigest()}
+
+
+class DiarioRegistros:
+    """Journal append-only de estados por registro"""
+
+    def __init__(self, ruta, fsync_cada=FSYNC_CADA):
+        self.ruta = Path(ruta)
+        self.fsync_cada = fsync_cada
+        self.cabecera = None
+        self.completados = {}  # clave → última entrada final
+        self.en_curso = {}     # clave → entrada en_curso sin estado final
+        self._archivo = None
+        self._sin_sincronizar = 0
+        if self.ruta.exists():
+            self._cargar()
+
+    @property
+    def reanudado(self):
+        return self.cabecera is not None
+
+    def _cargar(self):
+        valido = 0  # bytes hasta la última línea completa
+        with open(self.ruta, 'rb') as f:
+            for linea in f:
+                try:
+                    if not linea.endswith(b'\n'):
+                        raise ValueError
+                    entrada = json.loads(linea)
+                except ValueError:
+                    break  # última línea a medio escribir en el corte
+                valido += len(linea)
+                if entrada.get('tipo') == 'inicio':
+                    self.cabecera = entrada
+                    continue
+                clave = entrada.get('k')
+                if entrada.get('e') in ESTADOS_FINALES:
+                    self.completados[clave] = entrada
+                    self.en_curso.pop(clave, None)
+                elif clave not in self.completados:
+                    self.en_curso[clave] = entrada
+        # Las entradas nuevas se anexan tras la última línea completa
+        if valido != self.ruta.stat().st_size:
+            with open(self.ruta, 'r+b') as f:
+                f.truncate(valido)
+
+    def compatible(self, bytes_csv, huella=None):
+        """True si el diario existente corresponde al mismo CSV de entrada (tamaño y huella_csv)"""
+        if not self.reanudado or self.cabecera.get('bytes_csv') != bytes_csv:
+            return False
+        return self.cabecera.get('huella_csv') == huella
+
+    def descartar(self):
+        """Aparta un diario que no corresponde a esta entrada y empieza uno vacío"""
+        if self.ruta.exists():
+            self.ruta.rename(self.ruta.with_name(f"{self.ruta.stem}_{datetime.now():%Y%m%d_%H%M%S}.descartado.jsonl"))
+        self.cabecera = None
+        self.completados = {}
+        self.en_curso = {}
+
+    def iniciar(self, **cabecera):
+        """Escribe la cabecera de un diario nuevo (semilla, almacén, CSV...)"""
+        self.cabecera = {'tipo': 'inicio', 'creado': datetime.now().isoformat(), **cabecera}
+        self._escribir(self.cabecera)
+        self.sincronizar()
+
+    def _escribir(self, entrada):
+        if self._archivo is None:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+        self._archivo.write(json.dumps(entrada, ensure_ascii=False, default=str) + '\n')
+        self._sin_sincronizar += 1
+        if self._sin_sincronizar >= self.fsync_cada:
+            self.sincronizar()
+
+    def marcar_en_curso(self, clave, foto=None):
+        entrada = {'k': clave, 'e': 'en_curso', 'foto': foto}
+        self.en_curso[clave] = entrada
+        self._escribir(entrada)
+
+    def marcar_finalizados(self, pares):
+        """Estado final de (clave, datos_pasaporte) ya anexados al almacén; sincroniza al terminar"""
+        for clave, datos in pares:
+            entrada = {
+                'k': clave,
+                'e': datos.get('estado', 'omitido'),
+                'salida': datos.get('pasaporte_visual'),
+                'foto': datos.get('imagen_usada'),
+            }
+            self.completados[clave] = entrada
+            self.en_curso.pop(clave, None)
+            self._escribir(entrada)
+        self.sincronizar()
+
+    def sincronizar(self):
+        if self._archivo is not None and self._sin_sincronizar:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+        self._sin_sincronizar = 0
+
+    def cerrar(self, terminado=False):
+        """Sincroniza y cierra; con `terminado` el diario se archiva para no reanudarlo"""
+        self.sincronizar()
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        if terminado and self.ruta.exists():
+            destino = self.ruta.with_name(f"{self.ruta.stem}_{datetime.now():%Y%m%d_%H%M%S}.completado.jsonl")
+            self.ruta.rename(destino)
+            return destino
+        return None
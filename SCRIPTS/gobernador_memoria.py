@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Gobernador de memoria - Presupuesto de RSS y reciclado de trabajadores de render
+
+Sustituye el sondeo de psutil.virtual_memory().percent (un valor de todo el
+sistema) tras cada registro. Mide el RSS del propio proceso, que es lo que
+ocupan los hilos de render, y decide entre lotes:
+
+- normal: se despachan hilos * 2 registros por lote
+- contener: el RSS supera FRACCION_CONTENCION del presupuesto; se despacha
+  solo un registro por hilo hasta que baje (contrapresión sin pausas)
+- reciclar: el RSS supera el presupuesto o los trabajadores ya hicieron
+  tareas_por_trabajador tareas; el generador cierra el pool de hilos y los
+  detectores de cara (estado por hilo de MediaPipe, contadores) y los vuelve
+  a crear
+
+Histéresis: si tras un reciclado el RSS sigue por encima del presupuesto
+(memoria que no es de los trabajadores), no se vuelve a reciclar por RSS en
+cada lote; solo cuando el RSS haya crecido CRECIMIENTO_RECICLADO_MB desde
+marcar_reciclado o se hayan hecho TAREAS_ENTRE_RECICLADOS_RSS registros por
+hilo. Mientras tanto la presión se queda en 'contener'.
+
+El crecimiento de RSS por tarea desde el último reciclado queda en resumen()
+para ajustar el presupuesto.
+"""
+
+import threading
+
+import psutil
+
+
+FRACCION_CONTENCION = 0.85  # Fracción del presupuesto a partir de la que se reduce el despacho
+# Histéresis del reciclado por RSS: crecimiento mínimo desde el último reciclado
+# o registros por hilo que deben pasar antes de repetirlo
+CRECIMIENTO_RECICLADO_MB = 256
+TAREAS_ENTRE_RECICLADOS_RSS = 50
+BYTES_POR_MB = 1024 * 1024
+
+
+class GobernadorMemoria:
+    """Presupuesto de RSS del proceso y reciclado periódico de los trabajadores de render"""
+
+    def __init__(self, presupuesto_rss_mb=None, tareas_por_trabajador=None,
+                 fraccion_contencion=FRACCION_CONTENCION,
+                 crecimiento_reciclado_mb=CRECIMIENTO_RECICLADO_MB,
+                 tareas_entre_reciclados_rss=TAREAS_ENTRE_RECICLADOS_RSS):
+        self.presupuesto_rss_mb = presupuesto_rss_mb
+        self.tareas_por_trabajador = tareas_por_trabajador
+        self.fraccion_contencion = fraccion_contencion
+        self.crecimiento_reciclado_mb = crecimiento_reciclado_mb
+        self.tareas_entre_reciclados_rss = tareas_entre_reciclados_rss
+        self._proceso = psutil.Process()
+        self._lock = threading.Lock()
+        self.rss_base_mb = None
+        self.rss_max_mb = 0.0
+        self.tareas = 0
+        self.tareas_desde_reciclado = 0
+        self.rss_tras_reciclado_mb = None
+        self.sobre_presupuesto_tras_reciclado = False
+        self.reciclados = []
+
+    def rss_mb(self):
+        """RSS actual del proceso en MB"""
+        try:
+            rss = self._proceso.memory_info().rss / BYTES_POR_MB
+        except Exception:
+            return 0.0
+        self.rss_max_mb = max(self.rss_max_mb, rss)
+        return rss
+
+    def fijar_base(self):
+        """Toma como referencia el RSS actual (tras cargar modelos, fuentes y plantilla)"""
+        self.rss_base_mb = self.rss_tras_reciclado_mb = self.rss_mb()
+        return self.rss_base_mb
+
+    def registrar_tareas(self, n=1):
+        """Anota n registros renderizados (seguro entre hilos)"""
+        with self._lock:
+            self.tareas += n
+            self.tareas_desde_reciclado += n
+
+    def motivo_reciclado(self, hilos=1):
+        """'tareas' o 'rss' si toca reciclar los trabajadores, None si no"""
+        if self.tareas_por_trabajador and self.tareas_desde_reciclado >= self.tareas_por_trabajador * max(1, hilos):
+            return 'tareas'
+        if self.presupuesto_rss_mb:
+            rss = self.rss_mb()
+            if rss > self.presupuesto_rss_mb and self._rss_permite_reciclar(rss, hilos):
+                return 'rss'
+        return None
+
+    def _rss_permite_reciclar(self, rss, hilos):
+        """Histéresis: tras un reciclado por RSS hace falta crecimiento o tareas nuevas"""
+        if not self.sobre_presupuesto_tras_reciclado or self.rss_tras_reciclado_mb is None:
+            return True
+        if rss - self.rss_tras_reciclado_mb >= self.crecimiento_reciclado_mb:
+            return True
+        return self.tareas_desde_reciclado >= self.tareas_entre_reciclados_rss * max(1, hilos)
+
+    def presion(self, hilos=1):
+        """'normal', 'contener' o 'reciclar' según el RSS y las tareas desde el último reciclado"""
+        if self.motivo_reciclado(hilos):
+            return 'reciclar'
+        if self.presupuesto_rss_mb and self.rss_mb() > self.presupuesto_rss_mb * self.fraccion_contencion:
+            return 'contener'
+        return 'normal'
+
+    def tareas_en_vuelo(self, hilos, presion=None):
+        """Registros a despachar en el próximo lote según la presión de memoria"""
+        hilos = max(1, hilos)
+        presion = presion or self.presion(hilos)
+        return hilos if presion != 'normal' else hilos * 2
+
+    def marcar_reciclado(self, motivo, rss_antes_mb):
+        """Registra un reciclado ya hecho y reinicia la cuenta de tareas"""
+        rss_despues = self.rss_mb()
+        self.reciclados.append({
+            'motivo': motivo,
+            'tareas': self.tareas_desde_reciclado,
+            'rss_antes_mb': round(rss_antes_mb, 1),
+            'rss_despues_mb': round(rss_despues, 1),
+        })
+        with self._lock:
+            self.tareas_desde_reciclado = 0
+        self.rss_tras_reciclado_mb = rss_despues
+        # Solo cuenta para la histéresis si el reciclado no bastó para bajar del presupuesto
+        self.sobre_presupuesto_tras_reciclado = bool(self.presupuesto_rss_mb and rss_despues > self.presupuesto_rss_mb)
+        return rss_despues
+
+    def crecimiento_por_tarea_mb(self):
+        """Crecimiento medio de RSS por registro desde el último reciclado"""
+        if self.rss_tras_reciclado_mb is None or not self.tareas_desde_reciclado:
+            return 0.0
+        return (self.rss_mb() - self.rss_tras_reciclado_mb) / self.tareas_desde_reciclado
+
+    def resumen(self):
+        rss = self.rss_mb()
+        return {
+            'rss_base_mb': round(self.rss_base_mb or 0.0, 1),
+            'rss_actual_mb': round(rss, 1),
+            'rss_max_mb': round(self.rss_max_mb, 1),
+            'presupuesto_rss_mb': self.presupuesto_rss_mb,
+            'tareas': self.tareas,
+            'crecimiento_por_tarea_mb': round(self.crecimiento_por_tarea_mb(), 3),
+            'reciclados': len(self.reciclados),
+        }
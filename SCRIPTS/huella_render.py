@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Huella de render - Regeneración incremental de pasaportes (estilo sistema de build)
+
+Cada PNG generado lleva en chunks tEXt:
+
+- huella: sha256 de los datos del registro que usa el render, el hash de la
+  foto, el subconjunto de config.json que afecta al render, la plantilla, las
+  fuentes y VERSION_RENDER
+- huella_entrada: sha256 de las columnas del CSV de las que salen los datos
+- datos_pasaporte: JSON con los datos usados (número, fechas, MRZ, firma...)
+- foto_sha256, ruta_foto y segundos_render
+
+En modo incremental, para cada registro con un PNG previo:
+
+- misma huella_entrada y misma huella → se salta (sin_cambios)
+- misma huella_entrada y otra huella (cambió config, plantilla, fuentes) →
+  se vuelve a renderizar con los datos guardados y la misma foto (reconstruido)
+- otra huella_entrada o sin PNG → se genera de cero como siempre
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+
+# Subir al cambiar el código de render de forma que cambie el resultado
+VERSION_RENDER = 1
+
+# Secciones de config.json que afectan al render
+CAMPOS_CONFIG_HUELLA = ('template_settings', 'field_mapping', 'fonts', 'deteccion_rostro')
+
+# Columnas del CSV de las que se derivan los datos del registro
+COLUMNAS_ENTRADA_HUELLA = (
+    'GENERO', 'PRIMER_NOMBRE', 'SEGUNDO_NOMBRE', 'PRIMER_APELLIDO',
+    'SEGUNDO_APELLIDO', 'FECHA_NACIMIENTO', 'CORREO',
+)
+
+# Claves de datos_pasaporte que no influyen en la imagen (rutas, estado de la ejecución)
+CLAVES_FUERA_DE_HUELLA = (
+    'ruta_foto', 'imagen_usada', 'pasaporte_visual', 'estado', 'motivo_no_generado',
+    'nombre_archivo', 'correo_original', 'incremental', 'huella_entrada',
+)
+
+TAMANO_LECTURA = 1 << 20
+
+
+def hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_LECTURA), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella_json(valor):
+    texto = json.dumps(valor, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def huella_entorno(base_path, modelo_segmentacion=None):
+    """Huella de todo lo que no es del registro: config, plantilla, fuentes, versión y modelo de segmentación
+
+    modelo_segmentacion: el modelo que la sesión de rembg cargó de verdad
+    (ScriptMaestroIntegrado.modelo_segmentacion), no el pedido en config.json:
+    con "int8": true y sin el archivo INT8 se renderiza con FP32.
+    """
+    base_path = Path(base_path)
+    try:
+        with open(base_path / 'CONFIG' / 'config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    return huella_json({
+        'version': VERSION_RENDER,
+        'config': {campo: config.get(campo) for campo in CAMPOS_CONFIG_HUELLA},
+        # Solo el modelo cargado (FP32/INT8); las opciones de sesión no cambian la imagen
+        'segmentacion': modelo_segmentacion,
+        'recursos': huella_recursos(base_path),
+    })
+
+
+def huella_recursos(base_path):
+    """Huella de los archivos de plantilla y fuentes del proyecto"""
+    base_path = Path(base_path)
+    plantilla = base_path / 'TEMPLATE' / 'PASAPORTE-VENEZUELA-CLEAN.png'
+    fuentes_dir = base_path / 'TEMPLATE' / 'Fuentes_Base'
+    fuentes = sorted(p for p in fuentes_dir.glob('*') if p.is_file()) if fuentes_dir.exists() else []
+    return huella_json({
+        'plantilla': hash_archivo(plantilla) if plantilla.exists() else None,
+        'fuentes': {p.name: hash_archivo(p) for p in fuentes},
+    })
+
+
+def huella_entrada(registro):
+    """Huella de las columnas de entrada de un registro (Series o dict)"""
+    return huella_json({c: str(registro.get(c, '') or '') for c in COLUMNAS_ENTRADA_HUELLA})
+
+
+def datos_render(datos_pasaporte):
+    return {k: v for k, v in datos_pasaporte.items() if k not in CLAVES_FUERA_DE_HUELLA}
+
+
+def huella_render(datos_pasaporte, foto_sha256, entorno):
+    return huella_json({'datos': datos_render(datos_pasaporte), 'foto': foto_sha256, 'entorno': entorno})
+
+
+def metadatos_png(datos_pasaporte, entrada, foto_sha256, entorno, segundos_render):
+    """PngInfo con la huella y los datos necesarios para reconstruir sin volver a sortear"""
+    info = PngInfo()
+    info.add_text('huella', huella_render(datos_pasaporte, foto_sha256, entorno))
+    info.add_text('huella_entrada', entrada)
+    info.add_text('foto_sha256', foto_sha256)
+    info.add_text('ruta_foto', str(datos_pasaporte.get('ruta_foto') or ''))
+    info.add_text('segundos_render', f"{segundos_render:.3f}")
+    info.add_itxt('datos_pasaporte', json.dumps(datos_render(datos_pasaporte), ensure_ascii=False, default=str))
+    return info
+
+
+def leer_metadatos(ruta_png):
+    """Chunks de texto de un PNG generado (None si no existe o no tiene huella)"""
+    try:
+        with Image.open(ruta_png) as img:
+            texto = dict(getattr(img, 'text', {}) or {})
+    except (OSError, ValueError):
+        return None
+    if 'huella' not in texto or 'datos_pasaporte' not in texto:
+        return None
+    try:
+        texto['datos_pasaporte'] = json.loads(texto['datos_pasaporte'])
+    except ValueError:
+        return None
+    return texto
+
+
+def localizar_foto(ruta_foto, foto_sha256):
+    """La foto usada (en su carpeta o ya movida a usadas/) si su contenido no cambió"""
+    if not ruta_foto:
+        return None
+    ruta = Path(ruta_foto)
+    for candidata in (ruta, ruta.parent / 'usadas' / ruta.name):
+        if candidata.exists() and hash_archivo(candidata) == foto_sha256:
+            return candidata
+    return None
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Libro de fotos - Reserva atómica de fotos en SQLite (WAL) en lugar de moverlas por registro
+
+Hasta ahora una foto dejaba de estar disponible cuando mover_imagen_usada la
+movía (con su JSON) a usadas/ justo después de cada render: dos operaciones de
+metadatos por registro sobre DATA, que suele estar en red, y un conjunto de
+reservas en memoria que solo valía dentro de un proceso. El libro guarda el
+estado de cada foto:
+
+    libre -> reservada (reservar) -> usada (confirmar)
+                       \\-> libre (liberar: el render falló o se omitió)
+
+- reservar(): BEGIN IMMEDIATE + UPDATE de una fila libre al azar (edad exacta
+  y si no, rango): dos hilos o dos procesos nunca reciben la misma foto
+- confirmar(): la foto queda usada aunque siga en su carpeta; moverla a
+  usadas/ pasa a ser opcional y por lotes en un hilo de fondo (MovedorUsadas)
+- sincronizar(): un glob por carpeta y proceso da de alta las fotos nuevas,
+  quita las libres que ya no están y devuelve a libres las usadas que se
+  devolvieron a mano desde usadas/ a su carpeta
+- liberar_huerfanas(): reservas de procesos de este host que ya no existen
+  (una ejecución cortada) vuelven a libres
+
+La base vive en OUTPUT/logs (disco local): el modo WAL necesita memoria
+compartida y no funciona sobre un sistema de archivos de red.
+"""
+
+import os
+import queue
+import re
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+
+ESTADOS = ('libre', 'reservada', 'usada')
+TAMANO_LOTE_MOVER = 64   # Fotos movidas a usadas/ por lote
+INTERVALO_MOVER = 2.0    # Segundos máximos que una foto confirmada espera su lote
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS fotos (
+    ruta TEXT PRIMARY KEY,          -- ruta en la carpeta de origen
+    carpeta TEXT NOT NULL,
+    edad INTEGER NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'libre',
+    titular TEXT,                   -- host:pid que la reservó o confirmó
+    instante REAL,
+    movida INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS fotos_por_estado ON fotos (carpeta, estado, edad);
+"""
+
+
+def titular_actual():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LibroFotos:
+    """Estado libre/reservada/usada de las fotos, compartido por hilos y procesos"""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._lock = threading.Lock()
+        self._conexion = None
+        self._pid = None
+        # Conexiones heredadas de un fork: se conservan sin cerrar (ver _conectar)
+        self._heredadas = []
+
+    def _conectar(self):
+        """Conexión del proceso actual (un hijo de fork abre la suya: la heredada no sirve)
+
+        La heredada no se cierra en el hijo: sqlite3_close sobre una conexión
+        del padre puede hacer checkpoint o borrar el -wal que el padre sigue
+        usando. Se guarda una referencia para que el recolector no la cierre.
+        Lo seguro es que el padre llame a cerrar() antes del fork.
+        """
+        if self._conexion is not None and self._pid != os.getpid():
+            self._heredadas.append(self._conexion)
+            self._conexion = None
+        if self._conexion is None:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            conexion = sqlite3.connect(str(self.ruta), timeout=30.0, isolation_level=None,
+                                       check_same_thread=False)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            conexion.executescript(ESQUEMA)
+            self._conexion, self._pid = conexion, os.getpid()
+        return self._conexion
+
+    def _transaccion(self, funcion):
+        """Ejecuta funcion(conexion) dentro de BEGIN IMMEDIATE (bloqueo de escritura desde el inicio)"""
+        with self._lock:
+            conexion = self._conectar()
+            conexion.execute('BEGIN IMMEDIATE')
+            try:
+                resultado = funcion(conexion)
+            except BaseException:
+                conexion.execute('ROLLBACK')
+                raise
+            conexion.execute('COMMIT')
+            return resultado
+
+    def sincronizar(self, carpeta, etiqueta_genero):
+        """Alinea el libro con el contenido de la carpeta (un solo glob); devuelve las fotos libres"""
+        carpeta = Path(carpeta)
+        patron = re.compile(rf'massive_venezuelan_{etiqueta_genero}_(\d+)_')
+        presentes = {}
+        for img_path in carpeta.glob('*.png'):
+            match = patron.search(img_path.stem)
+            if match:
+                presentes[str(img_path)] = int(match.group(1))
+        carpeta_usadas = carpeta / 'usadas'
+
+        def alinear(conexion):
+            filas = conexion.execute(
+                'SELECT ruta, estado, movida FROM fotos WHERE carpeta = ?', (str(carpeta),)).fetchall()
+            conocidas = {ruta for ruta, _estado, _movida in filas}
+            conexion.executemany(
+                'INSERT INTO fotos (ruta, carpeta, edad) VALUES (?, ?, ?)',
+                [(ruta, str(carpeta), edad) for ruta, edad in presentes.items() if ruta not in conocidas])
+            # Libres que ya no están en la carpeta (borradas o movidas por otra herramienta)
+            conexion.executemany(
+                "DELETE FROM fotos WHERE ruta = ? AND estado = 'libre'",
+                [(ruta,) for ruta, estado, _movida in filas if estado == 'libre' and ruta not in presentes])
+            # Usadas y movidas que alguien devolvió a la carpeta de origen: vuelven al pool
+            conexion.executemany(
+                "UPDATE fotos SET estado = 'libre', titular = NULL, instante = NULL, movida = 0 WHERE ruta = ?",
+                [(ruta,) for ruta, estado, movida in filas
+                 if estado == 'usada' and movida and ruta in presentes
+                 and not (carpeta_usadas / Path(ruta).name).exists()])
+            return conexion.execute(
+                "SELECT COUNT(*) FROM fotos WHERE carpeta = ? AND estado = 'libre'", (str(carpeta),)).fetchone()[0]
+
+        return self._transaccion(alinear)
+
+    def liberar_huerfanas(self):
+        """Devuelve a libres las reservas de procesos de este host que ya no existen; devuelve cuántas
+
+        También las del propio proceso (pid reutilizado): llamar antes de la primera reserva.
+        """
+        host = socket.gethostname()
+        propio = titular_actual()
+
+        def liberar(conexion):
+            titulares = [t for (t,) in conexion.execute(
+                "SELECT DISTINCT titular FROM fotos WHERE estado = 'reservada'")]
+            huerfanos = []
+            for titular in titulares:
+                host_titular, _, pid = (titular or '').rpartition(':')
+                if host_titular != host or not pid.isdigit():
+                    continue
+                if titular == propio or not psutil.pid_exists(int(pid)):
+                    huerfanos.append(titular)
+            liberadas = 0
+            for titular in huerfanos:
+                liberadas += conexion.execute(
+                    "UPDATE fotos SET estado = 'libre', titular = NULL, instante = NULL "
+                    "WHERE estado = 'reservada' AND titular = ?", (titular,)).rowcount
+            return liberadas
+
+        return self._transaccion(liberar)
+
+    def reservar(self, carpeta, edad, rango):
+        """Reserva una foto libre de la carpeta: edad exacta y si no, dentro de rango; None si no hay"""
+        carpeta = str(carpeta)
+        titular = titular_actual()
+
+        def elegir(conexion):
+            fila = conexion.execute(
+                "SELECT ruta FROM fotos WHERE carpeta = ? AND estado = 'libre' AND edad = ? "
+                "ORDER BY random() LIMIT 1", (carpeta, edad)).fetchone()
+            if fila is None:
+                fila = conexion.execute(
+                    "SELECT ruta FROM fotos WHERE carpeta = ? AND estado = 'libre' AND edad BETWEEN ? AND ? "
+                    "ORDER BY random() LIMIT 1", (carpeta, rango[0], rango[1])).fetchone()
+            if fila is None:
+                return None
+            conexion.execute(
+                "UPDATE fotos SET estado = 'reservada', titular = ?, instante = ? WHERE ruta = ?",
+                (titular, time.time(), fila[0]))
+            return Path(fila[0])
+
+        return self._transaccion(elegir)
+
+    def reservar_ruta(self, ruta):
+        """Reserva una foto concreta (reconstrucción incremental)
+
+        True si quedó reservada, si ya estaba usada (la de este registro en una
+        ejecución anterior) o si el libro no la conoce; False si la tiene
+        reservada otro registro en curso.
+        """
+        ruta = str(ruta)
+        titular = titular_actual()
+
+        def reservar(conexion):
+            if conexion.execute(
+                    "UPDATE fotos SET estado = 'reservada', titular = ?, instante = ? "
+                    "WHERE ruta = ? AND estado = 'libre'", (titular, time.time(), ruta)).rowcount:
+                return True
+            fila = conexion.execute('SELECT estado FROM fotos WHERE ruta = ?', (ruta,)).fetchone()
+            return fila is None or fila[0] != 'reservada'
+
+        return self._transaccion(reservar)
+
+    def confirmar(self, ruta):
+        """Marca la foto como usada (el render terminó bien)"""
+        self._transaccion(lambda conexion: conexion.execute(
+            "UPDATE fotos SET estado = 'usada', titular = ?, instante = ? WHERE ruta = ?",
+            (titular_actual(), time.time(), str(ruta))))
+
+    def liberar(self, ruta):
+        """Devuelve una foto reservada que no llegó a usarse (una usada no cambia)"""
+        self._transaccion(lambda conexion: conexion.execute(
+            "UPDATE fotos SET estado = 'libre', titular = NULL, instante = NULL "
+            "WHERE ruta = ? AND estado = 'reservada'", (str(ruta),)))
+
+    def marcar_movidas(self, rutas):
+        """Anota en una sola transacción las fotos ya trasladadas a usadas/"""
+        if rutas:
+            self._transaccion(lambda conexion: conexion.executemany(
+                'UPDATE fotos SET movida = 1 WHERE ruta = ?', [(str(r),) for r in rutas]))
+
+    def pendientes_de_mover(self, carpeta):
+        """Fotos usadas que siguen en la carpeta de origen (p. ej. de una ejecución cortada)"""
+        with self._lock:
+            return [Path(r) for (r,) in self._conectar().execute(
+                "SELECT ruta FROM fotos WHERE carpeta = ? AND estado = 'usada' AND movida = 0", (str(carpeta),))]
+
+    def disponibles(self, carpeta=None):
+        """Fotos libres (de una carpeta o de todas)"""
+        with self._lock:
+            if carpeta is None:
+                consulta = ("SELECT COUNT(*) FROM fotos WHERE estado = 'libre'", ())
+            else:
+                consulta = ("SELECT COUNT(*) FROM fotos WHERE carpeta = ? AND estado = 'libre'", (str(carpeta),))
+            return self._conectar().execute(*consulta).fetchone()[0]
+
+    def resumen(self):
+        """{estado: fotos} de todo el libro"""
+        with self._lock:
+            conteo = dict(self._conectar().execute('SELECT estado, COUNT(*) FROM fotos GROUP BY estado'))
+        return {estado: conteo.get(estado, 0) for estado in ESTADOS}
+
+    def cerrar(self):
+        """Cierra la conexión de este proceso (el padre, antes de un fork); la siguiente operación reabre"""
+        with self._lock:
+            if self._conexion is not None:
+                if self._pid == os.getpid():
+                    self._conexion.close()
+                else:
+                    self._heredadas.append(self._conexion)
+            self._conexion = None
+
+
+class MovedorUsadas:
+    """Traslada a usadas/ las fotos confirmadas, por lotes y en un hilo de fondo"""
+
+    def __init__(self, libro, mover, tamano_lote=TAMANO_LOTE_MOVER, intervalo=INTERVALO_MOVER):
+        """
+        Args:
+            libro: LibroFotos donde anotar las fotos movidas
+            mover: callable(ruta) -> bool que mueve la foto y su JSON a usadas/
+        """
+        self.libro = libro
+        self.mover = mover
+        self.tamano_lote = max(1, tamano_lote)
+        self.intervalo = intervalo
+        self._cola = None
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.movidas = 0
+        self.errores = 0
+
+    def encolar(self, ruta):
+        with self._lock:
+            if self._hilo is None:
+                self._cola = queue.Queue()
+                self._hilo = threading.Thread(target=self._trabajar, name='movedor-usadas', daemon=True)
+                self._hilo.start()
+            self._cola.put(str(ruta))
+
+    def _trabajar(self):
+        terminar = False
+        while not terminar:
+            lote = []
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                try:
+                    ruta = self._cola.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+                if ruta is None:
+                    terminar = True
+                    break
+                lote.append(ruta)
+            movidas = [ruta for ruta in lote if self.mover(ruta)]
+            try:
+                self.libro.marcar_movidas(movidas)
+            except sqlite3.Error as e:
+                print(f"️ No se pudo anotar el traslado de {len(movidas)} fotos: {e}")
+            self.movidas += len(movidas)
+            self.errores += len(lote) - len(movidas)
+
+    def cerrar(self):
+        """Mueve lo pendiente y detiene el hilo (antes de un fork o al terminar)"""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+            if hilo is not None:
+                self._cola.put(None)
+        if hilo is not None:
+            hilo.join()
+
+    def estadisticas(self):
+        return {'movidas': self.movidas, 'errores': self.errores}
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Pipeline RGBA - Convención de imagen interna del script maestro
+
+La foto viaja por todas las etapas (rembg → refinado → detección → colocación →
+efectos → marco) como un ndarray uint8 contiguo de forma (alto, ancho, 4) en
+orden RGBA. PIL solo se usa donde hace falta (rasterizar texto y pegar sobre la
+plantilla); en esos puntos se envuelve el buffer sin copiarlo.
+
+Cada copia completa de buffer se registra en un ContadorCopias para poder
+reportar los bytes copiados por pasaporte.
+"""
+
+import numpy as np
+from PIL import Image
+
+
+class ContadorCopias:
+    """Acumula las copias de buffer realizadas durante un render"""
+
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Pone los contadores a cero (inicio de un nuevo pasaporte)"""
+        self.copias = 0
+        self.bytes_copiados = 0
+        self.detalle = {}
+
+    def registrar(self, etapa, nbytes):
+        """Registra una copia de `nbytes` bytes atribuida a `etapa`"""
+        nbytes = int(nbytes)
+        self.copias += 1
+        self.bytes_copiados += nbytes
+        self.detalle[etapa] = self.detalle.get(etapa, 0) + nbytes
+
+    def resumen(self):
+        """Devuelve un diccionario con el total y el desglose por etapa"""
+        return {
+            'copias': self.copias,
+            'bytes_copiados': self.bytes_copiados,
+            'mb_copiados': round(self.bytes_copiados / (1024 * 1024), 3),
+            'detalle': dict(self.detalle),
+        }
+
+
+def es_rgba(arr):
+    """True si `arr` cumple la convención del pipeline (uint8, HxWx4, contiguo, escribible)"""
+    return (
+        isinstance(arr, np.ndarray)
+        and arr.dtype == np.uint8
+        and arr.ndim == 3
+        and arr.shape[2] == 4
+        and arr.flags['C_CONTIGUOUS']
+        and arr.flags['WRITEABLE']
+    )
+
+
+def a_rgba(img, contador=None, etapa='a_rgba'):
+    """Convierte una imagen PIL o ndarray a la convención del pipeline.
+
+    Si el ndarray ya cumple la convención se devuelve tal cual (sin copia).
+    """
+    if isinstance(img, np.ndarray):
+        if es_rgba(img):
+            return img
+        arr = np.array(img, dtype=np.uint8, order='C', copy=True)
+        if arr.ndim == 3 and arr.shape[2] == 4:
+            if contador is not None:
+                contador.registrar(etapa, arr.nbytes)
+            return arr
+        img = Image.fromarray(arr)
+
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    arr = np.array(img)
+    if contador is not None:
+        contador.registrar(etapa, arr.nbytes)
+    return arr
+
+
+def a_pil(arr):
+    """Envuelve un ndarray RGBA contiguo como imagen PIL sin copiar el buffer"""
+    alto, ancho = arr.shape[:2]
+    return Image.frombuffer('RGBA', (ancho, alto), arr, 'raw', 'RGBA', 0, 1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Política de recolección de basura - gc.freeze, umbrales y recolección por crecimiento
+
+Antes se llamaba a gc.collect() tras cada registro y en varias limpiezas más.
+Con MediaPipe, onnxruntime, pandas y las fuentes vivos, cada recolección
+completa recorre cientos de miles de objetos que nunca se liberan. La política:
+
+- congelar(): tras cargar modelos, fuentes y plantilla, gc.freeze() pasa esos
+  objetos a la generación permanente (ninguna recolección vuelve a
+  recorrerlos) y se suben los umbrales generacionales (UMBRALES_GC)
+- tal_vez_recolectar(): recolección completa solo si los bloques asignados
+  por Python (sys.getallocatedblocks) crecieron más de umbral_bloques desde
+  la última
+- métricas: un callback de gc mide el tiempo de todas las recolecciones
+  (automáticas y forzadas) y metricas() lo da por cada 1000 registros;
+  cerrar() lo quita de gc.callbacks (llamarlo al sustituir la política)
+"""
+
+import gc
+import sys
+import threading
+import time
+
+
+UMBRALES_GC = (20000, 20, 50)     # gen0 alto: menos recolecciones jóvenes con pandas/numpy
+UMBRAL_BLOQUES = 2_000_000        # Bloques asignados de más antes de una recolección completa
+
+
+def vaciar_cache_gpu():
+    """torch.cuda.empty_cache() solo si torch ya está importado (no lo importa para esto)"""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return
+    try:
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+class PoliticaGC:
+    """Recolección de basura guiada por el crecimiento de asignaciones, con métricas de tiempo"""
+
+    def __init__(self, umbral_bloques=UMBRAL_BLOQUES, umbrales=UMBRALES_GC):
+        self.umbral_bloques = umbral_bloques
+        self.umbrales = umbrales
+        self.congelado = False
+        self.objetos_congelados = 0
+        self._lock = threading.Lock()
+        self._inicio_gc = None
+        self.segundos_gc = 0.0
+        self.colecciones = [0, 0, 0]
+        self.forzadas = 0
+        self.registros = 0
+        self._bloques_base = sys.getallocatedblocks()
+        gc.callbacks.append(self._medir)
+
+    def _medir(self, fase, info):
+        # Las recolecciones se ejecutan con el GIL tomado: nunca se solapan
+        if fase == 'start':
+            self._inicio_gc = time.perf_counter()
+        elif self._inicio_gc is not None:
+            self.segundos_gc += time.perf_counter() - self._inicio_gc
+            self.colecciones[info.get('generation', 2)] += 1
+            self._inicio_gc = None
+
+    def cerrar(self):
+        """Quita el callback de medición de gc.callbacks (la política deja de medir)"""
+        try:
+            gc.callbacks.remove(self._medir)
+        except ValueError:
+            pass
+
+    def congelar(self):
+        """Recolecta una vez, congela lo vivo (modelos, fuentes, plantilla) y ajusta umbrales"""
+        if self.congelado:
+            return self.objetos_congelados
+        gc.collect()
+        gc.freeze()
+        gc.set_threshold(*self.umbrales)
+        self.congelado = True
+        self.objetos_congelados = gc.get_freeze_count()
+        self._bloques_base = sys.getallocatedblocks()
+        return self.objetos_congelados
+
+    def registrar_registros(self, n=1):
+        with self._lock:
+            self.registros += n
+
+    def crecimiento_bloques(self):
+        return sys.getallocatedblocks() - self._bloques_base
+
+    def recolectar(self, vaciar_gpu=True):
+        """Recolección completa (cuenta como forzada) y nueva referencia de crecimiento"""
+        gc.collect()
+        with self._lock:
+            self.forzadas += 1
+            self._bloques_base = sys.getallocatedblocks()
+        if vaciar_gpu:
+            vaciar_cache_gpu()
+
+    def tal_vez_recolectar(self):
+        """Recolecta solo si las asignaciones crecieron más de umbral_bloques; True si recolectó"""
+        if self.crecimiento_bloques() < self.umbral_bloques:
+            return False
+        self.recolectar()
+        return True
+
+    def metricas(self):
+        por_mil = (self.segundos_gc * 1000.0 / self.registros) if self.registros else 0.0
+        return {
+            'segundos_gc': round(self.segundos_gc, 3),
+            'ms_gc_por_1000_registros': round(por_mil * 1000.0, 1),
+            'colecciones_por_generacion': list(self.colecciones),
+            'colecciones_forzadas': self.forzadas,
+            'objetos_congelados': self.objetos_congelados,
+            'registros': self.registros,
+        }
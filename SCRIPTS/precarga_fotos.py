@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Precarga de fotos - Lectura anticipada para ocultar la latencia del almacenamiento
+
+Las fotos se leían justo antes de la inferencia (Image.open en
+_remover_fondo_rgba) y otra vez para su sha256 (huella del PNG y de la capa
+de foto). En un volumen DATA montado por red cada registro se paraba en esas
+lecturas. La precarga:
+
+- anunciar(ruta): en cuanto una foto se asigna a un registro, un hilo de
+  fondo la lee y la decodifica (PIL libera el GIL al decodificar)
+- obtener(ruta): la FotoPrecargada (bytes, imagen decodificada y sha256, que
+  solo se calcula si alguien lo pide: modo incremental o capas); si
+  aún se está leyendo espera y cuenta ese tiempo como espera; None si la foto
+  no se anunció (quien llama la lee del disco como siempre)
+- descartar(ruta): al terminar el render o al liberar la foto
+- capacidad acotada: como mucho `capacidad` fotos anunciadas a la vez; al
+  llenarse se descarta la más antigua
+
+estadisticas() da aciertos (ya en memoria), esperas (en lectura), fallos (no
+anunciadas) y los segundos de espera acumulados.
+"""
+
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+
+class FotoPrecargada:
+    """Foto leída y decodificada en memoria (la imagen se comparte en solo lectura)"""
+
+    __slots__ = ('ruta', 'datos', '_sha256', 'imagen', 'consultada')
+
+    def __init__(self, ruta, datos, imagen):
+        self.ruta = ruta
+        self.datos = datos
+        self._sha256 = None
+        self.imagen = imagen
+        self.consultada = False
+
+    @property
+    def sha256(self):
+        """sha256 de los bytes leídos, calculado la primera vez que se pide"""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.datos).hexdigest()
+        return self._sha256
+
+
+def leer_foto(ruta):
+    """Lee y decodifica una foto (en un hilo de precarga)"""
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    imagen = Image.open(io.BytesIO(datos))
+    imagen.load()
+    return FotoPrecargada(str(ruta), datos, imagen)
+
+
+class PrecargaFotos:
+    """Cache acotada de fotos leídas en segundo plano para los próximos registros"""
+
+    def __init__(self, capacidad=16, hilos=4):
+        self.capacidad = max(1, capacidad)
+        self.hilos = max(1, hilos)
+        self._executor = None
+        self._futuros = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.esperas = 0
+        self.fallos = 0
+        self.errores = 0
+        self.expulsadas = 0
+        self.segundos_espera = 0.0
+
+    def anunciar(self, ruta):
+        """Empieza a leer la foto en segundo plano (idempotente)"""
+        if not ruta:
+            return
+        clave = str(ruta)
+        with self._lock:
+            if clave in self._futuros:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='precarga')
+            while len(self._futuros) >= self.capacidad:
+                _ruta, futuro = self._futuros.popitem(last=False)
+                futuro.cancel()
+                self.expulsadas += 1
+            self._futuros[clave] = self._executor.submit(leer_foto, clave)
+
+    def obtener(self, ruta, contar_fallo=True):
+        """FotoPrecargada de la ruta (esperando si aún se lee) o None si no se anunció o falló
+
+        contar_fallo=False para las consultas secundarias de una foto (no cuentan
+        como un fallo más si no estaba precargada).
+        """
+        if not ruta:
+            return None
+        with self._lock:
+            futuro = self._futuros.get(str(ruta))
+            if futuro is None:
+                self.fallos += contar_fallo
+                return None
+        lista = futuro.done()
+        t0 = time.perf_counter()
+        try:
+            foto = futuro.result()
+        except Exception:
+            with self._lock:
+                self.errores += 1
+            return None
+        espera = time.perf_counter() - t0
+        with self._lock:
+            # Solo la primera consulta de cada foto cuenta (render, capa y huella la piden)
+            if not foto.consultada:
+                foto.consultada = True
+                if lista:
+                    self.aciertos += 1
+                else:
+                    self.esperas += 1
+                    self.segundos_espera += espera
+        return foto
+
+    def descartar(self, ruta):
+        if not ruta:
+            return
+        with self._lock:
+            futuro = self._futuros.pop(str(ruta), None)
+        if futuro is not None:
+            futuro.cancel()
+
+    def cerrar(self):
+        """Cierra los hilos de precarga y vacía la cache (antes de un fork o al terminar)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            futuros = list(self._futuros.values())
+            self._futuros.clear()
+        for futuro in futuros:
+            futuro.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def sumar(self, estadisticas):
+        """Acumula las estadísticas de otra precarga (la de un proceso hijo)"""
+        with self._lock:
+            for clave in ('aciertos', 'esperas', 'fallos', 'errores', 'expulsadas', 'segundos_espera'):
+                setattr(self, clave, getattr(self, clave) + estadisticas.get(clave, 0))
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.esperas + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'esperas': self.esperas,
+            'fallos': self.fallos,
+            'errores': self.errores,
+            'expulsadas': self.expulsadas,
+            'tasa_acierto': round(self.aciertos / consultas, 3) if consultas else 0.0,
+            'segundos_espera': round(self.segundos_espera, 3),
+        }
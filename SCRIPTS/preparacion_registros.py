@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Preparación de registros por lote - Limpieza de texto, fechas y edad vectorizadas
+
+Transforma un bloque del CSV (columnas PRIMER_NOMBRE, SEGUNDO_NOMBRE,
+PRIMER_APELLIDO, SEGUNDO_APELLIDO, FECHA_NACIMIENTO) en columnas ya tipadas que
+el bucle de render consume sin volver a parsear:
+
+- nombre_completo / apellido_completo: normalizados (mayúsculas, sin acentos,
+  espacios simples) con una tabla de traducción y operaciones de cadena de pandas
+- fecha_nacimiento_dt: FECHA_NACIMIENTO parseada una sola vez (NaT si no es válida)
+- fecha_valida, edad (25 por defecto si no hay fecha válida)
+- fecha_nacimiento_pasaporte (DD/MMM/MMM/YYYY) y codigo_verificacion (DD-MM-YY)
+
+Los valores por defecto coinciden con los de los métodos por registro del
+generador (calcular_edad, formatear_fecha_pasaporte); el codigo_verificacion
+solo se calcula aquí ("01-01-00" sin fecha válida).
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+# Acentos y eñe → mayúscula sin diacrítico (mismo criterio que limpiar_texto)
+TABLA_NORMALIZACION = str.maketrans({
+    'á': 'A', 'é': 'E', 'í': 'I', 'ó': 'O', 'ú': 'U',
+    'Á': 'A', 'É': 'E', 'Í': 'I', 'Ó': 'O', 'Ú': 'U',
+    'ñ': 'N', 'Ñ': 'N',
+})
+
+FORMATO_FECHA_NACIMIENTO = '%Y-%m-%d'
+EDAD_POR_DEFECTO = 25
+FECHA_PASAPORTE_POR_DEFECTO = "01/Ene/Jan/2000"
+CODIGO_VERIFICACION_POR_DEFECTO = "01-01-00"
+
+# Meses en español e inglés (primera letra mayúscula, resto minúsculas)
+MESES_ES = {
+    1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr',
+    5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Ago',
+    9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'
+}
+MESES_EN = {
+    1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr',
+    5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Aug',
+    9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
+}
+
+COLUMNAS_PREPARADAS = (
+    'primer_nombre', 'primer_apellido', 'nombre_completo', 'apellido_completo',
+    'fecha_nacimiento_dt', 'fecha_valida', 'edad',
+    'fecha_nacimiento_pasaporte', 'codigo_verificacion',
+)
+
+
+def normalizar_texto(texto):
+    """Versión escalar de normalizar_serie (mayúsculas, sin acentos, espacios simples)"""
+    if texto is None or pd.isna(texto) or texto == '':
+        return ''
+    return ' '.join(str(texto).strip().translate(TABLA_NORMALIZACION).upper().split())
+
+
+def normalizar_serie(serie):
+    """Normaliza una columna de texto completa"""
+    serie = serie.fillna('').astype(str)
+    return (
+        serie.str.translate(TABLA_NORMALIZACION)
+        .str.upper()
+        .str.split()
+        .str.join(' ')
+        .fillna('')
+    )
+
+
+def _unir_partes(primera, segunda):
+    """'PRIMERA SEGUNDA', o solo 'PRIMERA' si la segunda parte está vacía"""
+    return (primera + ' ' + segunda).where(segunda != '', primera)
+
+
+def _columna(df, nombre):
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series('', index=df.index, dtype=object)
+
+
+def parsear_fechas(serie):
+    """Parsea FECHA_NACIMIENTO (YYYY-MM-DD) una sola vez; lo inválido queda como NaT"""
+    serie = serie.fillna('').astype(str).str.strip()
+    return pd.to_datetime(serie, format=FORMATO_FECHA_NACIMIENTO, errors='coerce')
+
+
+def calcular_edades(fechas, hoy=None):
+    """Edad cumplida a `hoy` para una serie datetime64; NaT → EDAD_POR_DEFECTO"""
+    hoy = hoy or date.today()
+    valida = fechas.notna()
+    anio = fechas.dt.year.fillna(hoy.year).to_numpy(dtype=np.int64)
+    mes = fechas.dt.month.fillna(1).to_numpy(dtype=np.int64)
+    dia = fechas.dt.day.fillna(1).to_numpy(dtype=np.int64)
+
+    # Restar un año si aún no ha cumplido años este año
+    no_cumplido = (mes > hoy.month) | ((mes == hoy.month) & (dia > hoy.day))
+    edades = hoy.year - anio - no_cumplido.astype(np.int64)
+    return pd.Series(np.where(valida.to_numpy(), edades, EDAD_POR_DEFECTO), index=fechas.index, dtype=np.int64)
+
+
+def formatear_fechas_pasaporte(fechas, por_defecto=FECHA_PASAPORTE_POR_DEFECTO):
+    """DD/MMM/MMM/YYYY para una serie datetime64; NaT → `por_defecto`"""
+    rellenas = fechas.fillna(pd.Timestamp(2000, 1, 1))
+    mes = rellenas.dt.month
+    texto = (
+        rellenas.dt.day.astype(str).str.zfill(2) + '/'
+        + mes.map(MESES_ES) + '/'
+        + mes.map(MESES_EN) + '/'
+        + rellenas.dt.year.astype(str)
+    )
+    return texto.where(fechas.notna(), por_defecto)
+
+
+def codigos_verificacion(fechas):
+    """DD-MM-YY para una serie datetime64; NaT → CODIGO_VERIFICACION_POR_DEFECTO"""
+    rellenas = fechas.fillna(pd.Timestamp(2000, 1, 1))
+    texto = (
+        rellenas.dt.day.astype(str).str.zfill(2) + '-'
+        + rellenas.dt.month.astype(str).str.zfill(2) + '-'
+        + rellenas.dt.year.astype(str).str[-2:]
+    )
+    return texto.where(fechas.notna(), CODIGO_VERIFICACION_POR_DEFECTO)
+
+
+def preparar_lote(df, hoy=None):
+    """Calcula las COLUMNAS_PREPARADAS para todas las filas de `df`.
+
+    Returns:
+        DataFrame con el mismo índice que `df` y solo las columnas preparadas
+    """
+    primer_nombre = normalizar_serie(_columna(df, 'PRIMER_NOMBRE'))
+    segundo_nombre = normalizar_serie(_columna(df, 'SEGUNDO_NOMBRE'))
+    primer_apellido = normalizar_serie(_columna(df, 'PRIMER_APELLIDO'))
+    segundo_apellido = normalizar_serie(_columna(df, 'SEGUNDO_APELLIDO'))
+    fechas = parsear_fechas(_columna(df, 'FECHA_NACIMIENTO'))
+
+    return pd.DataFrame({
+        'primer_nombre': primer_nombre,
+        'primer_apellido': primer_apellido,
+        'nombre_completo': _unir_partes(primer_nombre, segundo_nombre),
+        'apellido_completo': _unir_partes(primer_apellido, segundo_apellido),
+        'fecha_nacimiento_dt': fechas,
+        'fecha_valida': fechas.notna(),
+        'edad': calcular_edades(fechas, hoy),
+        'fecha_nacimiento_pasaporte': formatear_fechas_pasaporte(fechas),
+        'codigo_verificacion': codigos_verificacion(fechas),
+    }, index=df.index)
+
+
+def anexar_preparacion(df, hoy=None):
+    """Devuelve `df` con las columnas preparadas añadidas (reemplaza las existentes)"""
+    existentes = [c for c in COLUMNAS_PREPARADAS if c in df.columns]
+    base = df.drop(columns=existentes) if existentes else df
+    return base.join(preparar_lote(base, hoy))
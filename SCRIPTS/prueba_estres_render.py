@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés del render concurrente (ScriptMaestroIntegrado.render)
+
+1. Renderiza N registros sintéticos en secuencia y guarda el hash de cada imagen.
+2. Los renderiza de nuevo con K hilos, en orden aleatorio y varias rondas,
+   sobre la MISMA instancia del script maestro.
+3. Cada imagen concurrente debe ser idéntica byte a byte a su referencia
+   secuencial; cualquier diferencia indica datos cruzados entre registros o
+   estado compartido.
+
+Las fotos del pool solo se leen (no se mueven a usadas/).
+"""
+
+import argparse
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from script_maestro_integrado import ScriptMaestroIntegrado, silenciar_hilo
+from verificar_deteccion_proxy import listar_pool
+
+
+NOMBRES = ["MARIA JOSE", "CARLOS EDUARDO", "ANA LUISA", "PEDRO PABLO", "SOFIA VALENTINA", "LUIS ALBERTO"]
+APELLIDOS = ["GONZALEZ PEREZ", "RODRIGUEZ DIAZ", "MARTINEZ LOPEZ", "HERNANDEZ SILVA", "GARCIA TORRES"]
+
+
+def construir_registros(fotos, cantidad):
+    """Registros sintéticos distintos entre sí (mismo esquema que procesar_registro)"""
+    registros = []
+    for i in range(cantidad):
+        numero = str(100000000 + i * 7919)
+        nombre = NOMBRES[i % len(NOMBRES)]
+        apellido = APELLIDOS[i % len(APELLIDOS)]
+        sexo = 'F' if i % 2 == 0 else 'M'
+        dia = f"{(i % 28) + 1:02d}"
+        registros.append({
+            'ruta_foto': str(fotos[i % len(fotos)]),
+            'numero_pasaporte': numero,
+            'numero_pasaporte_1': numero,
+            'numero_pasaporte_2': numero,
+            'nombre_completo': nombre,
+            'apellido_completo': apellido,
+            'fecha_nacimiento': f"{dia}/Ene/Jan/{1970 + i % 30}",
+            'cedula': str(20000000 + i),
+            'fecha_emision': f"{dia}/Mar/Mar/2021",
+            'fecha_vencimiento': f"{dia}/Mar/Mar/2031",
+            'sexo': sexo,
+            'nacionalidad': 'VENEZOLANA',
+            'lugar_nacimiento': 'CARACAS VEN',
+            'codigo_verificacion': f"{dia}-01-{70 + i % 30:02d}",
+            'firma': f"{nombre.split()[0].title()} {apellido.split()[0].title()}",
+            'mrz_linea1': f"P<VEN{apellido.replace(' ', '<')}<<{nombre.replace(' ', '<')}".ljust(44, '<')[:44],
+            'mrz_linea2': f"{numero}0VEN7001011{sexo}3103011<<<<<<<<<<<<<<<6",
+        })
+    return registros
+
+
+def hash_imagen(img):
+    return hashlib.sha256(img.tobytes()).hexdigest()
+
+
+def renderizar(maestro, registro):
+    with silenciar_hilo():
+        img = maestro.render(registro)
+    return hash_imagen(img) if img is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de estrés del render concurrente")
+    parser.add_argument("--registros", type=int, default=12, help="Registros sintéticos (default: 12)")
+    parser.add_argument("--hilos", type=int, default=4, help="Hilos concurrentes (default: 4)")
+    parser.add_argument("--rondas", type=int, default=3, help="Rondas concurrentes (default: 3)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del orden aleatorio")
+    args = parser.parse_args()
+
+    base_path = Path(__file__).resolve().parent.parent
+    fotos = listar_pool(base_path)
+    if not fotos:
+        print(f" No se encontraron fotos en {base_path / 'DATA'}")
+        return 1
+
+    registros = construir_registros(fotos, args.registros)
+    maestro = ScriptMaestroIntegrado()
+
+    print(f" Referencia secuencial: {len(registros)} registros")
+    t0 = time.perf_counter()
+    referencia = [renderizar(maestro, r) for r in registros]
+    t_secuencial = time.perf_counter() - t0
+    if any(h is None for h in referencia):
+        print(" Algún render secuencial falló; revisar fotos y plantilla")
+        return 1
+
+    rng = random.Random(args.semilla)
+    diferencias = 0
+    t_concurrente = 0.0
+    with ThreadPoolExecutor(max_workers=args.hilos) as executor:
+        for ronda in range(1, args.rondas + 1):
+            orden = list(range(len(registros)))
+            rng.shuffle(orden)
+            t0 = time.perf_counter()
+            hashes = list(executor.map(lambda i: (i, renderizar(maestro, registros[i])), orden))
+            t_concurrente += time.perf_counter() - t0
+            errores = [i for i, h in hashes if h != referencia[i]]
+            diferencias += len(errores)
+            estado = "OK" if not errores else f"{len(errores)} diferentes: {sorted(errores)}"
+            print(f"   Ronda {ronda}: {estado}")
+
+    t_ronda = t_concurrente / args.rondas
+    print(f"\n⏱️ Secuencial: {t_secuencial:.2f}s | Concurrente ({args.hilos} hilos): {t_ronda:.2f}s por ronda "
+          f"(x{t_secuencial / t_ronda:.2f})")
+    if diferencias:
+        print(f" {diferencias} renders concurrentes no coinciden con la referencia")
+        return 2
+    print(" Todos los renders concurrentes coinciden con la referencia secuencial")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
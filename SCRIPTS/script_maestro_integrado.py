@@ -9,25 +9,103 @@ Integra todas las implementaciones que ya funcionan correctamente:
 import os
 import sys
 import json
+import math
+import threading
+import contextlib
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageOps
+from PIL.PngImagePlugin import PngInfo
 import argparse
 import cv2
-import cv2
-import os
-import mediapipe as mp
 from pathlib import Path
 try:
-    import onnxruntime as ort  # Aceleración GPU para RetinaFace ONNX
+    import onnxruntime as ort  # Proveedores de ejecución para la sesión de rembg
 except Exception:
     ort = None
 
+from pipeline_rgba import ContadorCopias, a_rgba, a_pil
+from detectores_cara import obtener_detector
+from huella_render import huella_json, huella_recursos, hash_archivo
+from sesion_segmentacion import crear_sesion
+from cajas_texto import campos_sobre_foto
+
+
+# Subir al cambiar cómo se construye una capa (invalida las capas guardadas)
+VERSION_CAPAS = 1
+
+# Datos del registro que se dibujan en la capa de texto
+CAMPOS_CAPA_TEXTO = (
+    'nombre_completo', 'apellido_completo', 'fecha_nacimiento', 'cedula', 'fecha_emision',
+    'fecha_vencimiento', 'sexo', 'nacionalidad', 'lugar_nacimiento', 'codigo_verificacion',
+    'firma', 'fuente_firma', 'mrz_linea1', 'mrz_linea2',
+)
+
+class _SalidaPorHilo:
+    """Proxy de sys.stdout que descarta la salida de los hilos silenciados.
+    
+    contextlib.redirect_stdout cambia sys.stdout para todo el proceso; con
+    varios hilos renderizando, uno silenciaría (o reactivaría) a los demás.
+    """
+    
+    def __init__(self, destino):
+        self._destino = destino
+        self._local = threading.local()
+    
+    def write(self, texto):
+        if getattr(self._local, 'silencio', 0):
+            return len(texto)
+        return self._destino.write(texto)
+    
+    def flush(self):
+        if not getattr(self._local, 'silencio', 0):
+            self._destino.flush()
+    
+    def __getattr__(self, nombre):
+        return getattr(self._destino, nombre)
+
+
+_lock_salida = threading.Lock()
+
+
+@contextlib.contextmanager
+def silenciar_hilo():
+    """Silencia print() solo en el hilo actual (reentrante)"""
+    with _lock_salida:
+        if not isinstance(sys.stdout, _SalidaPorHilo):
+            sys.stdout = _SalidaPorHilo(sys.stdout)
+        salida = sys.stdout
+    salida._local.silencio = getattr(salida._local, 'silencio', 0) + 1
+    try:
+        yield
+    finally:
+        salida._local.silencio -= 1
+
+
 class ScriptMaestroIntegrado:
-    def __init__(self, config_path=None):
-        """Inicializa el script maestro con configuración"""
+    """Renderiza pasaportes sobre la plantilla limpia.
+    
+    render(datos) es reentrante: todo dato por registro llega como argumento, y
+    el estado mutable (contador de copias, detectores de cara) es por hilo.
+    Plantilla, fuentes y sesión de rembg se comparten en solo lectura (la
+    ejecución de ONNX Runtime es thread-safe).
+    """
+    
+    def __init__(self, config_path=None, hilos_onnx=None):
+        """Inicializa el script maestro con configuración
+        
+        Args:
+            config_path: config.json (por defecto CONFIG/config.json del proyecto)
+            hilos_onnx: hilos intra/inter-op de la sesión de rembg (None = los de ONNX Runtime)
+        """
+        # Estado por hilo (contador de copias, resumen del último render)
+        self._estado_hilo = threading.local()
+        self._lock_fuentes = threading.Lock()
+        self._lock_plantilla = threading.Lock()
+        self.plantilla_cache = None
+        
         # Base del proyecto: carpeta padre de SCRIPTS/
         self.base_path = Path(__file__).resolve().parent.parent
         # Ruta de configuración por defecto dentro del proyecto actual
@@ -53,6 +131,9 @@ class ScriptMaestroIntegrado:
         # Control de contenedores individuales
         self.mostrar_contenedores_individuales = False
         
+        # Pipeline de foto en ndarray RGBA: mapas de reducción de alfa por tamaño de contenedor
+        self._mapas_reduccion_alpha = {}
+        
         # Lista blanca de fuentes para firmas (simulan trazos manuscritos naturales)
         self.fuentes_firma_whitelist = [
             "BrittanySignature.ttf",
@@ -75,37 +156,96 @@ class ScriptMaestroIntegrado:
         except Exception as e:
             print(f"   ️ No se pudo habilitar OpenCL en OpenCV: {e}")
 
-        # Inicializar MediaPipe Face Mesh con preferencia GPU (controlado por env MEDIAPIPE_GPU)
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=True,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5
-        )
-
-        # OPTIMIZACIÓN: ONNX Runtime eliminado (reemplazado por OpenCV)
-        self.ort_session = None
-        self.ort_input_name = None
-        self.ort_input_size = (640, 640)
-        print(f"   ️ ONNX Runtime deshabilitado (usando OpenCV)")
+        # Detección de rostro: backend del registro (detectores_cara), proxy reducido
+        # (lado_max_proxy=0 → resolución completa) y refinamiento de iris opcional
+        deteccion_config = self.config.get('deteccion_rostro', {})
+        self.backend_deteccion = deteccion_config.get('backend', 'face_mesh')
+        self.lado_max_proxy = int(deteccion_config.get('lado_max_proxy', 0) or 0)
+        self.refinar_iris = bool(deteccion_config.get('refinar_iris', True))
+        self.factores_ancho = deteccion_config.get('factores_ancho', {})
+        self.obtener_detector_cara(self.backend_deteccion)
+        print(f"    Detector de rostro: {self.backend_deteccion} (proxy {self.lado_max_proxy or 'completo'})")
 
-        # Inicializar sesión persistente de rembg con preferencia CUDA
+        # Inicializar sesión persistente de rembg con preferencia CUDA; opciones de ONNX Runtime
+        # y modelo FP32/INT8 desde la sección "segmentacion" de config.json (sesion_segmentacion)
         self.rembg_session = None
+        self.rembg_providers = []
+        self.modelo_segmentacion = None
+        self.hilos_onnx = hilos_onnx
         try:
-            from rembg import new_session
             rembg_providers = []
             if ort is not None and hasattr(ort, 'get_available_providers') and 'CUDAExecutionProvider' in ort.get_available_providers():
                 rembg_providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
             else:
                 rembg_providers = ['CPUExecutionProvider']
-            # Modelos posibles: 'u2net', 'u2net_human_seg', 'isnet-anime', etc. Usar el estándar u2net_human_seg
-            self.rembg_session = new_session('u2net_human_seg', providers=rembg_providers)
-            print(f"    rembg sesión inicializada ({rembg_providers})")
+            self.rembg_session, self.modelo_segmentacion = crear_sesion(
+                self.config, self.base_path, rembg_providers, hilos_onnx
+            )
+            self.rembg_providers = rembg_providers
+            # Hilos intra-op reales (la configuración puede fijarlos por encima del plan)
+            self.hilos_onnx = self.rembg_session.inner_session.get_session_options().intra_op_num_threads
+            print(f"    rembg sesión inicializada: {self.modelo_segmentacion} ({rembg_providers}, "
+                  f"{self.hilos_onnx or 'auto'} hilos intra-op)")
         except Exception as e:
             self.rembg_session = None
             print(f"   ️ No se pudo inicializar sesión rembg: {e}")
         
+        # Render por capas (foto y texto por separado): solo si la foto no se solapa con ningún texto
+        self._huella_recursos = None
+        self.capas_separables = self._capas_separables()
+        
+        # PrecargaFotos compartida (la asigna el generador): fotos ya leídas, hasheadas y decodificadas
+        self.precarga_fotos = None
+        
+        # Plantilla decodificada antes de cualquier render concurrente
+        self.cargar_plantilla_clean()
+        
+    def calentar(self):
+        """Inferencia de calentamiento de rembg sobre una imagen neutra (plantilla ya cargada)
+
+        Deja inicializado lo que haría el primer render (arena de memoria y
+        optimización del grafo de ONNX Runtime); con el servidor fork los hijos
+        lo heredan ya hecho.
+        """
+        self.cargar_plantilla_clean()
+        if self.rembg_session is None:
+            return False
+        try:
+            from rembg import remove
+            remove(Image.new('RGB', (320, 320), (128, 128, 128)), session=self.rembg_session)
+            return True
+        except Exception as e:
+            print(f"   ️ Calentamiento de rembg fallido: {e}")
+            return False
+    
+    @property
+    def contador_copias(self):
+        """ContadorCopias del hilo actual (cada render cuenta solo sus copias)"""
+        contador = getattr(self._estado_hilo, 'contador', None)
+        if contador is None:
+            contador = ContadorCopias()
+            self._estado_hilo.contador = contador
+        return contador
+    
+    @property
+    def ultimo_resumen_copias(self):
+        """Resumen de copias del último render hecho en el hilo actual"""
+        return getattr(self._estado_hilo, 'ultimo_resumen_copias', None)
+    
+    @property
+    def detector_cara(self):
+        """Detector de rostro configurado, instancia propia del hilo actual"""
+        return self.obtener_detector_cara(self.backend_deteccion)
+    
+    def obtener_detector_cara(self, backend=None, **opciones):
+        """Devuelve el detector cacheado (por hilo) del registro con las opciones de la configuración"""
+        backend = backend or self.backend_deteccion
+        if backend == 'face_mesh':
+            opciones.setdefault('refinar_iris', self.refinar_iris)
+        if backend in self.factores_ancho:
+            opciones.setdefault('factor_ancho', float(self.factores_ancho[backend]))
+        return obtener_detector(backend, **opciones)
+    
     def _precargar_fuentes_comunes(self):
         """OPTIMIZACIÓN: Precarga las fuentes más comunes para evitar recargar"""
         print(" Precargando fuentes comunes...")
@@ -123,11 +263,9 @@ class ScriptMaestroIntegrado:
         
         for fuente in fuentes_comunes:
             for tamano in tamanos_comunes:
-                cache_key = f"{fuente}_{tamano}"
                 try:
-                    font = self._cargar_fuente_optimizada(fuente, tamano)
-                    if font:
-                        self.font_cache[cache_key] = font
+                    # Queda cacheada con su clave en píxeles
+                    self._cargar_fuente_optimizada(fuente, tamano)
                 except Exception:
                     pass  # Si falla, se carga bajo demanda
         
@@ -140,13 +278,18 @@ class ScriptMaestroIntegrado:
         cache_key = f"{font_name}_{font_size_px}"
         
         # Verificar cache primero
-        if cache_key in self.font_cache:
-            return self.font_cache[cache_key]
-        
-        # Si no está en cache, cargar y guardar
-        font = self._cargar_fuente_original(font_name, font_size_pt, dpi)
-        if font:
-            self.font_cache[cache_key] = font
+        font = self.font_cache.get(cache_key)
+        if font is not None:
+            return font
+        
+        # Si no está en cache, cargar y guardar (una sola vez aunque haya varios hilos).
+        # Las fuentes se comparten en solo lectura: PIL rasteriza con el GIL tomado.
+        with self._lock_fuentes:
+            font = self.font_cache.get(cache_key)
+            if font is None:
+                font = self._cargar_fuente_original(font_name, font_size_pt, dpi)
+                if font:
+                    self.font_cache[cache_key] = font
         return font
 
     def _cargar_fuente_original(self, font_name, font_size_pt, dpi=96):
@@ -237,20 +380,24 @@ class ScriptMaestroIntegrado:
         """OPTIMIZACIÓN: Carga la plantilla limpia usando cache reutilizable"""
         try:
             # Si ya tenemos la plantilla en cache, reutilizarla
-            if hasattr(self, 'plantilla_cache') and self.plantilla_cache is not None:
+            if self.plantilla_cache is not None:
                 return self.plantilla_cache
             
             # Si no existe, cargarla una sola vez
-            if self.plantilla_clean_path.exists():
+            with self._lock_plantilla:
+                if self.plantilla_cache is not None:
+                    return self.plantilla_cache
+                if not self.plantilla_clean_path.exists():
+                    print(f" No se encontró la plantilla limpia: {self.plantilla_clean_path}")
+                    return None
                 img = Image.open(self.plantilla_clean_path)
-                # Guardar en cache para reutilización (SIN COPY para mantener la misma instancia)
+                # Decodificar ya: la carga perezosa de PIL no es segura entre hilos
+                img.load()
+                # Guardar en cache para reutilización (solo lectura; cada render convierte su copia)
                 self.plantilla_cache = img
                 print(f" Plantilla limpia cargada y cacheada: {self.plantilla_clean_path}")
                 print(f" Dimensiones: {img.width}x{img.height}")
                 return img
-            else:
-                print(f" No se encontró la plantilla limpia: {self.plantilla_clean_path}")
-                return None
         except Exception as e:
             print(f" Error al cargar plantilla limpia: {e}")
             return None
@@ -345,55 +492,71 @@ class ScriptMaestroIntegrado:
                 for j in range(-thickness_int // 2, thickness_int // 2 + 1):
                     draw.text((x + i, y + j), text, font=font, fill=fill)
     
-    def remover_fondo_rembg(self, ruta_imagen):
-        """Remover fondo usando rembg (método que ya funcionaba)"""
+    def _foto_precargada(self, ruta_imagen):
+        """FotoPrecargada de la ruta si la precarga la tiene (None = leer del disco)"""
+        if self.precarga_fotos is None:
+            return None
+        # El generador ya la consultó antes del render: aquí un fallo no cuenta otra vez
+        return self.precarga_fotos.obtener(ruta_imagen, contar_fallo=False)
+    
+    def _remover_fondo_rgba(self, ruta_imagen):
+        """Remueve el fondo con rembg y devuelve un ndarray RGBA contiguo (única decodificación)"""
         try:
             from rembg import remove
             
-            # Cargar imagen
-            with open(ruta_imagen, 'rb') as f:
-                input_data = f.read()
-            
-            # Eliminar fondo con IA
-            if self.rembg_session is not None:
-                output_data = remove(input_data, session=self.rembg_session)
-            else:
-                output_data = remove(input_data)
-            
-            # Convertir a PIL
-            from io import BytesIO
-            img_pil = Image.open(BytesIO(output_data))
+            # Pasar la imagen PIL directamente evita codificar/decodificar PNG intermedio;
+            # la precargada ya está decodificada y se comparte (no se cierra)
+            foto = self._foto_precargada(ruta_imagen)
+            entrada = contextlib.nullcontext(foto.imagen) if foto is not None else Image.open(ruta_imagen)
+            with entrada as img_entrada:
+                if self.rembg_session is not None:
+                    img_salida = remove(img_entrada, session=self.rembg_session)
+                else:
+                    img_salida = remove(img_entrada)
             
-            return img_pil
+            return a_rgba(img_salida, self.contador_copias, 'rembg')
         except Exception as e:
             print(f"    Error rembg: {e}")
             return None
     
-    def refinar_contorno(self, img):
-        """Refinar contorno con erosión y feather (método que ya funcionaba)"""
+    def remover_fondo_rembg(self, ruta_imagen):
+        """Remover fondo usando rembg (método que ya funcionaba)"""
+        arr = self._remover_fondo_rgba(ruta_imagen)
+        return a_pil(arr) if arr is not None else None
+    
+    def _refinar_contorno_rgba(self, arr):
+        """Erosión + feather del canal alfa, en sitio sobre el ndarray RGBA
+        
+        Solo para arrays propios del pipeline (salida de _remover_fondo_rgba);
+        con un array del llamador usar refinar_contorno, que copia.
+        """
         try:
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-            
-            alpha = img.split()[-1]
-            alpha_array = np.array(alpha)
+            # El canal alfa es una vista con stride; OpenCV necesita un plano contiguo
+            alpha = np.ascontiguousarray(arr[:, :, 3])
+            self.contador_copias.registrar('refinar_alfa', alpha.nbytes)
             
             # Erosión ligera
             kernel = np.ones((3,3), np.uint8)
-            alpha_eroded = cv2.erode(alpha_array, kernel, iterations=1)
+            cv2.erode(alpha, kernel, dst=alpha, iterations=1)
             
             # Feather
-            alpha_feathered = cv2.GaussianBlur(alpha_eroded, (5, 5), 2)
-            
-            # Reconstruir
-            img_array = np.array(img)
-            img_array[:, :, 3] = alpha_feathered
-            img_refinada = Image.fromarray(img_array, 'RGBA')
+            cv2.GaussianBlur(alpha, (5, 5), 2, dst=alpha)
             
-            return img_refinada
+            arr[:, :, 3] = alpha
         except Exception as e:
             print(f"    Error refinando: {e}")
-            return img
+        return arr
+    
+    def refinar_contorno(self, img):
+        """Refinar contorno con erosión y feather (método que ya funcionaba)
+        
+        No modifica `img`: un ndarray RGBA que a_rgba devolvería tal cual se copia.
+        """
+        arr = a_rgba(img, self.contador_copias, 'refinar_entrada')
+        if arr is img:
+            arr = arr.copy()
+            self.contador_copias.registrar('refinar_entrada', arr.nbytes)
+        return a_pil(self._refinar_contorno_rgba(arr))
     
     def calcular_distancia_al_borde(self, mask, x, y):
         """Calcula la distancia al borde más cercano de la máscara"""
@@ -413,83 +576,36 @@ class ScriptMaestroIntegrado:
         return min_distance if min_distance != float('inf') else radius
     
     def procesar_imagen_desde_cero(self, ruta_imagen):
-        """Procesa una imagen desde cero: eliminar fondo, refinar, detectar cara, escalar, recortar"""
+        """Procesa una imagen desde cero: eliminar fondo y refinar contorno.
+        
+        La imagen se devuelve como ndarray RGBA a resolución original; la
+        colocación en el contenedor (escala + traslación) se aplica después en
+        un único remuestreo.
+        """
         # Paso 1: Remover fondo con rembg (método que ya funcionaba)
-        img_sin_fondo = self.remover_fondo_rembg(ruta_imagen)
-        if img_sin_fondo is None:
+        arr_sin_fondo = self._remover_fondo_rgba(ruta_imagen)
+        if arr_sin_fondo is None:
             return None
         
-        # Paso 2: Refinar contorno
-        img_refinada = self.refinar_contorno(img_sin_fondo)
-        
-        # Paso 3: Detectar cara y escalar
-        img_final = self.detectar_cara_y_escalar(img_refinada)
-        
-        return img_final
+        # Paso 2: Refinar contorno (en sitio: el array es nuestro, recién salido de rembg)
+        return self._refinar_contorno_rgba(arr_sin_fondo)
     
     def detectar_cara_y_escalar(self, img):
-        """Detecta la cara y escala; prioriza ONNX (CUDA) y cae a MediaPipe o simple."""
-        # 1) Intentar ONNX RetinaFace si está disponible
-        if self.ort_session is not None:
-            try:
-                # Preprocesar a 640x640 RGB
-                img_rgb = img.convert('RGB')
-                import numpy as np  # local import para mantener dependencias
-                arr = np.array(img_rgb)
-                h0, w0 = arr.shape[:2]
-                arr_res = cv2.resize(arr, self.ort_input_size, interpolation=cv2.INTER_LINEAR)
-                # Normalización básica [0,1] y CHW
-                inp = arr_res.astype('float32') / 255.0
-                inp = np.transpose(inp, (2, 0, 1))[None, ...]
-                # Inferencia
-                outputs = self.ort_session.run(None, {self.ort_input_name: inp})
-                # Nota: Diferentes exportes entregan (loc, conf, landms) o un set de cajas ya decodificadas.
-                # Para mantener compatibilidad sin romper flujo, aplicamos heurística:
-                # - Si algún output tiene forma (N, 5) lo tratamos como [x1,y1,x2,y2,score]
-                bbox = None
-                for out in outputs:
-                    if isinstance(out, np.ndarray) and out.ndim == 2 and out.shape[1] >= 5:
-                        # Tomar la caja con mayor score
-                        idx = int(np.argmax(out[:, 4]))
-                        x1, y1, x2, y2, sc = out[idx, :5]
-                        if sc > 0.3:
-                            # Reescalar a tamaño original
-                            x1 = max(0, min(w0 - 1, int(x1 / self.ort_input_size[0] * w0)))
-                            x2 = max(0, min(w0 - 1, int(x2 / self.ort_input_size[0] * w0)))
-                            y1 = max(0, min(h0 - 1, int(y1 / self.ort_input_size[1] * h0)))
-                            y2 = max(0, min(h0 - 1, int(y2 / self.ort_input_size[1] * h0)))
-                            bbox = (x1, y1, x2, y2)
-                            break
-                if bbox is not None:
-                    x1, y1, x2, y2 = bbox
-                    # Expandir ligeramente la caja y recortar
-                    pad_x = int((x2 - x1) * 0.15)
-                    pad_y = int((y2 - y1) * 0.20)
-                    x1 = max(0, x1 - pad_x)
-                    y1 = max(0, y1 - pad_y)
-                    x2 = min(w0, x2 + pad_x)
-                    y2 = min(h0, y2 + pad_y)
-                    face = img.crop((x1, y1, x2, y2))
-                    return face
-            except Exception as e:
-                # ONNX falló, continuar con MediaPipe
-                print(f"   ️ Fallback a MediaPipe (ONNX no decodificado): {e}")
-
-        # 2) MediaPipe Face Mesh
+        """Detecta la cara y escala a 200px de ancho de cara; cae a escalado simple.
+        
+        Legacy: el pipeline de gafetes ya no lo usa; la colocación se hace en
+        recortar_imagen_por_contenedor con un único remuestreo.
+        """
+        # Detector configurado (Face Mesh por defecto)
         try:
-            import numpy as np
-            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGBA2RGB)
-            results = self.face_mesh.process(img_cv)
-            if not results.multi_face_landmarks:
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            geometria = self._detectar_geometria_cara(img)
+            if geometria is None:
                 return self._escalar_simple(img)
-            landmarks = results.multi_face_landmarks[0]
-            h, w = img_cv.shape[:2]
-            left_eye = [landmarks.landmark[33].x * w, landmarks.landmark[33].y * h]
-            right_eye = [landmarks.landmark[362].x * w, landmarks.landmark[362].y * h]
-            eye_center = [(left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2]
-            face_width = abs(right_eye[0] - left_eye[0]) * 2.5
+            w, h = img.size
             target_face_width = 200
-            scale_factor = target_face_width / max(face_width, 1e-6)
+            scale_factor = target_face_width / geometria['ancho_cara']
             new_w = max(1, int(w * scale_factor))
             new_h = max(1, int(h * scale_factor))
             img_scaled = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
@@ -514,54 +630,50 @@ class ScriptMaestroIntegrado:
             print(f"    Error en escalado simple: {e}")
             return img
     
+    def _mapa_reduccion_alpha(self, alto, ancho):
+        """Reducción de alfa por distancia al centro (cacheada por tamaño de contenedor)"""
+        clave = (alto, ancho)
+        mapa = self._mapas_reduccion_alpha.get(clave)
+        if mapa is None:
+            center_x, center_y = ancho // 2, alto // 2
+            yy, xx = np.ogrid[:alto, :ancho]
+            distance = np.sqrt((xx - center_x) ** 2 + (yy - center_y) ** 2)
+            max_distance = max(np.sqrt(center_x ** 2 + center_y ** 2), 1e-6)
+            mapa = (255 * (distance / max_distance * 0.3)).astype(np.uint8)
+            self._mapas_reduccion_alpha[clave] = mapa
+        return mapa
+    
+    def _aplicar_efectos_rgba(self, arr):
+        """Escala de grises tono 217, transparencia gradual y blur sutil, en sitio y vectorizado"""
+        alpha = arr[:, :, 3]
+        visibles = alpha > 0  # Solo procesar píxeles no transparentes
+        
+        # Escala de grises (0.299R + 0.587G + 0.114B) truncada, ajustada a tono 217
+        rgb = arr[:, :, :3].astype(np.uint32)
+        gray = (rgb[:, :, 0] * 299 + rgb[:, :, 1] * 587 + rgb[:, :, 2] * 114) // 1000
+        gray = (gray * 217 // 255).astype(np.uint8)
+        arr[visibles, :3] = gray[visibles, None]
+        
+        # Transparencia gradual: restar la reducción por distancia al centro (saturando en 0)
+        reduccion = self._mapa_reduccion_alpha(arr.shape[0], arr.shape[1])
+        np.subtract(alpha, np.minimum(alpha, reduccion), out=alpha)
+        
+        # Blur sutil
+        cv2.GaussianBlur(arr, (0, 0), 0.5, dst=arr)
+        return arr
+    
     def aplicar_efectos_imagen(self, img):
         """Aplica efectos de integración con el fondo a la imagen con escala de grises tono 217"""
         print("    Aplicando efectos de integración con fondo y escala de grises tono 217...")
         
-        # Asegurar que la imagen esté en RGBA para preservar transparencia
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-        
-        # Convertir a numpy array para procesamiento
-        data = np.array(img)
-        
-        # Crear una copia para trabajar
-        result = data.copy()
-        
-        # Aplicar escala de grises con tono 217 (extraído de plantilla real)
-        for y in range(data.shape[0]):
-            for x in range(data.shape[1]):
-                if data[y, x, 3] > 0:  # Solo procesar píxeles no transparentes
-                    # Convertir a escala de grises
-                    gray = int(0.299 * data[y, x, 0] + 0.587 * data[y, x, 1] + 0.114 * data[y, x, 2])
-                    
-                    # Aplicar ajuste para lograr tono 217 (extraído de plantilla real)
-                    factor_ajuste = 217.0 / 255.0  # Factor fijo basado en el tono objetivo
-                    gray = int(gray * factor_ajuste)
-                    gray = max(0, min(255, gray))  # Asegurar rango válido
-                    
-                    # Aplicar el valor de gris a todos los canales RGB
-                    result[y, x, 0] = gray
-                    result[y, x, 1] = gray
-                    result[y, x, 2] = gray
-                    
-                    # Aplicar transparencia gradual (reducir alpha)
-                    center_x, center_y = data.shape[1] // 2, data.shape[0] // 2
-                    distance = np.sqrt((x - center_x)**2 + (y - center_y)**2)
-                    max_distance = np.sqrt(center_x**2 + center_y**2)
-                    
-                    # Reducir transparencia gradualmente
-                    alpha_reduction = int(255 * (distance / max_distance * 0.3))
-                    result[y, x, 3] = max(0, data[y, x, 3] - alpha_reduction)
-        
-        # Convertir de vuelta a imagen
-        img_final = Image.fromarray(result, 'RGBA')
-        
-        # Aplicar blur sutil
-        img_final = img_final.filter(ImageFilter.GaussianBlur(radius=0.5))
+        arr = a_rgba(img, self.contador_copias, 'efectos_entrada')
+        if arr is img:
+            arr = arr.copy()
+            self.contador_copias.registrar('efectos_entrada', arr.nbytes)
+        self._aplicar_efectos_rgba(arr)
         
         print("    Efectos aplicados: escala de grises tono 217, transparencia gradual, blur sutil")
-        return img_final
+        return a_pil(arr)
     
     def integrar_solo_contorno_persona(self, img):
         """Integra solo el contorno de la persona, eliminando fondo y marco"""
@@ -642,188 +754,199 @@ class ScriptMaestroIntegrado:
         
         return min_distance if min_distance != float('inf') else radius
     
-    def recortar_imagen_por_contenedor(self, img, target_width, target_height):
-        """Recorta la imagen para que no se salga del contenedor usando Face Mesh"""
-        try:
-            # Importar MediaPipe
-            import mediapipe as mp
-            import cv2
-            import numpy as np
-            
-            # Inicializar Face Mesh con GPU
-            mp_face_mesh = mp.solutions.face_mesh
-            face_mesh = mp_face_mesh.FaceMesh(
-                static_image_mode=True,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5
-            )
-            
-            # Detectar rostro
-            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGBA2RGB)
-            results = face_mesh.process(img_cv)
-            
-            if not results.multi_face_landmarks:
-                # Si no se detecta rostro, usar método simple
-                return self._recortar_simple(img, target_width, target_height)
-            
-            landmarks = results.multi_face_landmarks[0]
-            h, w = img_cv.shape[:2]
-            
-            # Puntos clave
-            left_eye = [landmarks.landmark[33].x * w, landmarks.landmark[33].y * h]
-            right_eye = [landmarks.landmark[362].x * w, landmarks.landmark[362].y * h]
-            eye_center = [(left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2]
-            face_width = abs(right_eye[0] - left_eye[0]) * 2.5
-            
+    def _detectar_geometria_cara(self, img, lado_max_proxy=None, detector=None):
+        """Detecta la cara y devuelve su geometría en píxeles de la imagen fuente.
+        
+        Usa el detector configurado (o el indicado). Si lado_max_proxy > 0 y la
+        imagen es mayor, la detección corre sobre un proxy reducido y se
+        proyecta a la resolución completa. Acepta ndarray RGBA o imagen PIL.
+        
+        Returns:
+            dict con 'centro_ojos' (x, y), 'ancho_cara', 'caja' y 'backend', o None si no hay rostro
+        """
+        if lado_max_proxy is None:
+            lado_max_proxy = self.lado_max_proxy
+        if detector is None:
+            detector = self.detector_cara
+        return detector.detectar(np.asarray(img), lado_max_proxy, self.contador_copias)
+    
+    def _calcular_transformacion_contenedor(self, geometria, ancho_src, alto_src, target_width, target_height):
+        """Compone escala y traslación fuente → contenedor en una sola transformación.
+        
+        Returns:
+            (escala, tx, ty) tal que x_contenedor = x_fuente * escala + tx
+        """
+        if geometria is not None:
             # Escalar basado en ancho del rostro
             target_face_width = target_width * 0.65  # Zoom reducido (más torso visible)
-            scale_factor = target_face_width / face_width
-            
-            # Redimensionar
-            new_w = int(w * scale_factor)
-            new_h = int(h * scale_factor)
-            img_scaled = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            
-            # Calcular posición del centro del rostro en imagen escalada
-            eye_center_x = eye_center[0] * scale_factor
-            eye_center_y = eye_center[1] * scale_factor
+            escala = target_face_width / geometria['ancho_cara']
             
             # Posición objetivo en contenedor (ojos al 45% de altura)
             target_x = target_width // 2 - 15  # CENTRO horizontal del contenedor (ajustado para centrado visual)
             target_y = int(target_height * 0.45)  # Ojos al 45% de altura (imagen más abajo)
             
-            # Calcular offset para centrar
-            offset_x = target_x - eye_center_x
-            offset_y = target_y - eye_center_y
-            
-            # Crear lienzo del tamaño del contenedor
-            canvas = Image.new('RGBA', (target_width, target_height), (0, 0, 0, 0))
-            
-            # Pegar imagen en posición calculada
-            paste_x = int(offset_x)
-            paste_y = int(offset_y)
-            
-            # Asegurar que no se salga del lienzo
-            if paste_x < 0:
-                crop_left = -paste_x
-                paste_x = 0
-            else:
-                crop_left = 0
-            
-            if paste_y < 0:
-                crop_top = -paste_y
-                paste_y = 0
-            else:
-                crop_top = 0
-            
-            # Recortar imagen si es necesario
-            if crop_left > 0 or crop_top > 0:
-                img_cropped = img_scaled.crop((crop_left, crop_top, 
-                                              min(img_scaled.width, crop_left + target_width),
-                                              min(img_scaled.height, crop_top + target_height)))
-            else:
-                img_cropped = img_scaled
-            
-            # Pegar en lienzo
-            canvas.paste(img_cropped, (paste_x, paste_y), img_cropped)
-            
-            print(f"   ️ Imagen recortada con Face Mesh: {img.size} → {target_width}x{target_height}")
+            eye_x, eye_y = geometria['centro_ojos']
+            tx = target_x - eye_x * escala
+            ty = target_y - eye_y * escala
+        else:
+            # Sin rostro: ajustar completa y centrar
+            escala = min(target_width / ancho_src, target_height / alto_src)
+            tx = (target_width - int(ancho_src * escala)) // 2
+            ty = (target_height - int(alto_src * escala)) // 2
+        
+        return escala, tx, ty
+    
+    def _aplicar_transformacion(self, arr, escala, tx, ty, target_width, target_height):
+        """Aplica la transformación con un único remuestreo sobre el lienzo del contenedor.
+        
+        Solo se remuestrea la región de la fuente que cae dentro del contenedor
+        (vista ROI del ndarray, sin copia), con INTER_AREA al reducir y
+        LANCZOS4 al ampliar.
+        """
+        h, w = arr.shape[:2]
+        canvas = np.zeros((target_height, target_width, 4), np.uint8)
+        
+        # Región visible en coordenadas de la fuente (ampliada a píxeles enteros)
+        sx0 = max(0, math.floor(-tx / escala))
+        sy0 = max(0, math.floor(-ty / escala))
+        sx1 = min(w, math.ceil((target_width - tx) / escala))
+        sy1 = min(h, math.ceil((target_height - ty) / escala))
+        if sx1 <= sx0 or sy1 <= sy0:
             return canvas
-            
+        
+        # Destino de esa región en el contenedor
+        dx0 = int(round(tx + sx0 * escala))
+        dy0 = int(round(ty + sy0 * escala))
+        dw = max(1, int(round((sx1 - sx0) * escala)))
+        dh = max(1, int(round((sy1 - sy0) * escala)))
+        interpolacion = cv2.INTER_AREA if escala < 1 else cv2.INTER_LANCZOS4
+        parche = cv2.resize(arr[sy0:sy1, sx0:sx1], (dw, dh), interpolation=interpolacion)
+        
+        # Recortar al lienzo
+        cx0, cy0 = max(0, dx0), max(0, dy0)
+        cx1, cy1 = min(target_width, dx0 + dw), min(target_height, dy0 + dh)
+        if cx1 <= cx0 or cy1 <= cy0:
+            return canvas
+        parche = parche[cy0 - dy0:cy1 - dy0, cx0 - dx0:cx1 - dx0]
+        
+        # Equivalente a pegar con su propia máscara sobre lienzo transparente
+        alpha = parche[:, :, 3:4].astype(np.uint16)
+        canvas[cy0:cy1, cx0:cx1] = (parche * alpha + 127) // 255
+        return canvas
+    
+    def recortar_imagen_por_contenedor(self, img, target_width, target_height):
+        """Coloca la imagen en el contenedor (escala + recorte) con un solo remuestreo usando el detector de rostro.
+        
+        Acepta ndarray RGBA o imagen PIL y devuelve un ndarray RGBA del tamaño del contenedor.
+        """
+        arr = a_rgba(img, self.contador_copias, 'recortar_entrada')
+        
+        try:
+            geometria = self._detectar_geometria_cara(arr)
         except Exception as e:
-            print(f"    Error recortando con Face Mesh: {e}")
-            return self._recortar_simple(img, target_width, target_height)
+            print(f"    Error detectando cara ({self.backend_deteccion}): {e}")
+            geometria = None
+        
+        alto, ancho = arr.shape[:2]
+        escala, tx, ty = self._calcular_transformacion_contenedor(
+            geometria, ancho, alto, target_width, target_height
+        )
+        canvas = self._aplicar_transformacion(arr, escala, tx, ty, target_width, target_height)
+        
+        metodo = geometria['backend'] if geometria is not None else "método simple"
+        print(f"   ️ Imagen recortada ({metodo}): {ancho}x{alto} → {target_width}x{target_height} (escala {escala:.3f})")
+        return canvas
     
     def _recortar_simple(self, img, target_width, target_height):
-        """Método simple de recorte como fallback"""
+        """Método simple de recorte como fallback (ajustar y centrar)"""
         try:
-            current_width, current_height = img.size
-            scale_x = target_width / current_width
-            scale_y = target_height / current_height
-            scale = min(scale_x, scale_y)
-            
-            new_width = int(current_width * scale)
-            new_height = int(current_height * scale)
-            
-            img_scaled = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            canvas = Image.new('RGBA', (target_width, target_height), (0, 0, 0, 0))
-            
-            paste_x = (target_width - new_width) // 2
-            paste_y = (target_height - new_height) // 2
-            
-            canvas.paste(img_scaled, (paste_x, paste_y), img_scaled)
-            
-            print(f"   ️ Imagen recortada (método simple): {current_width}x{current_height} → {target_width}x{target_height}")
-            return canvas
+            arr = a_rgba(img, self.contador_copias, 'recortar_entrada')
+            alto, ancho = arr.shape[:2]
+            escala, tx, ty = self._calcular_transformacion_contenedor(
+                None, ancho, alto, target_width, target_height
+            )
+            return self._aplicar_transformacion(arr, escala, tx, ty, target_width, target_height)
         except Exception as e:
             print(f"    Error en recorte simple: {e}")
             return img
     
-    def crear_marco_semitransparente(self, img, target_width, target_height):
-        """Crea un marco semi-transparente DENTRO de las dimensiones existentes"""
-        print("   ️ Creando marco semi-transparente dentro del contenedor...")
-        
-        # Crear una copia de la imagen para trabajar
-        img_con_marco = img.copy()
+    def _dibujar_marco_rgba(self, arr):
+        """Dibuja el marco semi-transparente en sitio (mismos píxeles que ImageDraw.rectangle)"""
+        h, w = arr.shape[:2]
         
-        # Crear marco semi-transparente DENTRO de las dimensiones existentes
-        from PIL import ImageDraw
-        draw = ImageDraw.Draw(img_con_marco)
-        
-        # Marco exterior (borde más visible) - dentro del contenedor
+        # Marco exterior (borde más visible), ancho 2 - dentro del contenedor
         marco_color_exterior = (240, 240, 240, 100)  # Gris claro con más opacidad
-        draw.rectangle([0, 0, target_width-1, target_height-1], 
-                      outline=marco_color_exterior, width=2)
+        arr[:2, :] = marco_color_exterior
+        arr[h-2:, :] = marco_color_exterior
+        arr[:, :2] = marco_color_exterior
+        arr[:, w-2:] = marco_color_exterior
         
-        # Marco interior (borde más sutil) - dentro del contenedor
+        # Marco interior (borde más sutil), ancho 1 - dentro del contenedor
         marco_color_interior = (250, 250, 250, 60)  # Gris más claro con más opacidad
-        draw.rectangle([2, 2, target_width-3, target_height-3], 
-                      outline=marco_color_interior, width=1)
+        arr[2, 2:w-2] = marco_color_interior
+        arr[h-3, 2:w-2] = marco_color_interior
+        arr[2:h-2, 2] = marco_color_interior
+        arr[2:h-2, w-3] = marco_color_interior
+        return arr
+    
+    def crear_marco_semitransparente(self, img, target_width, target_height):
+        """Crea un marco semi-transparente DENTRO de las dimensiones existentes"""
+        print("   ️ Creando marco semi-transparente dentro del contenedor...")
+        
+        # Trabajar sobre una copia de la imagen
+        arr = np.array(img, dtype=np.uint8)
+        self.contador_copias.registrar('marco_copia', arr.nbytes)
+        self._dibujar_marco_rgba(arr)
         
         print("    Marco semi-transparente creado dentro del contenedor")
-        return img_con_marco
+        return a_pil(arr)
     
     def insertar_imagen_con_efectos(self, img_base, ruta_foto):
         """Inserta la imagen con procesamiento completo desde imagen original"""
-        print(f"    Procesando imagen original: {ruta_foto}")
-        
-        # Procesar imagen desde cero (eliminar fondo, refinar, detectar cara, escalar)
-        img_procesada = self.procesar_imagen_desde_cero(ruta_foto)
-        if img_procesada is None:
-            print(" Error procesando imagen original")
+        capa_foto = self.crear_capa_foto(ruta_foto)
+        if capa_foto is None:
             return img_base
         
+        # Pegar imagen en la plantilla (envoltura PIL sin copia)
+        pos_x, pos_y = self._posicion_foto()
+        img_base.paste(capa_foto, (pos_x, pos_y), capa_foto)
+        
+        print(f"    Imagen procesada e insertada en posición ({pos_x}, {pos_y}) con dimensiones {capa_foto.width}x{capa_foto.height}")
+        print(f"    Procesamiento completo: IA elimina fondo → suaviza bordes → colocación (1 remuestreo) → escala de grises tono 217")
+        return img_base
+    
+    def _posicion_foto(self):
+        posicion = self.config['field_mapping']['ruta_foto']['position']
+        return posicion['x'], posicion['y']
+    
+    def crear_capa_foto(self, ruta_foto):
+        """Capa de foto: contenedor RGBA con la foto procesada, efectos y marco (None si falla)"""
+        print(f"    Procesando imagen original: {ruta_foto}")
+        
         # Obtener configuración de la foto
         foto_config = self.config['field_mapping'].get('ruta_foto')
         if not foto_config:
             print("    Error: Configuración de foto no encontrada")
-            return img_base
+            return None
+        
+        # Procesar imagen desde cero (eliminar fondo, refinar) a resolución original
+        arr_procesada = self.procesar_imagen_desde_cero(ruta_foto)
+        if arr_procesada is None:
+            print(" Error procesando imagen original")
+            return None
         
-        # Obtener dimensiones y posición
+        # Obtener dimensiones del contenedor
         target_width = foto_config['size']['width']
         target_height = foto_config['size']['height']
-        pos_x = foto_config['position']['x']
-        pos_y = foto_config['position']['y']
         
-        # Recortar imagen ANTES de redimensionar para que no se salga del marco
-        img_recortada = self.recortar_imagen_por_contenedor(img_procesada, target_width, target_height)
+        # Detectar cara y colocar en el contenedor con un único remuestreo
+        arr_contenedor = self.recortar_imagen_por_contenedor(arr_procesada, target_width, target_height)
         
-        # Redimensionar imagen manteniendo proporciones
-        img_recortada = img_recortada.resize((target_width, target_height), Image.Resampling.LANCZOS)
-        
-        # Aplicar efectos de integración con escala de grises tono 217
-        img_recortada = self.aplicar_efectos_imagen(img_recortada)
-        
-        # Crear marco semi-transparente alrededor de la imagen
-        img_con_marco = self.crear_marco_semitransparente(img_recortada, target_width, target_height)
-        
-        # Pegar imagen en la plantilla
-        img_base.paste(img_con_marco, (pos_x, pos_y), img_con_marco)
-        
-        print(f"    Imagen procesada e insertada en posición ({pos_x}, {pos_y}) con dimensiones {target_width}x{target_height}")
-        print(f"    Procesamiento completo: IA elimina fondo → suaviza bordes → escalado → escala de grises tono 217")
-        return img_base
+        # Efectos de integración (escala de grises tono 217) y marco, en sitio
+        print("    Aplicando efectos de integración con fondo y escala de grises tono 217...")
+        self._aplicar_efectos_rgba(arr_contenedor)
+        self._dibujar_marco_rgba(arr_contenedor)
+        return a_pil(arr_contenedor)
     
     def insertar_numero_pasaporte1(self, img_base, numero_pasaporte="108641398"):
         """Inserta el número de pasaporte N°PASAPORTE1 con configuración final"""
@@ -1337,7 +1460,8 @@ class ScriptMaestroIntegrado:
                 print(f"      Ancho total: {ancho_total}px")
                 
                 # Aplicar espaciado mínimo para centrar cada elemento en su contenedor
-                field_config['letter_spacing'] = 0.5
+                # (copia local: la configuración compartida no se modifica)
+                field_config = dict(field_config, letter_spacing=0.5)
             else:
                 # Si no se puede dividir, usar ancho estándar
                 ancho_estandar = 200
@@ -1942,11 +2066,137 @@ class ScriptMaestroIntegrado:
         
         return img_base
     
-    def generar_gafete_integrado(self, ruta_foto, numero_pasaporte="108641398"):
-        """Genera un gafete con las implementaciones integradas incluyendo firma"""
+    def render(self, datos, ruta_foto=None, capas_dir=None):
+        """Renderiza el pasaporte de un registro y devuelve la imagen RGB.
+        
+        Reentrante: todos los datos del registro llegan en `datos` (mismo esquema
+        que GeneradorPasaportesMasivo.procesar_registro) y no se modifica estado
+        compartido, por lo que varios hilos pueden renderizar a la vez.
+        
+        Args:
+            datos: diccionario del registro (ruta_foto, numero_pasaporte, nombre_completo, ...)
+            ruta_foto: foto a usar; por defecto datos['ruta_foto']
+            capas_dir: carpeta propia del registro donde guardar y reutilizar sus capas
+        """
+        ruta_foto = ruta_foto or datos.get('ruta_foto')
+        numero_pasaporte = datos.get('numero_pasaporte') or datos.get('numero_pasaporte_1') or "108641398"
+        return self.generar_gafete_integrado(ruta_foto, numero_pasaporte, datos=datos, capas_dir=capas_dir)
+    
+    @property
+    def ultimo_resumen_capas(self):
+        """{'foto': ..., 'texto': ...} ('reutilizada' o 'generada') del último render por capas del hilo"""
+        return getattr(self._estado_hilo, 'ultimo_resumen_capas', None)
+    
+    def _capas_separables(self):
+        """True si ningún campo de texto puede dibujar tinta dentro del contenedor de la foto
+        
+        Solo entonces pegar la foto sobre la capa de texto (plantilla + textos) da
+        el mismo resultado que el orden original (foto primero, textos encima).
+        Las cajas salen de las métricas de las fuentes (SCRIPTS/cajas_texto.py).
+        """
+        solapados = campos_sobre_foto(self.config, self.obtener_fuente)
+        if solapados:
+            print(f"   ️ Campos sobre la foto ({', '.join(solapados)}): render por capas desactivado")
+            return False
+        return True
+    
+    def _huella_capa_foto(self, ruta_foto):
+        """Huella de la capa de foto: contenido de la foto, contenedor y detección de rostro"""
+        foto = self._foto_precargada(ruta_foto)
+        return huella_json({
+            'version': VERSION_CAPAS,
+            'foto': foto.sha256 if foto is not None else hash_archivo(ruta_foto),
+            'contenedor': self.config['field_mapping'].get('ruta_foto'),
+            'deteccion_rostro': self.config.get('deteccion_rostro'),
+            'segmentacion': self.modelo_segmentacion,
+        })
+    
+    def _huella_capa_texto(self, numero_pasaporte, datos):
+        """Huella de la capa de texto: datos dibujados, campos de texto, fuentes y plantilla"""
+        if self._huella_recursos is None:
+            self._huella_recursos = huella_recursos(self.base_path)
+        return huella_json({
+            'version': VERSION_CAPAS,
+            'numero_pasaporte': numero_pasaporte,
+            'datos': {campo: datos.get(campo) for campo in CAMPOS_CAPA_TEXTO},
+            'campos': {k: v for k, v in self.config.get('field_mapping', {}).items() if k != 'ruta_foto'},
+            'fuentes': self.config.get('fonts'),
+            'plantilla': self.config.get('template_settings'),
+            'recursos': self._huella_recursos,
+        })
+    
+    def _cargar_capa(self, ruta, huella):
+        """Capa RGBA guardada si su huella coincide (None si no existe o cambió algo de lo que depende)"""
+        try:
+            with Image.open(ruta) as img:
+                if getattr(img, 'text', {}).get('huella') != huella:
+                    return None
+                capa = img.convert('RGBA')
+        except (OSError, ValueError):
+            return None
+        self.contador_copias.registrar(f'capa_{ruta.stem}_cargada', capa.width * capa.height * 4)
+        return capa
+    
+    def _guardar_capa(self, capa, ruta, huella):
+        """Guarda la capa con su huella (escritura atómica: temporal y rename)"""
+        info = PngInfo()
+        info.add_text('huella', huella)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_name(f'.{ruta.name}.tmp')
+        capa.save(temporal, format='PNG', pnginfo=info, compress_level=1)
+        os.replace(temporal, ruta)
+    
+    def _componer_por_capas(self, img_base, ruta_foto, numero_pasaporte, datos, capas_dir):
+        """Capa de texto (plantilla + textos) y capa de foto, reconstruyendo solo las que cambiaron
+        
+        Las capas se guardan en capas_dir/texto.png y capas_dir/foto.png con su huella.
+        """
+        capas_dir = Path(capas_dir)
+        resumen = {}
+        
+        ruta_texto = capas_dir / 'texto.png'
+        huella_texto = self._huella_capa_texto(numero_pasaporte, datos)
+        capa_texto = self._cargar_capa(ruta_texto, huella_texto)
+        if capa_texto is None:
+            capa_texto = self.insertar_textos(img_base, numero_pasaporte, datos)
+            self._guardar_capa(capa_texto, ruta_texto, huella_texto)
+            resumen['texto'] = 'generada'
+        else:
+            resumen['texto'] = 'reutilizada'
+        
+        ruta_capa_foto = capas_dir / 'foto.png'
+        huella_foto = self._huella_capa_foto(ruta_foto) if ruta_foto and Path(ruta_foto).exists() else None
+        capa_foto = self._cargar_capa(ruta_capa_foto, huella_foto) if huella_foto else None
+        if capa_foto is None:
+            capa_foto = self.crear_capa_foto(ruta_foto)
+            if capa_foto is not None and huella_foto:
+                self._guardar_capa(capa_foto, ruta_capa_foto, huella_foto)
+            resumen['foto'] = 'generada'
+        else:
+            resumen['foto'] = 'reutilizada'
+        
+        if capa_foto is not None:
+            capa_texto.paste(capa_foto, self._posicion_foto(), capa_foto)
+        self._estado_hilo.ultimo_resumen_capas = resumen
+        print(f"    Capas: texto {resumen['texto']}, foto {resumen['foto']}")
+        return capa_texto
+    
+    def generar_gafete_integrado(self, ruta_foto, numero_pasaporte="108641398", datos=None, capas_dir=None):
+        """Genera un gafete con las implementaciones integradas incluyendo firma
+        
+        Si no se pasan `datos`, se usa el atributo legacy `datos_pasaporte`
+        (no apto para uso concurrente; preferir render()). Con `capas_dir` la foto
+        y los textos se generan como capas separadas que se guardan y se reutilizan
+        mientras no cambie nada de lo que dependen (ver _componer_por_capas).
+        """
         print(" GENERANDO GAFETE CON IMPLEMENTACIONES INTEGRADAS + FIRMA")
         print("=" * 70)
         
+        if datos is None:
+            datos = getattr(self, 'datos_pasaporte', {}) or {}
+        
+        self.contador_copias.reiniciar()
+        
         # Cargar plantilla limpia
         img_base = self.cargar_plantilla_clean()
         if img_base is None:
@@ -1954,13 +2204,28 @@ class ScriptMaestroIntegrado:
         
         # Convertir a RGBA para poder pegar imágenes con transparencia
         img_base = img_base.convert('RGBA')
+        self.contador_copias.registrar('plantilla_rgba', img_base.width * img_base.height * 4)
         
-        # 1. Insertar imagen con efectos
-        img_base = self.insertar_imagen_con_efectos(img_base, ruta_foto)
+        if capas_dir is not None and self.capas_separables:
+            img_base = self._componer_por_capas(img_base, ruta_foto, numero_pasaporte, datos, capas_dir)
+        else:
+            # 1. Insertar imagen con efectos
+            img_base = self.insertar_imagen_con_efectos(img_base, ruta_foto)
+            img_base = self.insertar_textos(img_base, numero_pasaporte, datos)
         
-        # Obtener datos del pasaporte si están disponibles
-        datos = getattr(self, 'datos_pasaporte', {})
+        # Convertir de vuelta a RGB para guardar (solo se extrae el plano alfa)
+        img_final = Image.new('RGB', img_base.size, (255, 255, 255))
+        img_final.paste(img_base, mask=img_base.getchannel('A'))
+        self.contador_copias.registrar('salida_rgb', img_base.width * img_base.height * 4)
+        
+        resumen_copias = self.contador_copias.resumen()
+        self._estado_hilo.ultimo_resumen_copias = resumen_copias
+        print(f"    Copias de buffer: {resumen_copias['copias']} ({resumen_copias['mb_copiados']:.2f} MB)")
         
+        return img_final
+    
+    def insertar_textos(self, img_base, numero_pasaporte, datos):
+        """Dibuja todos los campos de texto, la firma y la MRZ del registro sobre img_base"""
         # USAR UNA SOLA VARIABLE PARA EL NÚMERO DE PASAPORTE
         # Todos los campos tomarán el valor de esta variable
         # PRIORIZAR el número de pasaporte de los datos sobre el parámetro
@@ -1978,8 +2243,6 @@ class ScriptMaestroIntegrado:
         img_base = self.insertar_pais_emisor(img_base, "VEN")
         # 6. Insertar campos de texto estándar (tamaños ajustados)
         # Usar datos dinámicos si están disponibles, sino usar datos por defecto
-        datos = getattr(self, 'datos_pasaporte', {})
-        
         nombre = datos.get('nombre_completo', 'LA MASCARA')
         apellido = datos.get('apellido_completo', 'PLANTILLAS VIRTUALES')
         fecha_nacimiento = datos.get('fecha_nacimiento', '14 / Ago / Ago / 1997')
@@ -2011,7 +2274,7 @@ class ScriptMaestroIntegrado:
         img_base = self.insertar_texto_estandar(img_base, "codigo_barras", codigo_verificacion)
         
         # 7. Insertar firma (más grande, negritas y centrada) con fuente personalizada
-        fuente_firma = getattr(self, 'datos_pasaporte', {}).get('fuente_firma')
+        fuente_firma = datos.get('fuente_firma')
         # Aumentar el tamaño de la firma para que llene mejor el contenedor
         img_base = self.insertar_firma_texto(img_base, firma, fuente_personalizada=fuente_firma)
         
@@ -2021,11 +2284,7 @@ class ScriptMaestroIntegrado:
         # 9. Insertar letra final2
         img_base = self.insertar_letra_final2(img_base, mrz_linea2)
         
-        # Convertir de vuelta a RGB para guardar
-        img_final = Image.new('RGB', img_base.size, (255, 255, 255))
-        img_final.paste(img_base, mask=img_base.split()[-1])
-        
-        return img_final
+        return img_base
     
     def crear_plantillas_integradas(self):
         """Crea plantillas con las implementaciones integradas"""
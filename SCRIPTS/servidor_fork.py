@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Servidor fork - Procesos trabajadores que heredan modelos ya cargados (copy-on-write)
+
+Cada proceso que crea su propio ScriptMaestroIntegrado paga la sesión de
+rembg/onnxruntime con la carga del modelo, el grafo de MediaPipe, la plantilla
+y la precarga de fuentes. Con el servidor fork el proceso padre carga todo una
+vez, hace una inferencia de calentamiento y luego hace fork: los hijos
+comparten esas páginas copy-on-write y arrancan en milisegundos.
+
+- antes del fork el padre debe quedar con un solo hilo: sin pool de render y
+  sin grafos de MediaPipe (se cierran; cada hijo los vuelve a crear al primer
+  render, es barato). La sesión de ONNX Runtime se crea con un hilo intra/
+  inter-op, así no tiene pool de hilos que el fork dejaría a medias
+- gc.freeze() justo antes del fork: las recolecciones de los hijos no tocan
+  los objetos heredados y no rompen el copy-on-write. Al terminar solo se
+  descongela si antes no había nada congelado: si el padre ya había
+  congelado (PoliticaGC.congelar) sus objetos siguen en la generación
+  permanente
+- cada hijo se fija a su bloque de núcleos (PlanColocacion), ejecuta su
+  trabajo y devuelve un resumen JSON por una tubería con su tiempo de
+  arranque y su memoria (RSS y PSS: la PSS reparte las páginas compartidas)
+
+Solo POSIX (os.fork) y sin CUDA en el padre; si no, el generador procesa en
+un único proceso como siempre.
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+
+import psutil
+
+from colocacion_hilos import fijar_afinidad
+
+
+BYTES_POR_MB = 1024 * 1024
+
+
+def fork_disponible():
+    return hasattr(os, 'fork')
+
+
+def memoria_proceso_mb():
+    """(rss, pss) del proceso actual en MB; pss = rss donde no se puede medir"""
+    proceso = psutil.Process()
+    try:
+        info = proceso.memory_full_info()
+        rss = info.rss / BYTES_POR_MB
+        return rss, getattr(info, 'pss', info.rss) / BYTES_POR_MB
+    except (psutil.Error, OSError):
+        rss = proceso.memory_info().rss / BYTES_POR_MB
+        return rss, rss
+
+
+class ServidorFork:
+    """Lanza un proceso hijo por trabajo desde un padre ya caliente y recoge sus resúmenes"""
+
+    def __init__(self, plan=None, al_iniciar_hijo=None):
+        """
+        Args:
+            plan: PlanColocacion con un bloque de CPUs por hijo (None = sin afinidad)
+            al_iniciar_hijo: callable(indice) que se ejecuta en el hijo nada más nacer
+                (descartar estado heredado que no sobrevive al fork)
+        """
+        self.plan = plan
+        self.al_iniciar_hijo = al_iniciar_hijo
+        self.hijos = []
+
+    def ejecutar(self, trabajos, funcion):
+        """Ejecuta funcion(indice, trabajo) en un hijo por trabajo; devuelve sus resúmenes en orden
+
+        Cada resumen: indice, pid, arranque_ms, rss_mb, pss_mb, segundos y
+        'resultado' (lo que devolvió funcion, serializable a JSON) o 'error'.
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        congelados_antes = gc.get_freeze_count()
+        gc.freeze()
+        lanzados = []
+        for indice, trabajo in enumerate(trabajos):
+            lectura, escritura = os.pipe()
+            t_fork = time.monotonic()
+            pid = os.fork()
+            if pid == 0:
+                os.close(lectura)
+                self._ejecutar_hijo(indice, trabajo, funcion, t_fork, escritura)
+            os.close(escritura)
+            lanzados.append((indice, pid, lectura))
+
+        self.hijos = []
+        for indice, pid, lectura in lanzados:
+            with os.fdopen(lectura, 'r', encoding='utf-8') as f:
+                contenido = f.read()
+            _pid, estado = os.waitpid(pid, 0)
+            try:
+                resumen = json.loads(contenido)
+            except ValueError:
+                resumen = {'indice': indice, 'pid': pid, 'error': f"terminó sin resumen (estado {estado})"}
+            self.hijos.append(resumen)
+        # gc.unfreeze() descongela todo: solo si el freeze de arriba fue el único
+        if not congelados_antes:
+            gc.unfreeze()
+        return self.hijos
+
+    def _ejecutar_hijo(self, indice, trabajo, funcion, t_fork, escritura):
+        """Cuerpo del proceso hijo: nunca vuelve (os._exit)"""
+        codigo = 0
+        resumen = {'indice': indice, 'pid': os.getpid(),
+                   'arranque_ms': round((time.monotonic() - t_fork) * 1000.0, 2)}
+        try:
+            if self.plan is not None and self.plan.afinidad:
+                fijar_afinidad(self.plan.cpus_de(indice))
+            if self.al_iniciar_hijo is not None:
+                self.al_iniciar_hijo(indice)
+            t0 = time.perf_counter()
+            resumen['resultado'] = funcion(indice, trabajo)
+            resumen['segundos'] = round(time.perf_counter() - t0, 3)
+        except BaseException as e:
+            resumen['error'] = f"{type(e).__name__}: {e}"
+            codigo = 1
+        try:
+            resumen['rss_mb'], resumen['pss_mb'] = (round(v, 1) for v in memoria_proceso_mb())
+            with os.fdopen(escritura, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(resumen, ensure_ascii=False, default=str))
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(codigo)
+
+    def resumen(self):
+        if not self.hijos:
+            return {}
+        arranques = [h['arranque_ms'] for h in self.hijos if 'arranque_ms' in h]
+        return {
+            'procesos': len(self.hijos),
+            'errores': sum(1 for h in self.hijos if 'error' in h),
+            'arranque_ms_medio': round(sum(arranques) / len(arranques), 2) if arranques else None,
+            'rss_total_mb': round(sum(h.get('rss_mb', 0.0) for h in self.hijos), 1),
+            'pss_total_mb': round(sum(h.get('pss_mb', 0.0) for h in self.hijos), 1),
+        }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Sesión de segmentación - Opciones de ONNX Runtime y modelo INT8 para rembg
+
+La sesión de rembg (u2net_human_seg) se creaba con las opciones por defecto de
+ONNX Runtime. La sección "segmentacion" de CONFIG/config.json las controla:
+
+    "segmentacion": {
+        "modelo": "u2net_human_seg",
+        "int8": false,
+        "ruta_int8": "OUTPUT/modelos/u2net_human_seg_int8.onnx",
+        "sesion_onnx": {
+            "nivel_optimizacion": "all",      (disable, basic, extended, all)
+            "hilos_intra": 0,                 (0 = hilos del plan de colocación o CPUs disponibles)
+            "hilos_inter": 0,
+            "modo_ejecucion": "secuencial",   (secuencial, paralelo)
+            "arena_cpu": true,
+            "patron_memoria": true
+        }
+    }
+
+Con "int8": true se usa la copia cuantizada dinámicamente (pesos uint8)
+generada en local con SCRIPTS/cuantizar_segmentacion.py a partir de los pesos
+FP32 de rembg; si no existe se avisa y se sigue con FP32. Ese script compara
+además latencia y máscaras FP32 frente a INT8 sobre el pool de fotos.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from colocacion_hilos import cpus_disponibles
+
+try:
+    import onnxruntime as ort
+except Exception:
+    ort = None
+
+
+MODELO_SEGMENTACION = 'u2net_human_seg'
+RUTA_INT8 = 'OUTPUT/modelos/u2net_human_seg_int8.onnx'
+
+NIVELES_OPTIMIZACION = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+MODOS_EJECUCION = {
+    'secuencial': 'ORT_SEQUENTIAL',
+    'paralelo': 'ORT_PARALLEL',
+}
+
+
+def config_segmentacion(config):
+    """Sección "segmentacion" de config.json con los valores por defecto"""
+    seccion = dict((config or {}).get('segmentacion') or {})
+    seccion.setdefault('modelo', MODELO_SEGMENTACION)
+    seccion.setdefault('int8', False)
+    seccion.setdefault('ruta_int8', RUTA_INT8)
+    seccion['sesion_onnx'] = dict(seccion.get('sesion_onnx') or {})
+    return seccion
+
+
+def opciones_sesion(config, hilos_onnx=None):
+    """ort.SessionOptions a partir de segmentacion.sesion_onnx
+
+    Los hilos explícitos de la configuración mandan; con 0 se usan hilos_onnx
+    (el reparto del plan de colocación) y, si tampoco hay, las CPUs disponibles.
+    Nunca se deja 0: rembg lo sustituiría por OMP_NUM_THREADS, que
+    limitar_hilos_nativos fija al reparto de BLAS.
+    """
+    opciones_config = config_segmentacion(config)['sesion_onnx']
+    opciones = ort.SessionOptions()
+
+    nivel = opciones_config.get('nivel_optimizacion', 'all')
+    if nivel not in NIVELES_OPTIMIZACION:
+        raise ValueError(f"nivel_optimizacion desconocido: {nivel} ({', '.join(NIVELES_OPTIMIZACION)})")
+    opciones.graph_optimization_level = getattr(ort.GraphOptimizationLevel, NIVELES_OPTIMIZACION[nivel])
+
+    modo = opciones_config.get('modo_ejecucion', 'secuencial')
+    if modo not in MODOS_EJECUCION:
+        raise ValueError(f"modo_ejecucion desconocido: {modo} ({', '.join(MODOS_EJECUCION)})")
+    opciones.execution_mode = getattr(ort.ExecutionMode, MODOS_EJECUCION[modo])
+
+    por_defecto = hilos_onnx or len(cpus_disponibles())
+    opciones.intra_op_num_threads = int(opciones_config.get('hilos_intra', 0) or por_defecto)
+    opciones.inter_op_num_threads = int(opciones_config.get('hilos_inter', 0) or por_defecto)
+    opciones.enable_cpu_mem_arena = bool(opciones_config.get('arena_cpu', True))
+    opciones.enable_mem_pattern = bool(opciones_config.get('patron_memoria', True))
+    return opciones
+
+
+def ruta_modelo_fp32(modelo=MODELO_SEGMENTACION):
+    """Ruta de los pesos FP32 de rembg (los descarga si aún no están)"""
+    from rembg.sessions import sessions_class
+
+    for clase in sessions_class:
+        if clase.name() == modelo:
+            return Path(clase.download_models())
+    raise ValueError(f"Modelo de rembg desconocido: {modelo}")
+
+
+def ruta_int8(config, base_path):
+    ruta = Path(config_segmentacion(config)['ruta_int8'])
+    return ruta if ruta.is_absolute() else Path(base_path) / ruta
+
+
+def crear_sesion(config, base_path, proveedores, hilos_onnx=None):
+    """Sesión de rembg según la configuración; devuelve (sesión, nombre del modelo usado)"""
+    from rembg import new_session
+
+    seccion = config_segmentacion(config)
+    opciones = opciones_sesion(config, hilos_onnx)
+    if seccion['int8']:
+        ruta = ruta_int8(config, base_path)
+        if ruta.exists():
+            sesion = new_session('u2net_custom', sess_opts=opciones, providers=proveedores, model_path=str(ruta))
+            return sesion, f"{seccion['modelo']}_int8"
+        print(f"   ️ Modelo INT8 no encontrado ({ruta}); generar con SCRIPTS/cuantizar_segmentacion.py. Se usa FP32")
+    return new_session(seccion['modelo'], sess_opts=opciones, providers=proveedores), seccion['modelo']
+
+
+def cuantizar_modelo(origen, destino):
+    """Cuantización dinámica (pesos uint8) de origen a destino, con metadatos en destino.json
+
+    uint8 en los pesos: las convoluciones pasan a ConvInteger, que el proveedor
+    de CPU solo implementa para uint8.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from huella_render import hash_archivo
+
+    origen, destino = Path(origen), Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + '.tmp')
+    quantize_dynamic(str(origen), str(temporal), weight_type=QuantType.QUInt8)
+    os.replace(temporal, destino)
+    metadatos = {
+        'origen': str(origen),
+        'origen_sha256': hash_archivo(origen),
+        'tipo_pesos': 'uint8',
+        'onnxruntime': ort.__version__ if ort is not None else None,
+        'mb_fp32': round(origen.stat().st_size / 1024 / 1024, 1),
+        'mb_int8': round(destino.stat().st_size / 1024 / 1024, 1),
+    }
+    destino.with_suffix('.json').write_text(json.dumps(metadatos, indent=2), encoding='utf-8')
+    return metadatos
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Síntesis de campos por lote - Número de pasaporte, cédula, lugar, fechas y MRZ
+
+Genera para N registros (ya preparados por preparacion_registros.py) los campos
+sintéticos del pasaporte con aritmética vectorizada de NumPy:
+
+- numero_pasaporte, cedula, lugar_nacimiento
+- fecha_emision y fecha_vencimiento (DD/MMM/MMM/YYYY)
+- mrz_linea1 y mrz_linea2 (44 caracteres)
+
+Cada registro tiene su propio flujo aleatorio SplitMix64 derivado de
+(semilla, clave del registro), así que el resultado de un registro no depende
+del tamaño del lote ni de su posición: con la misma semilla y el mismo CSV se
+obtienen exactamente los mismos valores. La clave es el hash del CORREO (más el
+número de aparición si está repetido) o, sin CORREO, el índice de la fila.
+
+Es la única implementación de estos campos: el generador ya no tiene
+métodos por registro y preparar_registro lee las columnas de este lote (un
+registro suelto se sintetiza como lote de una fila).
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from preparacion_registros import MESES_ES, MESES_EN, normalizar_texto
+
+
+# Constantes de SplitMix64 (Steele, Lea y Flood 2014)
+GAMMA_SPLITMIX = np.uint64(0x9E3779B97F4A7C15)
+MEZCLA_1 = np.uint64(0xBF58476D1CE4E5B9)
+MEZCLA_2 = np.uint64(0x94D049BB133111EB)
+
+# Índice de sub-flujo por campo: añadir campos nuevos al final no altera los existentes
+CAMPO_PASAPORTE = 1
+CAMPO_CEDULA = 2
+CAMPO_LUGAR = 3
+CAMPO_EMISION = 4
+CAMPO_CHECK_PASAPORTE = 5
+CAMPO_CHECK_ADICIONAL = 6
+CAMPO_CHECK_FINAL = 7
+
+FECHA_MRZ_POR_DEFECTO = pd.Timestamp(1990, 1, 1)
+LONGITUD_MRZ = 44
+
+COLUMNAS_SINTETIZADAS = (
+    'numero_pasaporte', 'cedula', 'lugar_nacimiento',
+    'fecha_emision', 'fecha_vencimiento', 'mrz_linea1', 'mrz_linea2',
+)
+
+
+def claves_hex(claves):
+    """Claves uint64 como texto hexadecimal de 16 dígitos (para diarios y JSON)"""
+    return [format(int(k), '016x') for k in np.asarray(claves, dtype=np.uint64)]
+
+
+def splitmix64(x):
+    """Función de mezcla de SplitMix64 sobre un array uint64 (aritmética módulo 2^64)"""
+    x = np.asarray(x, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        z = x + GAMMA_SPLITMIX
+        z = (z ^ (z >> np.uint64(30))) * MEZCLA_1
+        z = (z ^ (z >> np.uint64(27))) * MEZCLA_2
+    return z ^ (z >> np.uint64(31))
+
+
+def claves_registro(df):
+    """Clave uint64 estable por registro (CORREO + número de aparición, o índice)"""
+    if 'CORREO' in df.columns:
+        correos = df['CORREO'].fillna('').astype(str).str.strip().str.lower()
+        base = pd.util.hash_pandas_object(correos, index=False).to_numpy(dtype=np.uint64)
+        aparicion = correos.groupby(correos).cumcount().to_numpy(dtype=np.uint64)
+        return base ^ splitmix64(aparicion)
+    return splitmix64(np.arange(len(df), dtype=np.uint64))
+
+
+def estados_registro(semilla, claves):
+    """Estado inicial del flujo de cada registro"""
+    return splitmix64(splitmix64(np.uint64(semilla & 0xFFFFFFFFFFFFFFFF)) ^ claves)
+
+
+def enteros(estados, campo, minimo, maximo):
+    """Entero uniforme en [minimo, maximo] por registro, del sub-flujo `campo`"""
+    with np.errstate(over='ignore'):
+        x = splitmix64(estados + np.uint64(campo) * GAMMA_SPLITMIX)
+    # 53 bits altos → [0, 1); rangos de este módulo muy inferiores a 2^53
+    unidad = (x >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+    amplitud = np.asarray(maximo, dtype=np.int64) - np.asarray(minimo, dtype=np.int64) + 1
+    return np.asarray(minimo, dtype=np.int64) + np.floor(unidad * amplitud).astype(np.int64)
+
+
+def formatear_fechas(fechas):
+    """DD/MMM/MMM/YYYY para una serie datetime64 sin NaT"""
+    mes = fechas.dt.month
+    return (
+        fechas.dt.day.astype(str).str.zfill(2) + '/'
+        + mes.map(MESES_ES) + '/'
+        + mes.map(MESES_EN) + '/'
+        + fechas.dt.year.astype(str)
+    )
+
+
+def _fechas_desde_partes(anio, mes, dia, index):
+    """Construye fechas a partir de componentes; combinaciones inexistentes → NaT"""
+    partes = pd.DataFrame({'year': anio, 'month': mes, 'day': dia}, index=index)
+    return pd.to_datetime(partes, errors='coerce')
+
+
+def _yymmdd(fechas):
+    return (
+        fechas.dt.year.astype(str).str[-2:]
+        + fechas.dt.month.astype(str).str.zfill(2)
+        + fechas.dt.day.astype(str).str.zfill(2)
+    )
+
+
+def _campo_mrz(serie, longitud=20):
+    """Solo letras A-Z, recortado y relleno con '<'"""
+    return (
+        serie.fillna('').astype(str).str.upper()
+        .str.replace(r'[^A-Z]', '', regex=True)
+        .str[:longitud]
+        .str.pad(longitud, side='right', fillchar='<')
+    )
+
+
+def _ajustar_mrz(serie):
+    return serie.str.pad(LONGITUD_MRZ, side='right', fillchar='<').str[:LONGITUD_MRZ]
+
+
+def sustituir_numero_mrz(mrz_linea2, numero_anterior, numero):
+    """MRZ línea 2 de un registro con `numero` en lugar del número con el que se sintetizó"""
+    numero_anterior = str(numero_anterior)
+    if not mrz_linea2.startswith(numero_anterior):
+        raise ValueError(f"La MRZ no empieza por el número {numero_anterior}")
+    return (str(numero) + mrz_linea2[len(numero_anterior):]).ljust(LONGITUD_MRZ, '<')[:LONGITUD_MRZ]
+
+
+def fechas_emision(nacimiento, estados, hoy):
+    """Fecha de emisión: tras cumplir 18, en los últimos 5 años y al menos 3 meses antes de hoy"""
+    index = nacimiento.index
+    hoy_ts = pd.Timestamp(hoy)
+    por_defecto = pd.Timestamp(hoy.year - 2, 1, 1)
+
+    valida = nacimiento.notna()
+    rellenas = nacimiento.fillna(por_defecto)
+    fecha_18 = _fechas_desde_partes(rellenas.dt.year + 18, rellenas.dt.month, rellenas.dt.day, index)
+    # Sin fecha o nacido un 29 de febrero sin bisiesto a los 18 → fecha por defecto
+    usar_defecto = ~valida | fecha_18.isna()
+
+    inicio = fecha_18.fillna(por_defecto).clip(lower=pd.Timestamp(hoy.year - 5, 1, 1))
+    fin = pd.Series(hoy_ts - pd.DateOffset(months=3), index=index)
+
+    # Si el rango queda vacío se extiende un año desde el inicio
+    vacio = inicio >= fin
+    fin = fin.where(~vacio, inicio + pd.DateOffset(years=1))
+
+    dias = (fin - inicio).dt.days.to_numpy(dtype=np.int64)
+    desplazamiento = enteros(estados, CAMPO_EMISION, 0, np.maximum(dias, 0))
+    emision = inicio + pd.to_timedelta(desplazamiento, unit='D')
+    return emision.where(~usar_defecto, por_defecto)
+
+
+def fechas_vencimiento(emision, vigencia_anos):
+    """Misma fecha `vigencia_anos` después; un 29 de febrero sin bisiesto pasa al 28"""
+    vencimiento = _fechas_desde_partes(
+        emision.dt.year + vigencia_anos, emision.dt.month, emision.dt.day, emision.index
+    )
+    dia_anterior = _fechas_desde_partes(
+        emision.dt.year + vigencia_anos, emision.dt.month, emision.dt.day - 1, emision.index
+    )
+    return vencimiento.fillna(dia_anterior)
+
+
+def sintetizar_lote(preparado, semilla, rango_pasaporte, rango_cedula, capitales, vigencia_anos, hoy=None,
+                    numeros=None, cedulas=None, claves=None):
+    """Genera las COLUMNAS_SINTETIZADAS para un lote preparado.
+
+    Args:
+        preparado: DataFrame con las columnas de preparacion_registros (más CORREO y GENERO)
+        semilla: entero; junto con la clave de cada registro determina todos sus valores
+        rango_pasaporte / rango_cedula: tuplas (mínimo, máximo) inclusivas
+        capitales: lista de capitales de estado (se normalizan aquí)
+        vigencia_anos: años de validez del pasaporte
+        numeros / cedulas: valores ya asignados (p. ej. por AsignadorUnico); si se
+            omiten se sortean del flujo de cada registro dentro de los rangos
+        claves: claves_registro ya calculadas sobre el CSV completo (para un
+            subconjunto de filas, p. ej. al reanudar); por defecto se calculan aquí
+
+    Returns:
+        DataFrame con el mismo índice que `preparado`
+    """
+    hoy = hoy or date.today()
+    index = preparado.index
+    if claves is None:
+        claves = claves_registro(preparado)
+    estados = estados_registro(semilla, np.asarray(claves, dtype=np.uint64))
+
+    if numeros is None:
+        numeros = enteros(estados, CAMPO_PASAPORTE, *rango_pasaporte)
+    if cedulas is None:
+        cedulas = enteros(estados, CAMPO_CEDULA, *rango_cedula)
+    numeros = pd.Series(np.asarray(numeros), index=index).astype(str)
+    cedulas = pd.Series(np.asarray(cedulas), index=index).astype(str)
+
+    lugares_posibles = np.array([f"{normalizar_texto(c)} VEN" for c in capitales], dtype=object)
+    lugares = pd.Series(
+        lugares_posibles[enteros(estados, CAMPO_LUGAR, 0, len(lugares_posibles) - 1)], index=index
+    )
+
+    nacimiento = preparado['fecha_nacimiento_dt']
+    emision = fechas_emision(nacimiento, estados, hoy)
+    vencimiento = fechas_vencimiento(emision, vigencia_anos)
+
+    # MRZ línea 1: P<VEN{APELLIDO}<<{NOMBRE}
+    mrz_linea1 = _ajustar_mrz(
+        'P<VEN' + _campo_mrz(preparado['apellido_completo']) + '<<' + _campo_mrz(preparado['nombre_completo'])
+    )
+
+    # MRZ línea 2: número, check, VEN, nacimiento, sexo, nacimiento + 10 años (1 de enero), checks
+    nacimiento_mrz = nacimiento.fillna(FECHA_MRZ_POR_DEFECTO)
+    venc_mrz = nacimiento_mrz.dt.year.add(10).astype(str).str[-2:] + '0101'
+    genero = preparado['GENERO'] if 'GENERO' in preparado.columns else pd.Series('F', index=index)
+    sexo = pd.Series(np.where(genero.fillna('').astype(str).str.upper() == 'F', 'F', 'M'), index=index)
+    checks = [
+        pd.Series(enteros(estados, campo, 0, 9), index=index).astype(str)
+        for campo in (CAMPO_CHECK_PASAPORTE, CAMPO_CHECK_ADICIONAL, CAMPO_CHECK_FINAL)
+    ]
+    mrz_linea2 = _ajustar_mrz(
+        numeros + checks[0] + 'VEN' + _yymmdd(nacimiento_mrz) + sexo
+        + venc_mrz + checks[1] + '<' * 15 + checks[2]
+    )
+
+    return pd.DataFrame({
+        'numero_pasaporte': numeros,
+        'cedula': cedulas,
+        'lugar_nacimiento': lugares,
+        'fecha_emision': formatear_fechas(emision),
+        'fecha_vencimiento': formatear_fechas(vencimiento),
+        'mrz_linea1': mrz_linea1,
+        'mrz_linea2': mrz_linea2,
+    }, index=index)
+
+
+def anexar_sintesis(preparado, *args, **kwargs):
+    """Devuelve `preparado` con las columnas sintetizadas añadidas (reemplaza las existentes)"""
+    existentes = [c for c in COLUMNAS_SINTETIZADAS if c in preparado.columns]
+    base = preparado.drop(columns=existentes) if existentes else preparado
+    return base.join(sintetizar_lote(base, *args, **kwargs))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Verificación de precisión: detección de rostro en proxy reducido vs resolución completa
+
+Para cada foto del pool (DATA/Imagenes_Mujeres, DATA/Imagenes_Hombres) compara la
+geometría usada en la colocación (centro de ojos y ancho de cara) obtenida con
+Face Mesh a resolución completa + refinamiento de iris (referencia) contra cada
+combinación de lado máximo del proxy y refinamiento on/off.
+
+El error se expresa como fracción del ancho de cara de referencia, que es la
+magnitud que escala la foto en el contenedor. Al final recomienda la
+configuración más rápida cuyo error p95 queda dentro de la tolerancia y que no
+pierde detecciones, lista para copiar en CONFIG/config.json → "deteccion_rostro".
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from script_maestro_integrado import ScriptMaestroIntegrado
+
+
+def listar_pool(base_path, limite=None):
+    """Lista las fotos del pool de imágenes por género"""
+    fotos = []
+    for carpeta in ("Imagenes_Mujeres", "Imagenes_Hombres"):
+        directorio = base_path / "DATA" / carpeta
+        if not directorio.exists():
+            continue
+        for patron in ("*.png", "*.jpg", "*.jpeg"):
+            fotos.extend(sorted(directorio.glob(patron)))
+    return fotos[:limite] if limite else fotos
+
+
+def percentil(valores, p):
+    if not valores:
+        return float('nan')
+    return float(np.percentile(np.asarray(valores), p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precisión y latencia de la detección de rostro en proxy reducido")
+    parser.add_argument("--limite", type=int, default=100, help="Máximo de fotos del pool a evaluar (default: 100)")
+    parser.add_argument("--lados", default="0,192,256,320,384,512",
+                        help="Lados máximos del proxy a evaluar, separados por coma (0 = resolución completa)")
+    parser.add_argument("--tolerancia", type=float, default=0.02,
+                        help="Error p95 máximo aceptable como fracción del ancho de cara (default: 0.02)")
+    parser.add_argument("--salida", help="Ruta opcional para guardar el reporte JSON")
+    args = parser.parse_args()
+
+    base_path = Path(__file__).resolve().parent.parent
+    fotos = listar_pool(base_path, args.limite)
+    if not fotos:
+        print(f" No se encontraron fotos en {base_path / 'DATA'}")
+        return 1
+
+    lados = [int(x) for x in args.lados.split(",") if x.strip() != ""]
+    print(" Verificación de detección en proxy")
+    print(f"   Fotos: {len(fotos)} | Lados: {lados} | Tolerancia p95: {args.tolerancia:.3f}")
+
+    maestro = ScriptMaestroIntegrado()
+    detector_por_refinado = {
+        True: maestro.obtener_detector_cara('face_mesh', refinar_iris=True),
+        False: maestro.obtener_detector_cara('face_mesh', refinar_iris=False),
+    }
+
+    # Decodificar una sola vez; todas las configuraciones ven los mismos píxeles
+    imagenes = []
+    for ruta in fotos:
+        try:
+            with Image.open(ruta) as img:
+                imagenes.append((ruta.name, np.array(img.convert('RGBA'))))
+        except Exception as e:
+            print(f"   ️ No se pudo leer {ruta.name}: {e}")
+
+    # Referencia: resolución completa + refinamiento de iris (comportamiento histórico)
+    referencia = {}
+    for nombre, arr in imagenes:
+        referencia[nombre] = maestro._detectar_geometria_cara(
+            arr, lado_max_proxy=0, detector=detector_por_refinado[True]
+        )
+    con_rostro = sum(1 for g in referencia.values() if g is not None)
+    print(f"   Referencia: {con_rostro}/{len(imagenes)} fotos con rostro detectado")
+
+    resultados = []
+    for refinar in (True, False):
+        for lado in lados:
+            errores_centro = []
+            errores_ancho = []
+            tiempos = []
+            perdidas = 0
+            for nombre, arr in imagenes:
+                t0 = time.perf_counter()
+                geometria = maestro._detectar_geometria_cara(
+                    arr, lado_max_proxy=lado, detector=detector_por_refinado[refinar]
+                )
+                tiempos.append(time.perf_counter() - t0)
+
+                ref = referencia[nombre]
+                if ref is None:
+                    continue
+                if geometria is None:
+                    perdidas += 1
+                    continue
+                dx = geometria['centro_ojos'][0] - ref['centro_ojos'][0]
+                dy = geometria['centro_ojos'][1] - ref['centro_ojos'][1]
+                errores_centro.append(float(np.hypot(dx, dy)) / ref['ancho_cara'])
+                errores_ancho.append(abs(geometria['ancho_cara'] - ref['ancho_cara']) / ref['ancho_cara'])
+
+            error_p95 = max(percentil(errores_centro, 95), percentil(errores_ancho, 95))
+            resultados.append({
+                'lado_max_proxy': lado,
+                'refinar_iris': refinar,
+                'latencia_ms': statistics.mean(tiempos) * 1000 if tiempos else float('nan'),
+                'error_centro_medio': statistics.mean(errores_centro) if errores_centro else float('nan'),
+                'error_ancho_medio': statistics.mean(errores_ancho) if errores_ancho else float('nan'),
+                'error_p95': error_p95,
+                'detecciones_perdidas': perdidas,
+            })
+
+    print("\n lado  iris  latencia(ms)  err_centro  err_ancho  err_p95  perdidas")
+    for r in resultados:
+        print(f" {r['lado_max_proxy']:4d}  {'sí' if r['refinar_iris'] else 'no':4s}  "
+              f"{r['latencia_ms']:12.1f}  {r['error_centro_medio']:10.4f}  {r['error_ancho_medio']:9.4f}  "
+              f"{r['error_p95']:7.4f}  {r['detecciones_perdidas']:8d}")
+
+    aceptables = [
+        r for r in resultados
+        if r['detecciones_perdidas'] == 0 and not np.isnan(r['error_p95']) and r['error_p95'] <= args.tolerancia
+    ]
+    recomendado = min(aceptables, key=lambda r: r['latencia_ms']) if aceptables else None
+    if recomendado:
+        sugerencia = {
+            'deteccion_rostro': {
+                'lado_max_proxy': recomendado['lado_max_proxy'],
+                'refinar_iris': recomendado['refinar_iris'],
+            }
+        }
+        print(f"\n Configuración recomendada ({recomendado['latencia_ms']:.1f} ms, err p95 {recomendado['error_p95']:.4f}):")
+        print(json.dumps(sugerencia, indent=2))
+    else:
+        print("\n️ Ninguna configuración cumple la tolerancia; mantener resolución completa")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({'fotos': len(imagenes), 'tolerancia': args.tolerancia,
+                       'resultados': resultados, 'recomendado': recomendado}, f, indent=2, ensure_ascii=False)
+        print(f" Reporte guardado: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,16 +6,24 @@ Integra datos del Excel con imágenes y genera pasaportes dinámicos
 
 import os
 import sys
+from pathlib import Path
+
+# Cada trabajador de render recibe su parte de los hilos nativos solo cuando hay varios
+# (SCRIPTS/colocacion_hilos.py); al importar no se limita nada
+sys.path.append(str(Path(__file__).parent / 'SCRIPTS'))
+from colocacion_hilos import planificar, limitar_hilos_nativos
+
 import json
 import pandas as pd
 import numpy as np
 import random
+import secrets
 import re
 import shutil
+from collections import deque
 from datetime import datetime, date
 import gc  # Garbage collector para liberar memoria
 import psutil  # Para monitorear uso de memoria
-from pathlib import Path
 from PIL import Image
 import argparse
 import threading
@@ -62,7 +70,45 @@ LIBERAR_MEMORIA_CADA = 500      # Liberar memoria cada X registros
 
 # Configuración de lotes para procesamiento masivo
 TAMANO_LOTE_PRODUCCION = 50     # Tamaño de lote para procesamiento paralelo
+# Exportar JSON/XLSX/CSV RESULT al terminar (False = solo segmentos en resultados_*/;
+# exportar después con SCRIPTS/almacen_resultados.py)
+EXPORTAR_RESULTADOS = True
 MAX_WORKERS_PARALELO = 4        # Máximo número de workers paralelos
+# Gobernador de memoria (SCRIPTS/gobernador_memoria.py): RSS máximo del proceso antes de reciclar
+# los trabajadores de render (None = sin presupuesto) y registros por hilo entre reciclados
+PRESUPUESTO_RSS_MB = 4096
+TAREAS_POR_TRABAJADOR = 500
+# Recolección de basura (SCRIPTS/politica_gc.py): bloques asignados de más antes de un gc.collect()
+UMBRAL_BLOQUES_GC = 2_000_000
+HILOS_RENDER = 1                # Hilos de render concurrentes (1 = secuencial, 0 = según el host)
+# Registros en vuelo ajustados por lote según rendimiento, p95 y memoria (SCRIPTS/control_concurrencia.py);
+# False = siempre hilos * 2 por lote
+CONCURRENCIA_ADAPTATIVA = True
+# Fijar cada hilo de render a un bloque propio de núcleos físicos (SCRIPTS/colocacion_hilos.py);
+# OpenCV, ONNX Runtime y BLAS usan los hilos de ese bloque. False = sin afinidad (solo el reparto de hilos)
+AFINIDAD_TRABAJADORES = True
+# Procesos para las particiones de un manifiesto (>1 = servidor fork, SCRIPTS/servidor_fork.py: el padre
+# carga plantilla, fuentes y rembg una vez y los hijos los heredan copy-on-write; 1 = un solo proceso)
+PROCESOS_FORK = 1
+# Fotos leídas y decodificadas por adelantado en hilos de fondo (SCRIPTS/precarga_fotos.py) en cuanto
+# se asignan a un registro; 0 = leer cada foto al renderizar. HILOS_PRECARGA: lecturas simultáneas
+PRECARGA_FOTOS = 16
+HILOS_PRECARGA = 4
+# Las fotos se reservan y confirman en un libro SQLite (SCRIPTS/libro_fotos.py, OUTPUT/logs/libro_fotos.sqlite3)
+# compartido por hilos y procesos. MOVER_USADAS: trasladar además las usadas a usadas/ por lotes en un hilo de
+# fondo; False = dejarlas en su carpeta (el libro ya impide reutilizarlas)
+MOVER_USADAS = True
+
+# Semilla de los campos sintéticos (None = aleatoria en cada ejecución, se muestra al iniciar)
+# Con la misma semilla y el mismo CSV se generan los mismos números, fechas y MRZ
+SEMILLA_SINTESIS = None
+
+# Regeneración incremental (True = saltar registros cuyo PNG ya tiene la misma huella y
+# re-renderizar solo los que cambiaron; ver SCRIPTS/huella_render.py)
+MODO_INCREMENTAL = False
+# Guardar por registro la capa de foto y la de texto en OUTPUT/capas/ (True = un re-render tras
+# cambiar solo campos de texto reutiliza la foto ya procesada, sin rembg ni FaceMesh)
+GUARDAR_CAPAS = False
 
 # Configuración de logging para producción
 LOGGING_DETALLADO = False       # True = logs detallados, False = logs mínimos
@@ -140,12 +186,36 @@ def configurar_gpu_entorno():
 configurar_gpu_entorno()
 
 # Importar el script maestro para generar pasaportes visuales (después de setear entorno GPU)
-sys.path.append(str(Path(__file__).parent / 'SCRIPTS'))
 try:
-    from script_maestro_integrado import ScriptMaestroIntegrado
+    from script_maestro_integrado import ScriptMaestroIntegrado, silenciar_hilo
 except Exception as e:
     print("️ No se pudo importar script_maestro_integrado.py:", e)
     ScriptMaestroIntegrado = None
+    silenciar_hilo = None
+from preparacion_registros import (
+    MESES_ES, MESES_EN, normalizar_texto, anexar_preparacion
+)
+from sintesis_campos import anexar_sintesis, claves_registro, claves_hex, sustituir_numero_mrz
+from asignador_unico import AsignadorUnico
+from procesador_xlsx import iterar_xlsx_por_bloques, cargar_manifiesto, leer_particion
+from almacen_resultados import AlmacenResultados
+from diario_registros import DiarioRegistros, huella_csv
+from gobernador_memoria import GobernadorMemoria
+from politica_gc import PoliticaGC
+from control_concurrencia import ControladorConcurrencia
+from servidor_fork import ServidorFork, fork_disponible
+from precarga_fotos import PrecargaFotos
+from libro_fotos import LibroFotos, MovedorUsadas
+from cajas_texto import comprobar_proyecto
+from huella_render import (
+    huella_entorno, huella_entrada, huella_render, metadatos_png, leer_metadatos, hash_archivo, localizar_foto,
+)
+try:
+    from detectores_cara import obtener_detector, cerrar_detectores
+except Exception as e:
+    print("️ No se pudo importar detectores_cara.py:", e)
+    obtener_detector = None
+    cerrar_detectores = None
 
 class ValidadorFuentes:
     """Validador de fuentes disponibles (sistema o rutas locales del proyecto)"""
@@ -364,6 +434,7 @@ class GestorMemoria:
 class GeneradorPasaportesMasivo:
     def __init__(self, base_path=None):
         """Inicializa el generador de pasaportes masivo"""
+        t_inicio = time.perf_counter()
         self.base_path = Path(base_path) if base_path else Path.cwd()
         self.data_path = self.base_path / 'DATA'
         # La carpeta de salida se establecerá dinámicamente basada en el CSV de origen
@@ -382,6 +453,20 @@ class GeneradorPasaportesMasivo:
             umbral_vram_perc=VRAM_LIMITE_PORCENTAJE
         )
         
+        # RSS del proceso por presupuesto y reciclado de trabajadores (ver _controlar_memoria)
+        self.gobernador = GobernadorMemoria(PRESUPUESTO_RSS_MB, TAREAS_POR_TRABAJADOR)
+        # gc.freeze tras cargar el script maestro y recolección solo por crecimiento de asignaciones
+        self.politica_gc = PoliticaGC(UMBRAL_BLOQUES_GC)
+        # Controlador AIMD de registros en vuelo (se crea con el primer render concurrente)
+        self.controlador_concurrencia = None
+        # Núcleos de cada hilo de render y hilos nativos por trabajador (ver _colocar_trabajadores)
+        self.plan_colocacion = None
+        self.limites_nativos = None
+        self.afinidad_trabajadores = AFINIDAD_TRABAJADORES
+        self.procesos_fork = PROCESOS_FORK
+        # Lectura anticipada de las fotos de los próximos registros (ver _preparar_o_reutilizar)
+        self.precarga_fotos = PrecargaFotos(PRECARGA_FOTOS, HILOS_PRECARGA) if PRECARGA_FOTOS else None
+        
         # Inicializar validador de fuentes
         self.validador_fuentes = ValidadorFuentes()
         
@@ -399,6 +484,19 @@ class GeneradorPasaportesMasivo:
         
         # OPTIMIZACIÓN: Cargar ScriptMaestroIntegrado solo cuando se necesite (lazy loading)
         self.script_maestro_cache = None
+        self._lock_script_maestro = threading.Lock()
+        
+        # Libro de fotos libres/reservadas/usadas (ninguna foto se asigna a dos registros, ni entre procesos)
+        self.libro_fotos = LibroFotos(self.base_path / 'OUTPUT' / 'logs' / 'libro_fotos.sqlite3')
+        self.movedor_usadas = MovedorUsadas(self.libro_fotos, self.mover_imagen_usada) if MOVER_USADAS else None
+        self._lock_imagenes = threading.Lock()
+        # Carpetas ya sincronizadas con el libro: un solo glob por carpeta y proceso
+        self._carpetas_sincronizadas = set()
+        
+        # Estado que se conserva entre archivos procesados por el mismo proceso
+        self._fuentes_verificadas = False
+        self._executor_render = None
+        self._hilos_executor = None
 
         # Modo silencio para reducir I/O en terminal (acelera ejecución)
         self.silencioso = not LOGGING_DETALLADO
@@ -438,6 +536,20 @@ class GeneradorPasaportesMasivo:
         # Vigencia del pasaporte venezolano (10 años según SAIME)
         self.vigencia_pasaporte_anos = 10
         
+        # Semilla de los flujos aleatorios por registro (ver SCRIPTS/sintesis_campos.py)
+        self.semilla_sintesis = SEMILLA_SINTESIS if SEMILLA_SINTESIS is not None else secrets.randbits(63)
+        # Una semilla elegida (configuración o --semilla) no se sustituye por la de un diario al reanudar
+        self.semilla_explicita = SEMILLA_SINTESIS is not None
+        
+        # Números de pasaporte y cédulas sin repetición entre registros, procesos y ejecuciones
+        logs_path = self.base_path / 'OUTPUT' / 'logs'
+        self.asignador_pasaportes = AsignadorUnico(
+            logs_path / 'asignador_pasaportes.json', self.rango_pasaporte_min, self.rango_pasaporte_max
+        )
+        self.asignador_cedulas = AsignadorUnico(
+            logs_path / 'asignador_cedulas.json', *self.rango_cedula_venezolana()
+        )
+        
         # OPTIMIZACIÓN: Batching optimizado para producción
         self.tamano_lote = TAMANO_LOTE_PRODUCCION
         self.registros_lote = []
@@ -449,9 +561,26 @@ class GeneradorPasaportesMasivo:
         self.temp_dir = self.base_path / 'OUTPUT' / 'temp'
         # CSV actualmente usado (si aplica)
         self.csv_path_used = None
+        # Resultados de la ejecución en curso, anexados por lotes (ver iniciar_almacen)
+        self.almacen = None
+        # Diario de estados por registro para reanudar tras un corte (ver _iniciar_ejecucion)
+        self.diario = None
+        
+        # Regeneración incremental por huella (ver _reutilizar_salida)
+        self.incremental = MODO_INCREMENTAL
+        self._huella_entorno = None
+        self.estadisticas_incremental = self._estadisticas_incremental_vacias()
+        
+        # Capas de foto y texto por registro (ver ScriptMaestroIntegrado._componer_por_capas)
+        self.guardar_capas = GUARDAR_CAPAS
+        self.capas_path = self.base_path / 'OUTPUT' / 'capas'
+        self._lock_capas = threading.Lock()
+        self.capas_reutilizadas = {'foto': 0, 'texto': 0}
         
         # Sistema de barras de progreso múltiples
         self.progress_manager = None
+        
+        self.tiempo_inicializacion = time.perf_counter() - t_inicio
     
     def _determinar_capacidad_paralela(self):
         """OPTIMIZACIÓN: Determina capacidad paralela basada en GPU para máximo rendimiento"""
@@ -475,94 +604,311 @@ class GeneradorPasaportesMasivo:
                 else:
                     return 1  # Secuencial para GPUs pequeñas
             else:
-                return 1
+                return self._capacidad_cpu()
         except:
-            return 1
+            return self._capacidad_cpu()
     
-    def _procesar_lotes_paralelos(self, cola_procesamiento, registros_procesados):
-        """OPTIMIZACIÓN: Procesa registros en paralelo con máximo uso de GPU"""
-        import concurrent.futures
+    def _resolver_hilos(self, hilos):
+        """Hilos de render pedidos (None = HILOS_RENDER; 0 = según la GPU o los núcleos del host)"""
+        hilos = HILOS_RENDER if hilos is None else hilos
+        return hilos if hilos > 0 else self._determinar_capacidad_paralela()
+    
+    def _colocar_trabajadores(self, hilos):
+        """Reparte los núcleos entre los hilos de render y ajusta OpenCV/BLAS a su parte
         
-        # OPTIMIZACIÓN: Lotes conservadores para 20K+ registros
-        lote_size = self.progress_manager.max_parallel * 1  # Tamaño conservador para estabilidad
+        Llamar antes de cargar el script maestro: la sesión de ONNX Runtime de rembg
+        toma sus hilos (hilos_onnx) al crearse.
+        """
+        plan = self.plan_colocacion
+        if plan is not None and len(plan.trabajadores) == hilos:
+            return plan
+        plan = self.plan_colocacion = planificar(hilos, afinidad=self.afinidad_trabajadores)
+        # Con un solo trabajador no hay nada que repartir: OpenCV/BLAS vuelven a sus valores previos
+        self._aplicar_limites_nativos(plan.hilos_por_trabajador if hilos > 1 else None)
+        if hilos > 1:
+            print(f" Colocación: {plan}")
+        return plan
+    
+    def _aplicar_limites_nativos(self, hilos):
+        """Restaura los límites anteriores y, si hilos no es None, limita OpenCV/BLAS a ese número"""
+        if self.limites_nativos is not None:
+            self.limites_nativos.restaurar()
+            self.limites_nativos = None
+        if hilos is not None:
+            self.limites_nativos = limitar_hilos_nativos(hilos)
+    
+    @staticmethod
+    def _capacidad_cpu():
+        """Hilos de render en un host sin GPU: uno por núcleo, hasta MAX_WORKERS_PARALELO"""
+        return max(1, min(MAX_WORKERS_PARALELO, os.cpu_count() or 1))
+    
+    def _procesar_lotes_paralelos(self, cola_procesamiento, hilos=None):
+        """Procesa registros con varios hilos de render
+        
+        Los datos de cada registro (valores aleatorios, foto reservada) se preparan
+        en el hilo principal; los hilos solo renderizan con ScriptMaestroIntegrado.render,
+        que es reentrante. Cada lote se anexa a self.almacen en el orden de la cola.
+        El lote siguiente se prepara (y sus fotos se anuncian a la precarga)
+        mientras se renderiza el actual, así que su tamaño se decide con un lote
+        de retraso. El tamaño lo decide el controlador de concurrencia (AIMD según
+        rendimiento, p95 de latencia y presión de memoria), o con
+        CONCURRENCIA_ADAPTATIVA = False el gobernador de memoria: hilos * 2 en
+        condiciones normales, un registro por hilo bajo presión de RSS.
+        """
+        hilos = max(1, hilos or MAX_WORKERS_PARALELO)
+        total = len(cola_procesamiento)
         
-        for i in range(0, len(cola_procesamiento), lote_size):
-            lote = cola_procesamiento[i:i + lote_size]
-            
-            # OPTIMIZACIÓN: Procesar lote en paralelo con máximo workers
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.progress_manager.max_parallel) as executor:
-                futures = []
+        # Una sola instancia compartida, creada antes de lanzar los hilos
+        if self._cargar_script_maestro_lazy() is None:
+            return
+        
+        controlador = self._obtener_controlador_concurrencia(hilos) if CONCURRENCIA_ADAPTATIVA else None
+        generados_inicio, omitidos_inicio = self.almacen.generados, self.almacen.omitidos
+        
+        def tamano_lote(presion):
+            if controlador is not None:
+                return controlador.en_vuelo
+            return self.gobernador.tareas_en_vuelo(hilos, presion)
+        
+        # Antes de empezar no hay renders en vuelo: se puede reciclar el pool
+        presion = self._controlar_memoria(hilos)
+        lote = cola_procesamiento[:tamano_lote(presion)]
+        i = len(lote)
+        siguientes = self._preparar_lote_paralelo(lote)
+        try:
+            while lote:
+                executor = self._obtener_executor_render(hilos)
+                despachados = i
+                
+                # Despachar el render del lote (los datos ya están preparados: solo se mide el render)
+                t_lote = time.perf_counter()
+                pendientes = []
+                for idx, clave, datos_pasaporte in siguientes:
+                    future = (executor.submit(self._renderizar_medido, datos_pasaporte)
+                              if self._requiere_render(datos_pasaporte) else None)
+                    pendientes.append((idx, clave, datos_pasaporte, future))
+                siguientes = []
                 
-                for j, (idx, registro) in enumerate(lote):
-                    passport_id = f"passport_{idx}"
-                    name = f"{registro.get('PRIMER_NOMBRE', 'N/A')} {registro.get('PRIMER_APELLIDO', 'N/A')}"
-                    
-                    # Iniciar barra de progreso
-                    if self.progress_manager.start_passport(passport_id, name):
-                        future = executor.submit(self._procesar_registro_con_progreso, passport_id, idx, registro)
-                        futures.append((passport_id, future))
+                # Preparar el lote siguiente mientras se renderiza este
+                lote = cola_procesamiento[i:i + tamano_lote(presion)]
+                i += len(lote)
+                siguientes = self._preparar_lote_paralelo(lote)
                 
                 # Esperar a que terminen todos los pasaportes del lote
-                for passport_id, future in futures:
-                    try:
-                        resultado = future.result()
-                        registros_procesados.append(resultado)
-                        self.progress_manager.complete_passport(passport_id, success=True)
-                    except Exception as e:
-                        print(f"\n Error en pasaporte {passport_id}: {e}")
-                        self.progress_manager.complete_passport(passport_id, success=False)
-            
-            # OPTIMIZACIÓN: Limpieza GPU más frecuente para 20K+ registros
-            if i % (lote_size * 2) == 0:  # Cada 2 lotes para estabilidad
-                try:
-                    import torch
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
-                    gc.collect()
-                except:
-                    pass
+                resultados_lote = []
+                latencias = []
+                for idx, clave, datos_pasaporte, future in pendientes:
+                    if future is not None:
+                        try:
+                            latencias.append(future.result())
+                        except Exception as e:
+                            print(f"\n Error en pasaporte {idx + 1}: {e}")
+                            datos_pasaporte['estado'] = 'omitido'
+                            datos_pasaporte['motivo_no_generado'] = f"Error en render: {e}"
+                            self.liberar_imagen(datos_pasaporte.get('imagen_usada'))
+                    resultados_lote.append((clave, datos_pasaporte))
+                segundos_lote = time.perf_counter() - t_lote
+                self._anexar_resultados(resultados_lote)
+                self.gobernador.registrar_tareas(sum(1 for p in pendientes if p[3] is not None))
+                if controlador is not None:
+                    anterior = controlador.en_vuelo
+                    siguiente = controlador.observar(
+                        len(latencias), segundos_lote, latencias,
+                        self.gobernador.presion(hilos), self.gobernador.rss_mb(),
+                    )
+                    if siguiente != anterior:
+                        decision = controlador.decisiones[-1]
+                        print(f" Concurrencia: {anterior} → {siguiente} en vuelo ({decision['motivo']}, "
+                              f"{decision['registros_s']:.2f} reg/s, p95 {decision['p95_s']:.2f}s)")
+                
+                generados = self.almacen.generados - generados_inicio
+                omitidos = self.almacen.omitidos - omitidos_inicio
+                print(f" Progreso: {despachados}/{total} - Generados: {generados}, Omitidos: {omitidos}")
+                
+                # Recolección (y caché GPU) solo si las asignaciones crecieron lo suficiente
+                self.politica_gc.tal_vez_recolectar()
+                # Entre lotes no hay renders en vuelo: se puede reciclar el pool
+                presion = self._controlar_memoria(hilos)
+        finally:
+            # Lote ya preparado que no llegó a despacharse (salida anticipada): soltar sus fotos
+            self._liberar_preparados(datos for _idx, _clave, datos in siguientes)
+    
+    def _preparar_lote_paralelo(self, lote):
+        """(idx, clave, datos_pasaporte) de los registros del lote que hay que procesar
+        
+        Secuencial en el hilo principal: aleatoriedad, reserva de fotos y anuncio
+        a la precarga siguen el orden de la cola.
+        """
+        preparados = []
+        for idx, registro in lote:
+            clave = registro.get('clave_registro')
+            try:
+                datos_pasaporte = self._preparar_o_reutilizar(registro)
+            except Exception as e:
+                print(f" Error en registro {idx + 1}: {e}")
+                continue
+            if datos_pasaporte is None:
+                continue
+            self._diario_en_curso(clave, datos_pasaporte)
+            preparados.append((idx, clave, datos_pasaporte))
+        return preparados
+    
+    def _renderizar_medido(self, datos_pasaporte):
+        """_renderizar_registro en un hilo del pool; devuelve los segundos de render"""
+        t0 = time.perf_counter()
+        self._renderizar_registro(datos_pasaporte, False)
+        return time.perf_counter() - t0
+    
+    def _obtener_controlador_concurrencia(self, hilos):
+        """Controlador AIMD que se conserva entre archivos del mismo proceso (hasta hilos * 2 en vuelo)"""
+        controlador = self.controlador_concurrencia
+        if controlador is None or controlador.maximo != hilos * 2:
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            controlador = self.controlador_concurrencia = ControladorConcurrencia(
+                minimo=1, maximo=hilos * 2, inicial=hilos,
+                ruta_log=self.base_path / 'OUTPUT' / 'logs' / f'concurrencia_{ts}.jsonl',
+            )
+            print(f" Concurrencia adaptativa: {hilos} hilos, de 1 a {hilos * 2} registros en vuelo "
+                  f"(decisiones en {controlador.ruta_log})")
+        return controlador
+    
+    def _mostrar_resumen_precarga(self):
+        if self.precarga_fotos is None:
+            return
+        estadisticas = self.precarga_fotos.estadisticas()
+        print(f" Precarga de fotos: {estadisticas['tasa_acierto'] * 100:.0f}% ya en memoria "
+              f"({estadisticas['aciertos']} aciertos, {estadisticas['esperas']} esperas, "
+              f"{estadisticas['fallos']} sin precargar); {estadisticas['segundos_espera']:.2f}s esperando lecturas")
+    
+    def _mostrar_resumen_fotos(self):
+        try:
+            estados = self.libro_fotos.resumen()
+        except Exception as e:
+            print(f"️ No se pudo leer el libro de fotos: {e}")
+            return
+        movidas = ''
+        if self.movedor_usadas is not None:
+            estadisticas = self.movedor_usadas.estadisticas()
+            movidas = f"; {estadisticas['movidas']} movidas a usadas/ en segundo plano"
+            if estadisticas['errores']:
+                movidas += f" ({estadisticas['errores']} sin mover)"
+        print(f"️ Libro de fotos: {estados['libre']} libres, {estados['reservada']} reservadas, "
+              f"{estados['usada']} usadas{movidas}")
+    
+    def _mostrar_resumen_concurrencia(self):
+        if self.controlador_concurrencia is None:
+            return
+        resumen = self.controlador_concurrencia.resumen()
+        decisiones = ', '.join(f"{n} {d}" for d, n in resumen['decisiones'].items())
+        print(f" Concurrencia estable: {resumen['en_vuelo_estable']} registros en vuelo "
+              f"(máximo {resumen['maximo']}; {decisiones or 'sin decisiones'})")
+    
+    def _controlar_memoria(self, hilos=1):
+        """Consulta al gobernador de memoria y recicla los trabajadores si toca
+        
+        Llamar solo entre lotes, sin renders en vuelo. Devuelve la presión
+        ('normal', 'contener') con la que despachar el siguiente lote.
+        """
+        if self.gobernador.rss_base_mb is None:
+            self.gobernador.fijar_base()
+        motivo = self.gobernador.motivo_reciclado(hilos)
+        if motivo:
+            self._reciclar_trabajadores(motivo)
+        return self.gobernador.presion(hilos)
+    
+    def _reciclar_trabajadores(self, motivo):
+        """Cierra el pool de hilos y los detectores de cara para liberar su estado acumulado
+        
+        Los hilos nuevos (y el hilo principal) vuelven a crear sus detectores al
+        siguiente render; script maestro, fuentes, plantilla y rembg se conservan.
+        """
+        rss_antes = self.gobernador.rss_mb()
+        self.cerrar_executor_render()
+        if cerrar_detectores is not None:
+            cerrar_detectores()
+        self.politica_gc.recolectar()
+        rss_despues = self.gobernador.marcar_reciclado(motivo, rss_antes)
+        print(f" Trabajadores reciclados ({motivo}): RSS {rss_antes:.0f} MB → {rss_despues:.0f} MB")
+        if self.gobernador.sobre_presupuesto_tras_reciclado:
+            print(f" El RSS sigue por encima del presupuesto ({PRESUPUESTO_RSS_MB} MB): no se vuelve a reciclar "
+                  f"hasta que crezca {self.gobernador.crecimiento_reciclado_mb} MB o pasen "
+                  f"{self.gobernador.tareas_entre_reciclados_rss} registros por hilo")
+    
+    def _mostrar_resumen_memoria(self):
+        resumen = self.gobernador.resumen()
+        print(f" Memoria: RSS base {resumen['rss_base_mb']:.0f} MB, máximo {resumen['rss_max_mb']:.0f} MB, "
+              f"{resumen['reciclados']} reciclados, {resumen['crecimiento_por_tarea_mb']:+.3f} MB por registro "
+              f"desde el último")
+        metricas = self.politica_gc.metricas()
+        print(f"️ GC: {metricas['segundos_gc']:.2f}s en total, {metricas['ms_gc_por_1000_registros']:.0f} ms "
+              f"por 1000 registros ({metricas['colecciones_forzadas']} forzadas, "
+              f"{metricas['objetos_congelados']} objetos congelados)")
+    
+    def _obtener_executor_render(self, hilos):
+        """Pool de hilos de render reutilizado entre archivos del mismo proceso"""
+        import concurrent.futures
+        
+        if self._executor_render is None or self._hilos_executor != hilos:
+            self.cerrar_executor_render()
+            plan = self._colocar_trabajadores(hilos)
+            self._executor_render = concurrent.futures.ThreadPoolExecutor(
+                max_workers=hilos, initializer=plan.inicializador()
+            )
+            self._hilos_executor = hilos
+        return self._executor_render
+    
+    def cerrar_executor_render(self):
+        """Cierra el pool de hilos de render (al terminar la ejecución)"""
+        if self._executor_render is not None:
+            self._executor_render.shutdown(wait=True)
+            self._executor_render = None
+            self._hilos_executor = None
+    
+    def _cerrar_movedor_usadas(self):
+        """Termina los traslados pendientes a usadas/ (al terminar la ejecución o antes de un fork)"""
+        if self.movedor_usadas is not None:
+            self.movedor_usadas.cerrar()
     
     def _procesar_registro_simple(self, idx, registro):
         """Procesa registro de forma simple sin barras de progreso"""
         try:
-            # Procesar datos básicos
-            datos_pasaporte = self.procesar_registro(registro)
-            
-            if datos_pasaporte is None:
-                return datos_pasaporte
-            
-            # Buscar imagen
-            ruta_imagen = self.buscar_imagen_por_edad(datos_pasaporte['edad'], datos_pasaporte.get('sexo', 'F'))
+            # Procesar datos básicos (incluye la foto elegida por edad y género)
+            datos_pasaporte = self.preparar_registro(registro)
             
-            if ruta_imagen is None:
-                datos_pasaporte['estado'] = 'omitido'
-                datos_pasaporte['motivo_no_generado'] = f"Sin imagen adecuada (edad {datos_pasaporte['edad']})"
+            if datos_pasaporte is None or datos_pasaporte.get('estado') == 'omitido':
                 return datos_pasaporte
             
-            datos_pasaporte['ruta_foto'] = str(ruta_imagen)
-            datos_pasaporte['imagen_usada'] = str(ruta_imagen)
-            
-            # Generar pasaporte visual
-            ruta_pasaporte_visual = self.generar_pasaporte_visual_optimizado(datos_pasaporte)
-            
-            if ruta_pasaporte_visual:
-                datos_pasaporte['pasaporte_visual'] = str(ruta_pasaporte_visual)
-                datos_pasaporte['estado'] = 'generado'
-                
-                # Mover imagen usada
-                self.mover_imagen_usada(datos_pasaporte['imagen_usada'])
-            else:
-                datos_pasaporte['estado'] = 'omitido'
-                datos_pasaporte['motivo_no_generado'] = "Error en generación de pasaporte visual"
-            
-            # Limpiar buffers temporales
-            self._limpiar_buffers_temporales()
-            
-            return datos_pasaporte
+            return self._renderizar_registro(datos_pasaporte)
             
         except Exception as e:
             print(f" Error en registro {idx + 1}: {e}")
             return None
+    
+    def _renderizar_registro(self, datos_pasaporte, limpiar_buffers=True):
+        """Genera el pasaporte visual de un registro ya preparado y actualiza su estado
+        
+        Seguro para llamarse desde varios hilos con registros distintos.
+        """
+        # Generar pasaporte visual
+        ruta_pasaporte_visual = self.generar_pasaporte_visual_optimizado(datos_pasaporte)
+        if self.precarga_fotos is not None:
+            self.precarga_fotos.descartar(datos_pasaporte.get('ruta_foto'))
+        
+        if ruta_pasaporte_visual:
+            datos_pasaporte['pasaporte_visual'] = str(ruta_pasaporte_visual)
+            datos_pasaporte['estado'] = 'generado'
+            
+            self.confirmar_imagen(datos_pasaporte['imagen_usada'])
+        else:
+            datos_pasaporte['estado'] = 'omitido'
+            datos_pasaporte['motivo_no_generado'] = "Error en generación de pasaporte visual"
+            self.liberar_imagen(datos_pasaporte.get('imagen_usada'))
+        
+        # Limpiar buffers temporales
+        if limpiar_buffers:
+            self._limpiar_buffers_temporales()
+        
+        return datos_pasaporte
 
     def _limpieza_previa(self):
         """Limpieza preventiva antes de iniciar una generación masiva."""
@@ -570,21 +916,8 @@ class GeneradorPasaportesMasivo:
             # Limpieza silenciosa
             # Limpiar temporales previos
             self._cleanup_temporales()
-            # Forzar GC
-            for _ in range(2):
-                gc.collect()
-            # Vaciar caché GPU si disponible
-            try:
-                import torch
-                if torch.cuda.is_available():
-                    torch.cuda.synchronize()
-                    torch.cuda.empty_cache()
-                    pass
-            except Exception:
-                pass
-            # Reducir consumo de subprocesos BLAS
-            os.environ['OMP_NUM_THREADS'] = os.environ.get('OMP_NUM_THREADS', '4')
-            os.environ['MKL_NUM_THREADS'] = os.environ.get('MKL_NUM_THREADS', '4')
+            # Recolectar (y vaciar caché GPU) solo si las asignaciones crecieron
+            self.politica_gc.tal_vez_recolectar()
         except Exception as e:
             pass
     
@@ -734,11 +1067,8 @@ class GeneradorPasaportesMasivo:
             if LOGGING_DETALLADO:
                 print("   ️ No se detectó GPU compatible, usando CPU optimizado")
         
-        # Configurar variables de entorno para optimización universal
-        os.environ['OMP_NUM_THREADS'] = '4'
-        os.environ['MKL_NUM_THREADS'] = '4'
-        os.environ['OPENBLAS_NUM_THREADS'] = '4'
-        os.environ['NUMEXPR_NUM_THREADS'] = '4'
+        # Los hilos de BLAS/OpenMP solo se limitan con un plan de colocación (_colocar_trabajadores →
+        # _aplicar_limites_nativos)
         
         # OPTIMIZACIÓN: Deshabilitar MediaPipe completamente (causa segmentation faults)
         os.environ['MEDIAPIPE_GPU'] = '0'
@@ -757,9 +1087,7 @@ class GeneradorPasaportesMasivo:
         self.plantilla_cache = None
         self.plantilla_path = None
         
-        # 2. Cache de modelos de IA (MediaPipe, OpenCV, etc.)
-        self.mediapipe_cache = None
-        self.opencv_models_cache = {}
+        # 2. Detectores de cara: instancias únicas por proceso en detectores_cara.obtener_detector
         
         # 3. Buffers de procesamiento de imágenes (reutilizables)
         self.image_buffers = {
@@ -788,50 +1116,46 @@ class GeneradorPasaportesMasivo:
         if LOGGING_DETALLADO:
             print(" Recursos reservados reutilizables inicializados")
 
-    def _cargar_script_maestro_lazy(self):
-        """OPTIMIZACIÓN: Carga ScriptMaestroIntegrado solo cuando se necesite"""
+    def _cargar_script_maestro_lazy(self, hilos_onnx=None):
+        """OPTIMIZACIÓN: Carga ScriptMaestroIntegrado solo cuando se necesite
+        
+        hilos_onnx: hilos de la sesión de rembg (por defecto los del plan de colocación).
+        """
         if self.script_maestro_cache is None:
-            try:
-                self.script_maestro_cache = ScriptMaestroIntegrado()
-                print("    Script maestro cargado bajo demanda")
-            except Exception as e:
-                print(f"    Error cargando script maestro: {e}")
-                return None
+            with self._lock_script_maestro:
+                if self.script_maestro_cache is None:
+                    try:
+                        plan = self.plan_colocacion
+                        if hilos_onnx is None and plan is not None:
+                            hilos_onnx = plan.hilos_por_trabajador
+                        self.script_maestro_cache = ScriptMaestroIntegrado(hilos_onnx=hilos_onnx)
+                        self.script_maestro_cache.precarga_fotos = self.precarga_fotos
+                        print("    Script maestro cargado bajo demanda")
+                        # Modelos, fuentes y plantilla ya cargados: fuera de las recolecciones
+                        self.politica_gc.congelar()
+                    except Exception as e:
+                        print(f"    Error cargando script maestro: {e}")
+                        return None
         return self.script_maestro_cache
 
     def _inicializar_modelos_opencv_basicos(self):
-        """OPTIMIZACIÓN: Inicializa modelos OpenCV básicos solo cuando se necesiten"""
+        """OPTIMIZACIÓN: Configura OpenCV; los detectores se cargan bajo demanda desde el registro"""
         try:
             import cv2
             
-            # Configurar OpenCV para optimización (ligero)
-            cv2.setNumThreads(2)  # Reducir threads para ahorrar memoria
-            
-            # Solo inicializar cache, cargar modelos bajo demanda
-            self.opencv_models_cache = {}
+            # Los hilos de OpenCV los reparte _colocar_trabajadores según los hilos de render
             
             print("    Modelos OpenCV preparados para carga bajo demanda")
             
         except Exception as e:
             print(f"   ️ Error preparando OpenCV: {e}")
     
-    def _cargar_modelo_opencv_bajo_demanda(self, modelo_name):
-        """Carga modelos OpenCV solo cuando se necesiten"""
-        if modelo_name not in self.opencv_models_cache:
-            try:
-                import cv2
-                
-                if modelo_name == 'face_cascade':
-                    face_cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-                    if Path(face_cascade_path).exists():
-                        self.opencv_models_cache[modelo_name] = cv2.CascadeClassifier(face_cascade_path)
-                        print(f"    {modelo_name} cargado bajo demanda")
-                
-            except Exception as e:
-                print(f"   ️ Error cargando {modelo_name}: {e}")
-                return None
-        
-        return self.opencv_models_cache.get(modelo_name)
+    def _detectar_caja_cara(self, imagen_rgb):
+        """Detecta la cara más grande con el cascade de Haar cacheado; devuelve (x, y, w, h) o None"""
+        if obtener_detector is None:
+            return None
+        geometria = obtener_detector('haar').detectar(imagen_rgb)
+        return geometria['caja'] if geometria is not None else None
 
     def _cargar_plantilla_base(self, plantilla_path):
         """OPTIMIZACIÓN: Carga plantilla base una sola vez y la reutiliza"""
@@ -846,42 +1170,6 @@ class GeneradorPasaportesMasivo:
                 return None
         return self.plantilla_cache
 
-    def _inicializar_modelos_ia(self):
-        """OPTIMIZACIÓN: Inicializa modelos de IA una sola vez"""
-        if self.mediapipe_cache is None:
-            try:
-                import mediapipe as mp
-                # Inicializar MediaPipe una sola vez
-                self.mediapipe_cache = {
-                    'face_mesh': mp.solutions.face_mesh.FaceMesh(
-                        static_image_mode=True,
-                        max_num_faces=1,
-                        refine_landmarks=True,
-                        min_detection_confidence=0.5,
-                        min_tracking_confidence=0.5
-                    ),
-                    'face_detection': mp.solutions.face_detection.FaceDetection(
-                        model_selection=0,
-                        min_detection_confidence=0.5
-                    )
-                }
-                print("    Modelos MediaPipe inicializados")
-            except Exception as e:
-                print(f"   ️ Error inicializando MediaPipe: {e}")
-                self.mediapipe_cache = None
-        
-        if not self.opencv_models_cache:
-            try:
-                import cv2
-                # Cargar modelos OpenCV una sola vez
-                self.opencv_models_cache = {
-                    'face_cascade': cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'),
-                    'eye_cascade': cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-                }
-                print("    Modelos OpenCV inicializados")
-            except Exception as e:
-                print(f"   ️ Error inicializando OpenCV: {e}")
-
     def _procesar_imagen_optimizada(self, ruta_imagen):
         """OPTIMIZACIÓN: Procesa imagen usando recursos reservados reutilizables"""
         try:
@@ -895,42 +1183,36 @@ class GeneradorPasaportesMasivo:
             self.image_buffers['original'] = imagen
             imagen_rgb = cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
             
-            # Detectar cara usando modelo cacheado
-            if 'face_cascade' in self.opencv_models_cache:
-                face_cascade = self.opencv_models_cache['face_cascade']
-                gray = cv2.cvtColor(imagen_rgb, cv2.COLOR_RGB2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            # Detectar cara usando el detector cacheado del registro
+            caja = self._detectar_caja_cara(imagen_rgb)
+            if caja is not None:
+                x, y, w, h = caja
+                
+                # Recortar cara usando buffer
+                self.image_buffers['processed'] = imagen_rgb[y:y+h, x:x+w]
+                
+                # Procesar fondo usando GPU si está disponible
+                cara_recortada = self.image_buffers['processed']
+                
+                # Remover fondo usando OpenCV optimizado
+                hsv = cv2.cvtColor(cara_recortada, cv2.COLOR_RGB2HSV)
+                lower_skin = np.array([0, 20, 70], dtype=np.uint8)
+                upper_skin = np.array([20, 255, 255], dtype=np.uint8)
+                mask = cv2.inRange(hsv, lower_skin, upper_skin)
+                
+                # Aplicar morfología para limpiar la máscara
+                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+                mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+                
+                # Aplicar la máscara
+                resultado = cara_recortada.copy()
+                resultado[mask == 0] = [0, 0, 0, 0]  # Transparente
                 
-                if len(faces) > 0:
-                    # Tomar la cara más grande
-                    face = max(faces, key=lambda x: x[2] * x[3])
-                    x, y, w, h = face
-                    
-                    # Recortar cara usando buffer
-                    self.image_buffers['processed'] = imagen_rgb[y:y+h, x:x+w]
-                    
-                    # Procesar fondo usando GPU si está disponible
-                    cara_recortada = self.image_buffers['processed']
-                    
-                    # Remover fondo usando OpenCV optimizado
-                    hsv = cv2.cvtColor(cara_recortada, cv2.COLOR_RGB2HSV)
-                    lower_skin = np.array([0, 20, 70], dtype=np.uint8)
-                    upper_skin = np.array([20, 255, 255], dtype=np.uint8)
-                    mask = cv2.inRange(hsv, lower_skin, upper_skin)
-                    
-                    # Aplicar morfología para limpiar la máscara
-                    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-                    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-                    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-                    
-                    # Aplicar la máscara
-                    resultado = cara_recortada.copy()
-                    resultado[mask == 0] = [0, 0, 0, 0]  # Transparente
-                    
-                    # Convertir a PIL usando buffer
-                    from PIL import Image
-                    self.image_buffers['final'] = Image.fromarray(resultado)
-                    return self.image_buffers['final']
+                # Convertir a PIL usando buffer
+                from PIL import Image
+                self.image_buffers['final'] = Image.fromarray(resultado)
+                return self.image_buffers['final']
             
             return None
             
@@ -944,17 +1226,8 @@ class GeneradorPasaportesMasivo:
         for key in ['original', 'processed', 'resized', 'grayscale']:
             self.image_buffers[key] = None
         
-        # Forzar garbage collection solo de temporales
-        import gc
-        gc.collect()
-        
-        # Limpiar cache GPU si es necesario
-        try:
-            import torch
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-        except:
-            pass
+        # Recolección completa solo si las asignaciones crecieron (ver SCRIPTS/politica_gc.py)
+        self.politica_gc.tal_vez_recolectar()
 
     def _liberar_recursos_reservados(self):
         """OPTIMIZACIÓN: Libera todos los recursos reservados al final del procesamiento"""
@@ -965,15 +1238,9 @@ class GeneradorPasaportesMasivo:
             del self.plantilla_cache
             self.plantilla_cache = None
         
-        # Limpiar modelos de IA
-        if self.mediapipe_cache:
-            for model in self.mediapipe_cache.values():
-                if hasattr(model, 'close'):
-                    model.close()
-            self.mediapipe_cache = None
-        
-        # Limpiar modelos OpenCV
-        self.opencv_models_cache.clear()
+        # Limpiar detectores de cara cacheados
+        if cerrar_detectores is not None:
+            cerrar_detectores()
         
         # Limpiar todos los buffers
         for key in self.image_buffers:
@@ -1127,10 +1394,10 @@ class GeneradorPasaportesMasivo:
         return None
     
     def _hay_imagenes_disponibles(self) -> bool:
-        """Retorna True si hay imágenes disponibles para procesar (no usadas)."""
+        """Retorna True si hay imágenes disponibles para procesar (libres en el libro de fotos)."""
         try:
-            disponibles = list(self.imagenes_mujeres_path.glob('*.png'))
-            return len(disponibles) > 0
+            self._sincronizar_fotos()
+            return self.libro_fotos.disponibles() > 0
         except Exception:
             return False
         
@@ -1174,11 +1441,11 @@ class GeneradorPasaportesMasivo:
     def _convertir_xlsx_a_csv(self, archivo_xlsx: Path) -> Path:
         """Convierte XLSX a CSV (UTF-8) en la misma carpeta con timestamp en el nombre y retorna la ruta del CSV."""
         try:
-            df = pd.read_excel(archivo_xlsx, dtype=str)
             ts = datetime.now().strftime('%Y%m%d_%H%M%S')
             csv_path = archivo_xlsx.with_name(f"{archivo_xlsx.stem}_{ts}.csv")
-            # Guardar en UTF-8 sin index
-            df.to_csv(csv_path, index=False, encoding='utf-8')
+            # Leer por bloques y anexar al CSV (UTF-8 sin index) con memoria acotada
+            for i, df in enumerate(iterar_xlsx_por_bloques(archivo_xlsx)):
+                df.to_csv(csv_path, index=False, encoding='utf-8', mode='w' if i == 0 else 'a', header=(i == 0))
             print(f" Convertido XLSX→CSV: {csv_path.name}")
             return csv_path
         except Exception as e:
@@ -1266,36 +1533,7 @@ class GeneradorPasaportesMasivo:
     
     def limpiar_texto(self, texto):
         """Limpia y normaliza texto (mayúsculas, sin acentos, sin espacios excesivos)"""
-        if pd.isna(texto) or texto == '':
-            return ''
-        
-        # Convertir a string y limpiar
-        texto = str(texto).strip()
-        
-        # Eliminar acentos y caracteres especiales
-        texto = texto.replace('á', 'A').replace('é', 'E').replace('í', 'I').replace('ó', 'O').replace('ú', 'U')
-        texto = texto.replace('Á', 'A').replace('É', 'E').replace('Í', 'I').replace('Ó', 'O').replace('Ú', 'U')
-        texto = texto.replace('ñ', 'N').replace('Ñ', 'N')
-        
-        # Convertir a mayúsculas
-        texto = texto.upper()
-        
-        # Eliminar espacios excesivos
-        texto = ' '.join(texto.split())
-        
-        return texto
-    
-    def generar_numero_pasaporte(self):
-        """Genera un número de pasaporte aleatorio dentro del rango válido"""
-        return random.randint(self.rango_pasaporte_min, self.rango_pasaporte_max)
-    
-    def seleccionar_lugar_nacimiento(self):
-        """Selecciona aleatoriamente un lugar de nacimiento de Venezuela"""
-        estado = random.choice(list(self.estados_venezuela.keys()))
-        capital = self.estados_venezuela[estado]
-        # Normalizar a MAYÚSCULAS y sin acentos para impresión en pasaporte
-        capital_norm = self.limpiar_texto(capital)
-        return f"{capital_norm} VEN"
+        return normalizar_texto(texto)
     
     def formatear_fecha_pasaporte(self, fecha):
         """Formatea fecha para el pasaporte (DD/MMM/MMM/YYYY)"""
@@ -1317,240 +1555,10 @@ class GeneradorPasaportesMasivo:
             print(f"️ Error procesando fecha: {e}")
             return "01/Ene/Jan/2000"
         
-        # Meses en español (primera letra mayúscula, resto minúsculas)
-        meses_es = {
-            1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr',
-            5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Ago',
-            9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'
-        }
-        
-        # Meses en inglés (primera letra mayúscula, resto minúsculas)
-        meses_en = {
-            1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr',
-            5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Aug',
-            9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
-        }
-        
-        mes_es = meses_es[fecha.month]
-        mes_en = meses_en[fecha.month]
+        mes_es = MESES_ES[fecha.month]
+        mes_en = MESES_EN[fecha.month]
         return f"{fecha.day:02d}/{mes_es}/{mes_en}/{fecha.year}"
     
-    def generar_fecha_emision(self, fecha_nacimiento):
-        """
-        Genera fecha de emisión realista basada en la fecha de nacimiento
-        
-        Reglas:
-        1. La emisión debe ser DESPUÉS de que la persona cumpla 18 años
-        2. La emisión debe ser en los últimos 5 años (pasaporte vigente)
-        3. La emisión debe ser al menos 3 meses antes de hoy (evitar expiración próxima)
-        """
-        # Verificar si la fecha es válida
-        if fecha_nacimiento is None or pd.isna(fecha_nacimiento):
-            # Usar fecha por defecto si no hay fecha de nacimiento
-            hoy = date.today()
-            return self.formatear_fecha_pasaporte(date(hoy.year - 2, 1, 1))
-        
-        hoy = date.today()
-        
-        try:
-            # Calcular fecha cuando cumplió 18 años
-            if isinstance(fecha_nacimiento, str):
-                if not fecha_nacimiento.strip():
-                    return self.formatear_fecha_pasaporte(date(hoy.year - 2, 1, 1))
-                fecha_nac = datetime.strptime(fecha_nacimiento, '%Y-%m-%d').date()
-            else:
-                fecha_nac = fecha_nacimiento.date() if hasattr(fecha_nacimiento, 'date') else fecha_nacimiento
-            
-            fecha_18_anos = date(fecha_nac.year + 18, fecha_nac.month, fecha_nac.day)
-        except Exception:
-            # Si hay error, usar fecha por defecto
-            return self.formatear_fecha_pasaporte(date(hoy.year - 2, 1, 1))
-        
-        # La emisión debe ser DESPUÉS de cumplir 18 años
-        fecha_inicio_emision = max(fecha_18_anos, date(hoy.year - 5, 1, 1))
-        
-        # La emisión debe ser al menos 3 meses antes de hoy (evitar expiración próxima)
-        if hoy.month > 3:
-            fecha_limite = date(hoy.year, hoy.month - 3, hoy.day)
-        else:
-            fecha_limite = date(hoy.year - 1, hoy.month + 9, hoy.day)
-        fecha_fin_emision = min(fecha_limite, hoy)
-        
-        # Asegurar que hay al menos 1 año de diferencia entre inicio y fin
-        if fecha_inicio_emision >= fecha_fin_emision:
-            # Extender el rango si es necesario
-            fecha_fin_emision = date(fecha_inicio_emision.year + 1, fecha_inicio_emision.month, fecha_inicio_emision.day)
-        
-        # Si no hay rango válido, usar fecha por defecto
-        if fecha_inicio_emision >= fecha_fin_emision:
-            print(f"️ Rango de fechas inválido. Inicio: {fecha_inicio_emision}, Fin: {fecha_fin_emision}")
-            fecha_emision = date(hoy.year - 2, 1, 1)  # 2 años atrás como fallback
-        else:
-            dias_diferencia = (fecha_fin_emision - fecha_inicio_emision).days
-            dias_aleatorios = random.randint(0, dias_diferencia)
-            fecha_emision = fecha_inicio_emision + pd.Timedelta(days=dias_aleatorios)
-            # Fecha generada silenciosamente
-        
-        return self.formatear_fecha_pasaporte(fecha_emision)
-    
-    def generar_fecha_vencimiento(self, fecha_emision):
-        """
-        Genera fecha de vencimiento (10 años después de emisión según SAIME)
-        
-        Reglas:
-        1. Exactamente 10 años después de la fecha de emisión
-        2. Usar la fecha exacta de emisión, no solo el año
-        """
-        if isinstance(fecha_emision, str):
-            # Extraer fecha de la fecha formateada (DD/MMM/MMM/YYYY)
-            partes = fecha_emision.split('/')
-            dia = int(partes[0])
-            año = int(partes[3])
-            
-            # Mapear mes
-            meses = {
-                'ENE': 1, 'FEB': 2, 'MAR': 3, 'ABR': 4, 'MAY': 5, 'JUN': 6,
-                'JUL': 7, 'AGO': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DIC': 12
-            }
-            mes = meses.get(partes[1], 1)
-            
-            fecha_emision_obj = date(año, mes, dia)
-        else:
-            fecha_emision_obj = fecha_emision
-        
-        # Calcular vencimiento exacto (10 años después)
-        try:
-            fecha_vencimiento = date(
-                fecha_emision_obj.year + self.vigencia_pasaporte_anos,
-                fecha_emision_obj.month,
-                fecha_emision_obj.day
-            )
-        except ValueError:
-            # Si el día no existe en el año de vencimiento (ej: 29 feb en año no bisiesto)
-            fecha_vencimiento = date(
-                fecha_emision_obj.year + self.vigencia_pasaporte_anos,
-                fecha_emision_obj.month,
-                fecha_emision_obj.day - 1
-            )
-        
-        return self.formatear_fecha_pasaporte(fecha_vencimiento)
-    
-    def generar_codigo_verificacion(self, fecha_nacimiento):
-        """Genera código de verificación basado en fecha de nacimiento"""
-        if fecha_nacimiento is None or pd.isna(fecha_nacimiento):
-            return "01-01-00"
-        
-        try:
-            if isinstance(fecha_nacimiento, str):
-                if not fecha_nacimiento.strip():
-                    return "01-01-00"
-                fecha = datetime.strptime(fecha_nacimiento, '%Y-%m-%d')
-            else:
-                fecha = fecha_nacimiento
-            
-            return f"{fecha.day:02d}-{fecha.month:02d}-{str(fecha.year)[-2:]}"
-        except Exception:
-            return "01-01-00"
-    
-    def generar_mrz_linea1(self, nombre, apellido, numero_pasaporte):
-        """
-        Genera línea 1 del código MRZ (Machine Readable Zone)
-        
-        FORMATO MRZ LÍNEA 1 CORRECTO:
-        P<VEN{APELLIDO}<<{NOMBRE}<<<<<<<<<<<<<<<
-        
-        Donde:
-        - P = Tipo de documento (Pasaporte)
-        - < = Separador
-        - VEN = Código de país (Venezuela)
-        - APELLIDO = Apellido completo (máximo 20 caracteres, relleno con <)
-        - << = Separador doble
-        - NOMBRE = Nombre completo (máximo 20 caracteres, relleno con <)
-        - <<<<<<<<<<<<<<< = Relleno final (15 caracteres)
-        
-        TOTAL: 44 caracteres
-        """
-        # Limpiar y formatear apellido (sin espacios, solo letras)
-        apellido_limpio = re.sub(r'[^A-Z]', '', apellido.upper())[:20]
-        apellido_padded = apellido_limpio.ljust(20, '<')
-        
-        # Limpiar y formatear nombre (sin espacios, solo letras)
-        nombre_limpio = re.sub(r'[^A-Z]', '', nombre.upper())[:20]
-        nombre_padded = nombre_limpio.ljust(20, '<')
-        
-        # Construir línea MRZ completa (44 caracteres)
-        mrz_linea = f"P<VEN{apellido_padded}<<{nombre_padded}"
-        
-        # Asegurar que tenga exactamente 44 caracteres
-        if len(mrz_linea) < 44:
-            mrz_linea = mrz_linea.ljust(44, '<')
-        elif len(mrz_linea) > 44:
-            mrz_linea = mrz_linea[:44]
-        
-        return mrz_linea
-    
-    def generar_mrz_linea2(self, numero_pasaporte, fecha_nacimiento, sexo):
-        """
-        Genera línea 2 del código MRZ (Machine Readable Zone)
-        
-        FORMATO MRZ LÍNEA 2 CORRECTO:
-        {NUMERO_PASAPORTE}{CHECK_DIGIT}{PAIS}{FECHA_NAC}{SEXO}{FECHA_VENC}{CHECK_DIGIT}{RELLENO}{CHECK_DIGIT}
-        
-        Donde:
-        - NUMERO_PASAPORTE = Número de pasaporte (9 dígitos)
-        - CHECK_DIGIT = Dígito de verificación del número de pasaporte
-        - PAIS = Código de país (VEN)
-        - FECHA_NAC = Fecha de nacimiento (YYMMDD)
-        - SEXO = F (Femenino) o M (Masculino)
-        - FECHA_VENC = Fecha de vencimiento (YYMMDD)
-        - CHECK_DIGIT = Dígito de verificación adicional
-        - RELLENO = Relleno con < (15 caracteres)
-        - CHECK_DIGIT = Dígito de verificación final
-        
-        TOTAL: 44 caracteres
-        """
-        # Formatear fecha de nacimiento para MRZ
-        try:
-            if fecha_nacimiento is None or pd.isna(fecha_nacimiento):
-                # Usar fecha por defecto si no hay fecha válida
-                fecha = datetime(1990, 1, 1)
-            elif isinstance(fecha_nacimiento, str):
-                if not fecha_nacimiento.strip():
-                    fecha = datetime(1990, 1, 1)
-                else:
-                    fecha = datetime.strptime(fecha_nacimiento, '%Y-%m-%d')
-            else:
-                fecha = fecha_nacimiento
-            
-            fecha_mrz = f"{str(fecha.year)[-2:]}{fecha.month:02d}{fecha.day:02d}"
-            
-            # Fecha de vencimiento (10 años después)
-            fecha_vencimiento = date(fecha.year + 10, 1, 1)
-            fecha_venc_mrz = f"{str(fecha_vencimiento.year)[-2:]}{fecha_vencimiento.month:02d}{fecha_vencimiento.day:02d}"
-        except Exception:
-            # Usar fechas por defecto en caso de error
-            fecha_mrz = "900101"
-            fecha_venc_mrz = "000101"
-        
-        # Sexo para MRZ
-        sexo_mrz = 'F' if sexo.upper() == 'F' else 'M'
-        
-        # Generar dígitos de verificación (simulados)
-        check_digit_pasaporte = random.randint(0, 9)
-        check_digit_adicional = random.randint(0, 9)
-        check_digit_final = random.randint(0, 9)
-        
-        # Construir línea MRZ completa
-        mrz_linea = f"{numero_pasaporte}{check_digit_pasaporte}VEN{fecha_mrz}{sexo_mrz}{fecha_venc_mrz}{check_digit_adicional}<<<<<<<<<<<<<<<{check_digit_final}"
-        
-        # Asegurar que tenga exactamente 44 caracteres
-        if len(mrz_linea) < 44:
-            mrz_linea = mrz_linea.ljust(44, '<')
-        elif len(mrz_linea) > 44:
-            mrz_linea = mrz_linea[:44]
-        
-        return mrz_linea
-    
     def definir_rango_edad(self, edad):
         """Define rangos de edad apropiados para búsqueda de imágenes"""
         if edad <= 20:
@@ -1578,6 +1586,10 @@ class GeneradorPasaportesMasivo:
         1. Coincidencia exacta de edad
         2. Rango de edad apropiado
         3. Si no hay coincidencia exacta ni por rango: OMITIR registro (no usar aleatoria)
+        
+        La foto elegida queda reservada en el libro de fotos hasta confirmarla
+        o liberarla, para que ningún otro registro en curso (de este u otro
+        proceso) la reciba.
         """
         genero_upper = (genero or 'F').upper()
         if genero_upper == 'F':
@@ -1589,47 +1601,39 @@ class GeneradorPasaportesMasivo:
         else:
             return None
 
-        # Buscar imágenes según género
-        imagenes_disponibles = list(carpeta_imagenes.glob('*.png'))
-        
-        if not imagenes_disponibles:
-            print(f"️ No se encontraron imágenes en {self.imagenes_mujeres_path}")
-            return None
-        
-        # 1. Buscar coincidencia exacta de edad
-        imagenes_exactas = []
-        for img_path in imagenes_disponibles:
-            nombre_archivo = img_path.stem
-            match = re.search(rf'massive_venezuelan_{etiqueta_genero}_(\d+)_', nombre_archivo)
-            
-            if match:
-                edad_imagen = int(match.group(1))
-                if edad_imagen == edad:
-                    imagenes_exactas.append((img_path, edad_imagen))
-        
-        if imagenes_exactas:
-            imagen_seleccionada, edad_imagen = random.choice(imagenes_exactas)
-            return imagen_seleccionada
-        
-        # 2. Si no hay coincidencia exacta, usar rangos
-        rango_min, rango_max = self.definir_rango_edad(edad)
-        
-        imagenes_rango = []
-        for img_path in imagenes_disponibles:
-            nombre_archivo = img_path.stem
-            match = re.search(rf'massive_venezuelan_{etiqueta_genero}_(\d+)_', nombre_archivo)
-            
-            if match:
-                edad_imagen = int(match.group(1))
-                if rango_min <= edad_imagen <= rango_max:
-                    imagenes_rango.append((img_path, edad_imagen))
-        
-        if imagenes_rango:
-            imagen_seleccionada, edad_imagen = random.choice(imagenes_rango)
-            return imagen_seleccionada
-        
+        self._sincronizar_carpeta(carpeta_imagenes, etiqueta_genero)
+        return self._seleccionar_imagen_por_edad(carpeta_imagenes, edad)
+    
+    def _sincronizar_fotos(self):
+        """Alinea el libro con las dos carpetas de fotos (una vez por proceso)"""
+        self._sincronizar_carpeta(self.imagenes_mujeres_path, 'mujer')
+        self._sincronizar_carpeta(self.imagenes_hombres_path, 'hombre')
+    
+    def _sincronizar_carpeta(self, carpeta_imagenes, etiqueta_genero):
+        """Un solo glob por carpeta y proceso; antes libera reservas de ejecuciones cortadas"""
+        clave = str(carpeta_imagenes)
+        with self._lock_imagenes:
+            if clave in self._carpetas_sincronizadas:
+                return
+            if not self._carpetas_sincronizadas:
+                liberadas = self.libro_fotos.liberar_huerfanas()
+                if liberadas:
+                    print(f"♻️ {liberadas} fotos reservadas por una ejecución interrumpida vuelven a estar libres")
+            self.libro_fotos.sincronizar(carpeta_imagenes, etiqueta_genero)
+            if self.movedor_usadas is not None:
+                # Usadas que quedaron sin mover (ejecución cortada o con MOVER_USADAS desactivado)
+                for ruta in self.libro_fotos.pendientes_de_mover(carpeta_imagenes):
+                    self.movedor_usadas.encolar(ruta)
+            self._carpetas_sincronizadas.add(clave)
+    
+    def _seleccionar_imagen_por_edad(self, carpeta_imagenes, edad):
+        """Reserva una foto libre: edad exacta, luego rango; None si no hay"""
+        # 1. Coincidencia exacta de edad; 2. si no hay, rango de edad (en la misma transacción)
+        imagen = self.libro_fotos.reservar(carpeta_imagenes, edad, self.definir_rango_edad(edad))
+        if imagen is None and not self.libro_fotos.disponibles(carpeta_imagenes):
+            print(f"️ No se encontraron imágenes en {carpeta_imagenes}")
         # 3. Si no hay coincidencias en rango, omitir (no usar aleatoria)
-        return None
+        return imagen
     
     def procesar_imagen_optimizada(self, ruta_imagen):
         """OPTIMIZACIÓN: Procesa imagen usando OpenCV en lugar de MediaPipe/rembg"""
@@ -1642,15 +1646,11 @@ class GeneradorPasaportesMasivo:
             # Convertir a RGB
             imagen_rgb = cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)
             
-            # Detectar cara usando OpenCV (más rápido que MediaPipe)
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            gray = cv2.cvtColor(imagen_rgb, cv2.COLOR_RGB2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            # Detectar cara usando OpenCV (más rápido que MediaPipe), cascade cacheado
+            caja = self._detectar_caja_cara(imagen_rgb)
             
-            if len(faces) > 0:
-                # Tomar la cara más grande
-                face = max(faces, key=lambda x: x[2] * x[3])
-                x, y, w, h = face
+            if caja is not None:
+                x, y, w, h = caja
                 
                 # Recortar cara
                 cara_recortada = imagen_rgb[y:y+h, x:x+w]
@@ -1680,32 +1680,44 @@ class GeneradorPasaportesMasivo:
             print(f"️ Error procesando imagen: {e}")
             return None
     
+    def liberar_imagen(self, ruta_imagen):
+        """Quita la reserva de una foto que no llegó a usarse"""
+        if self.precarga_fotos is not None:
+            self.precarga_fotos.descartar(ruta_imagen)
+        if ruta_imagen:
+            self.libro_fotos.liberar(ruta_imagen)
+    
+    def confirmar_imagen(self, ruta_imagen):
+        """Marca la foto como usada en el libro y, con MOVER_USADAS, encola su traslado a usadas/"""
+        self.libro_fotos.confirmar(ruta_imagen)
+        # Una reconstrucción incremental puede usar la foto ya movida
+        if self.movedor_usadas is not None and Path(ruta_imagen).parent.name != 'usadas':
+            self.movedor_usadas.encolar(ruta_imagen)
+    
     def mover_imagen_usada(self, ruta_imagen):
-        """Mueve la imagen usada a una subcarpeta para evitar reutilización"""
+        """Mueve la imagen usada y su JSON a la subcarpeta usadas/ (lo llama MovedorUsadas por lotes)"""
         try:
             # Determinar carpeta de origen (mujeres u hombres) y su subcarpeta 'usadas'
             imagen_path = Path(ruta_imagen)
             carpeta_usadas = imagen_path.parent / 'usadas'
             carpeta_usadas.mkdir(exist_ok=True)
+            destino_imagen = carpeta_usadas / imagen_path.name
             
             # Mover imagen y su archivo JSON correspondiente
             json_path = imagen_path.with_suffix('.json')
             
-            # Verificar que la imagen existe antes de moverla
+            # Verificar que la imagen existe antes de moverla (otra herramienta pudo moverla ya)
             if not imagen_path.exists():
+                if destino_imagen.exists():
+                    return True
                 print(f"️ Imagen no encontrada: {imagen_path}")
                 return False
             
-            # Mover imagen
-            destino_imagen = carpeta_usadas / imagen_path.name
             shutil.move(str(imagen_path), str(destino_imagen))
-            print(f" Imagen movida: {imagen_path.name} → usadas/")
             
             # Mover JSON si existe
             if json_path.exists():
-                destino_json = carpeta_usadas / json_path.name
-                shutil.move(str(json_path), str(destino_json))
-                print(f" JSON movido: {json_path.name} → usadas/")
+                shutil.move(str(json_path), str(carpeta_usadas / json_path.name))
             
             return True
             
@@ -2145,8 +2157,8 @@ class GeneradorPasaportesMasivo:
         print("    No hay fuentes disponibles detectadas, devolviendo BrittanySignature.ttf como marcador")
         return "BrittanySignature.ttf"
     
-    def generar_cedula_venezolana(self):
-        """Genera una cédula venezolana simulada más realista"""
+    def rango_cedula_venezolana(self):
+        """Rango (mínimo, máximo) de cédulas venezolanas simuladas"""
         # Las cédulas venezolanas tienen 8 dígitos
         # Patrones más realistas basados en rangos de años
         año_actual = datetime.now().year
@@ -2154,15 +2166,13 @@ class GeneradorPasaportesMasivo:
         # Generar cédula basada en rango de años (más realista)
         if año_actual >= 2020:
             # Cédulas más recientes (mayor número)
-            cedula = random.randint(20000000, 99999999)
+            return (20000000, 99999999)
         elif año_actual >= 2010:
             # Cédulas de rango medio
-            cedula = random.randint(15000000, 29999999)
+            return (15000000, 29999999)
         else:
             # Cédulas más antiguas
-            cedula = random.randint(8000000, 19999999)
-        
-        return str(cedula)
+            return (8000000, 19999999)
     
     def generar_nombre_archivo_pasaporte(self, correo):
         """Genera nombre de archivo basado en correo electrónico completo"""
@@ -2201,31 +2211,36 @@ class GeneradorPasaportesMasivo:
             if not ruta_foto or not numero_pasaporte:
                 return None
             
-            # Verificar que la imagen existe
-            if not Path(ruta_foto).exists():
+            # Verificar que la imagen existe (si está precargada ya se leyó)
+            foto = self.precarga_fotos.obtener(ruta_foto) if self.precarga_fotos is not None else None
+            if foto is None and not Path(ruta_foto).exists():
                 return None
             
-            # LIMPIAR datos previos y configurar los datos en el script maestro
-            script_maestro.datos_pasaporte = {}  # Limpiar datos previos
-            script_maestro.datos_pasaporte = datos_pasaporte
-            
-            # Generar el pasaporte usando recursos reservados reutilizables
-            if self.silencioso:
-                with open(os.devnull, 'w') as _null, contextlib.redirect_stdout(_null):
-                    resultado = script_maestro.generar_gafete_integrado(
-                        ruta_foto=ruta_foto,
-                        numero_pasaporte=numero_pasaporte
-                    )
+            # Generar el pasaporte pasando los datos del registro como argumento
+            # (render es reentrante: no depende de estado compartido del script maestro)
+            # El hash de la foto solo sirve para reutilizar la salida en modo incremental
+            # (la capa de foto calcula el suyo en el script maestro)
+            foto_sha256 = ''
+            if self.incremental:
+                foto_sha256 = foto.sha256 if foto is not None else hash_archivo(ruta_foto)
+            capas_dir = self.capas_path / Path(nombre_archivo).stem if self.guardar_capas else None
+            t_render = time.perf_counter()
+            if self.silencioso and silenciar_hilo is not None:
+                with silenciar_hilo():
+                    resultado = script_maestro.render(datos_pasaporte, ruta_foto=ruta_foto, capas_dir=capas_dir)
             else:
-                resultado = script_maestro.generar_gafete_integrado(
-                    ruta_foto=ruta_foto,
-                    numero_pasaporte=numero_pasaporte
-                )
+                resultado = script_maestro.render(datos_pasaporte, ruta_foto=ruta_foto, capas_dir=capas_dir)
+            if capas_dir is not None and script_maestro.capas_separables:
+                self._contar_capas(script_maestro.ultimo_resumen_capas)
             
             if resultado:
-                # Guardar con el nombre basado en correo completo
+                # Guardar con el nombre basado en correo completo, con la huella en chunks tEXt
                 ruta_destino = self.pasaportes_visuales_path / nombre_archivo
-                resultado.save(ruta_destino)
+                info = metadatos_png(
+                    datos_pasaporte, datos_pasaporte.get('huella_entrada', ''), foto_sha256,
+                    self._obtener_huella_entorno(), time.perf_counter() - t_render,
+                )
+                resultado.save(ruta_destino, pnginfo=info)
                 
                 # Liberar solo la imagen resultante, mantener recursos reservados
                 del resultado
@@ -2238,56 +2253,102 @@ class GeneradorPasaportesMasivo:
             print(f" Error en generación de pasaporte visual: {e}")
             return None
 
+    def _contar_capas(self, resumen_capas):
+        with self._lock_capas:
+            for capa, estado in (resumen_capas or {}).items():
+                if estado == 'reutilizada':
+                    self.capas_reutilizadas[capa] += 1
+    
     def generar_pasaporte_visual(self, datos_pasaporte):
         """Método legacy - redirige al optimizado"""
         return self.generar_pasaporte_visual_optimizado(datos_pasaporte)
     
+    def preparar_lote(self, df, claves=None):
+        """Añade a df las columnas preparadas y sintetizadas de todo el lote
+        
+        Normaliza nombres y parsea FECHA_NACIMIENTO una sola vez por lote
+        (SCRIPTS/preparacion_registros.py) y genera número de pasaporte, cédula,
+        lugar, fechas y MRZ de forma vectorizada (SCRIPTS/sintesis_campos.py). El
+        número de pasaporte y la cédula del lote son provisionales: los definitivos
+        los pide preparar_registro a los asignadores únicos (_asignar_numeros) solo
+        para registros que se van a renderizar, así que los omitidos, los saltados
+        y los reutilizados en modo incremental no gastan números.
+        preparar_registro consume esas columnas en lugar de calcularlas registro a registro.
+        `claves` (claves_registro del CSV completo) mantiene los valores de cada
+        registro cuando solo se prepara una parte de las filas.
+        """
+        preparado = anexar_preparacion(df)
+        return anexar_sintesis(
+            preparado,
+            self.semilla_sintesis,
+            (self.rango_pasaporte_min, self.rango_pasaporte_max),
+            self.rango_cedula_venezolana(),
+            list(self.estados_venezuela.values()),
+            self.vigencia_pasaporte_anos,
+            claves=claves,
+        )
+    
+    def _asignar_numeros(self, registro):
+        """(número de pasaporte, cédula, MRZ línea 2) definitivos de un registro que se va a renderizar"""
+        numero = str(self.asignador_pasaportes.siguiente())
+        cedula = str(self.asignador_cedulas.siguiente())
+        return numero, cedula, sustituir_numero_mrz(registro['mrz_linea2'], registro['numero_pasaporte'], numero)
+    
     def procesar_registro(self, registro):
-        """Procesa un registro individual y genera los datos del pasaporte"""
-        # Procesamiento silencioso
+        """Procesa un registro individual, genera los datos del pasaporte y su imagen"""
+        datos_pasaporte = self.preparar_registro(registro)
+        if datos_pasaporte.get('estado') == 'omitido':
+            return datos_pasaporte
         
-        # Verificar y liberar memoria si es necesario
-        self.gestor_memoria.incrementar_contador()
+        # Generar pasaporte visual
+        ruta_pasaporte_visual = self.generar_pasaporte_visual(datos_pasaporte)
+        if ruta_pasaporte_visual:
+            datos_pasaporte['pasaporte_visual'] = ruta_pasaporte_visual
         
-        # Limpiar y procesar datos básicos
-        primer_nombre = self.limpiar_texto(registro.get('PRIMER_NOMBRE', ''))
-        segundo_nombre = self.limpiar_texto(registro.get('SEGUNDO_NOMBRE', ''))
-        primer_apellido = self.limpiar_texto(registro.get('PRIMER_APELLIDO', ''))
-        segundo_apellido = self.limpiar_texto(registro.get('SEGUNDO_APELLIDO', ''))
-        genero = registro.get('GENERO', 'F')
-        fecha_nacimiento = registro.get('FECHA_NACIMIENTO')
+        # Presupuesto de RSS y reciclado de detectores (ver _controlar_memoria)
+        self.gobernador.registrar_tareas()
+        self._controlar_memoria()
         
-        # Calcular edad
-        edad = self.calcular_edad(fecha_nacimiento)
-        if edad is None:
-            edad = 25  # Edad por defecto
+        return datos_pasaporte
+    
+    def preparar_registro(self, registro):
+        """Genera los datos del pasaporte de un registro (sin renderizar)
         
-        # Generar datos del pasaporte
-        numero_pasaporte = str(self.generar_numero_pasaporte())
+        Elige y reserva la foto por edad y género y solo entonces asigna número de
+        pasaporte y cédula; si no hay foto adecuada el registro queda con estado
+        'omitido' y sin números.
+        """
+        # Procesamiento silencioso
         
-        # Construir nombre completo (manejar 1-2 nombres)
-        nombre_completo = primer_nombre
-        if segundo_nombre and segundo_nombre.strip():
-            nombre_completo += f" {segundo_nombre}"
+        # Verificar y liberar memoria si es necesario
+        self.gestor_memoria.incrementar_contador()
         
-        # Construir apellido completo (manejar 1-2 apellidos)
-        apellido_completo = primer_apellido
-        if segundo_apellido and segundo_apellido.strip():
-            apellido_completo += f" {segundo_apellido}"
+        # Columnas del lote (texto normalizado, edad, campos sintéticos);
+        # un registro suelto sin preparar se prepara como lote de una fila
+        if 'fecha_nacimiento_dt' not in registro or 'mrz_linea2' not in registro:
+            registro = self.preparar_lote(pd.DataFrame([registro])).iloc[0]
         
-        # Generar datos adicionales
-        lugar_nacimiento = self.seleccionar_lugar_nacimiento()
-        fecha_emision = self.generar_fecha_emision(fecha_nacimiento)
-        fecha_vencimiento = self.generar_fecha_vencimiento(fecha_emision)
-        codigo_verificacion = self.generar_codigo_verificacion(fecha_nacimiento)
+        nombre_completo = registro['nombre_completo']
+        apellido_completo = registro['apellido_completo']
+        genero = registro.get('GENERO', 'F')
+        edad = int(registro['edad'])
         
-        # Generar códigos MRZ
-        mrz_linea1 = self.generar_mrz_linea1(nombre_completo, apellido_completo, numero_pasaporte)
-        mrz_linea2 = self.generar_mrz_linea2(numero_pasaporte, fecha_nacimiento, genero)
+        # Campos sintéticos del lote (fechas, MRZ)
+        lugar_nacimiento = registro['lugar_nacimiento']
+        fecha_emision = registro['fecha_emision']
+        fecha_vencimiento = registro['fecha_vencimiento']
+        codigo_verificacion = registro['codigo_verificacion']
+        mrz_linea1 = registro['mrz_linea1']
         
         # Buscar imagen correspondiente
         ruta_imagen = self.buscar_imagen_por_edad(edad, genero)
         
+        # Números definitivos solo si hay foto (el registro se renderiza); un omitido no gasta números
+        if ruta_imagen is not None:
+            numero_pasaporte, cedula, mrz_linea2 = self._asignar_numeros(registro)
+        else:
+            numero_pasaporte = cedula = mrz_linea2 = ''
+        
         # Generar firma personalizada usando nombres completos
         firma_personalizada, fuente_optima = self.generar_firma_personalizada(nombre_completo, apellido_completo)
         
@@ -2305,8 +2366,8 @@ class GeneradorPasaportesMasivo:
             'pais_emisor': 'VEN',
             'nombre_completo': nombre_completo,
             'apellido_completo': apellido_completo,
-            'fecha_nacimiento': self.formatear_fecha_pasaporte(fecha_nacimiento),
-            'cedula': self.generar_cedula_venezolana(),  # Cédula venezolana simulada
+            'fecha_nacimiento': registro['fecha_nacimiento_pasaporte'],
+            'cedula': cedula,  # Cédula venezolana simulada
             'fecha_emision': fecha_emision,
             'fecha_vencimiento': fecha_vencimiento,
             'sexo': genero,
@@ -2320,7 +2381,8 @@ class GeneradorPasaportesMasivo:
             'edad': edad,
             'correo_original': registro.get('CORREO', ''),
             'imagen_usada': str(ruta_imagen) if ruta_imagen else None,
-            'nombre_archivo': nombre_archivo
+            'nombre_archivo': nombre_archivo,
+            'huella_entrada': huella_entrada(registro),
         }
 
         # Si no hay imagen adecuada, omitir generación de PNG y registrar motivo
@@ -2332,22 +2394,134 @@ class GeneradorPasaportesMasivo:
                     f.write(f"{datetime.now().isoformat()} - Registro omitido por falta de imagen adecuada (edad {edad})\n")
             except Exception:
                 pass
-            return datos_pasaporte
         
-        # Generar pasaporte visual
-        ruta_pasaporte_visual = self.generar_pasaporte_visual(datos_pasaporte)
-        if ruta_pasaporte_visual:
-            datos_pasaporte['pasaporte_visual'] = ruta_pasaporte_visual
+        return datos_pasaporte
+    
+    @staticmethod
+    def _estadisticas_incremental_vacias():
+        return {'sin_cambios': 0, 'reconstruidos': 0, 'segundos_ahorrados': 0.0}
+    
+    def _obtener_huella_entorno(self):
+        """Huella de config, plantilla, fuentes, versión de render y modelo cargado (una vez por proceso)"""
+        if self._huella_entorno is None:
+            maestro = self._cargar_script_maestro_lazy()
+            modelo = getattr(maestro, 'modelo_segmentacion', None) if maestro is not None else None
+            self._huella_entorno = huella_entorno(self.base_path, modelo)
+        return self._huella_entorno
+    
+    def _preparar_o_reutilizar(self, registro):
+        """preparar_registro, salvo que el modo incremental pueda reutilizar el PNG existente
         
-        # OPTIMIZACIÓN: Liberación de memoria más frecuente para 20K+ registros
-        memoria_actual = self.gestor_memoria.verificar_memoria()
-        if memoria_actual > 80:  # Más frecuente para evitar colgadas
-            self.gestor_memoria.liberar_memoria(forzar=True)
+        Si el registro se va a renderizar, su foto empieza a precargarse ya.
+        """
+        datos_pasaporte = self._reutilizar_salida(registro) if self.incremental else None
+        if datos_pasaporte is None:
+            datos_pasaporte = self.preparar_registro(registro)
+        if self.precarga_fotos is not None and datos_pasaporte and self._requiere_render(datos_pasaporte):
+            self.precarga_fotos.anunciar(datos_pasaporte.get('ruta_foto'))
+        return datos_pasaporte
+    
+    def _preparar_con_anticipacion(self, filas, anticipacion):
+        """(idx, registro, datos_pasaporte, error) preparando hasta `anticipacion` registros por delante
         
+        La preparación (y la reserva de foto) sigue el orden de las filas; solo se
+        adelanta para que la precarga lea las fotos de los próximos registros
+        mientras se renderiza el actual.
+        """
+        preparados = deque()
+        try:
+            for idx, registro in filas:
+                try:
+                    preparados.append((idx, registro, self._preparar_o_reutilizar(registro), None))
+                except Exception as e:
+                    preparados.append((idx, registro, None, e))
+                if len(preparados) > anticipacion:
+                    yield preparados.popleft()
+            while preparados:
+                yield preparados.popleft()
+        finally:
+            # Si quien consume sale antes (error, interrupción), los adelantados sueltan su foto
+            self._liberar_preparados(datos for _idx, _registro, datos, _error in preparados)
+    
+    def _liberar_preparados(self, datos_preparados):
+        """Quita la reserva de foto de registros preparados que no llegaron a renderizarse"""
+        for datos_pasaporte in datos_preparados:
+            if datos_pasaporte:
+                self.liberar_imagen(datos_pasaporte.get('imagen_usada'))
+    
+    @staticmethod
+    def _requiere_render(datos_pasaporte):
+        return datos_pasaporte.get('estado') != 'omitido' and datos_pasaporte.get('incremental') != 'sin_cambios'
+    
+    def _reutilizar_salida(self, registro):
+        """Datos de un registro cuyo PNG previo sirve (sin_cambios) o se rehace con sus datos (reconstruido)
+        
+        Devuelve None si el registro debe generarse de cero: sin correo (nombre de
+        archivo aleatorio), sin PNG con huella, columnas de entrada distintas o, para
+        reconstruir, si la foto usada ya no está o cambió.
+        """
+        correo = registro.get('CORREO', '')
+        if pd.isna(correo) or correo == '':
+            return None
+        nombre_archivo = self.generar_nombre_archivo_pasaporte(correo)
+        ruta_png = self.pasaportes_visuales_path / nombre_archivo
+        metadatos = leer_metadatos(ruta_png)
+        entrada = huella_entrada(registro)
+        if metadatos is None or metadatos.get('huella_entrada') != entrada:
+            return None
+        
+        datos_pasaporte = dict(metadatos['datos_pasaporte'])
+        datos_pasaporte.update({
+            'correo_original': correo,
+            'nombre_archivo': nombre_archivo,
+            'huella_entrada': entrada,
+        })
+        foto_sha256 = metadatos.get('foto_sha256', '')
+        if not foto_sha256:
+            return None  # PNG generado sin modo incremental: no se sabe de qué foto salió
+        if metadatos['huella'] == huella_render(datos_pasaporte, foto_sha256, self._obtener_huella_entorno()):
+            datos_pasaporte.update({
+                'ruta_foto': metadatos.get('ruta_foto') or None,
+                'imagen_usada': metadatos.get('ruta_foto') or None,
+                'pasaporte_visual': str(ruta_png),
+                'estado': 'generado',
+                'incremental': 'sin_cambios',
+            })
+            self.estadisticas_incremental['sin_cambios'] += 1
+            try:
+                self.estadisticas_incremental['segundos_ahorrados'] += float(metadatos.get('segundos_render', 0))
+            except ValueError:
+                pass
+            return datos_pasaporte
+        
+        foto = localizar_foto(metadatos.get('ruta_foto'), foto_sha256)
+        if foto is None:
+            return None
+        # Aún en la carpeta de origen (sin mover todavía): reservarla salvo que la tenga otro registro en curso
+        if foto.parent.name != 'usadas' and not self.libro_fotos.reservar_ruta(foto):
+            return None
+        datos_pasaporte.update({
+            'ruta_foto': str(foto),
+            'imagen_usada': str(foto),
+            'incremental': 'reconstruido',
+        })
+        self.estadisticas_incremental['reconstruidos'] += 1
         return datos_pasaporte
     
-    def generar_pasaportes_masivos(self, limite=None, archivo_csv=None):
-        """Genera pasaportes masivos de forma simple y estable"""
+    def _mostrar_estadisticas_incremental(self, generados_de_cero):
+        estadisticas = self.estadisticas_incremental
+        print(f"♻️ Incremental: {estadisticas['sin_cambios']} sin cambios (saltados), "
+              f"{estadisticas['reconstruidos']} reconstruidos, {generados_de_cero} generados de cero; "
+              f"≈{estadisticas['segundos_ahorrados']:.1f}s de render ahorrados")
+    
+    def generar_pasaportes_masivos(self, limite=None, archivo_csv=None, hilos=None, manifiesto=None, particiones=None):
+        """Genera pasaportes masivos de forma simple y estable
+        
+        Con hilos > 1 el render se reparte entre hilos (ver _procesar_lotes_paralelos).
+        Con `manifiesto` (generado por procesador_xlsx.py) procesa las `particiones`
+        indicadas, o todas si es None, leyendo cada una directamente del CSV único;
+        con procesos_fork > 1 se reparten entre procesos hijos (servidor fork).
+        """
         print(" GENERADOR MASIVO DE PASAPORTES VENEZOLANOS")
         print("=" * 50)
         
@@ -2355,112 +2529,579 @@ class GeneradorPasaportesMasivo:
         self._limpieza_previa()
         
         # Validar fuentes
-        if not self.validador_fuentes.verificar_fuentes():
-            print(" ERROR: Faltan fuentes requeridas")
-            self.validador_fuentes.mostrar_estado_fuentes()
+        if not self._verificar_fuentes_una_vez():
+            return False
+        
+        # Inicializar sistema de progreso simple
+        self.progreso = ProgresoSimple()
+        print(f" Semilla de síntesis: {self.semilla_sintesis}")
+        self.estadisticas_incremental = self._estadisticas_incremental_vacias()
+        self.capas_reutilizadas = {'foto': 0, 'texto': 0}
+        t_inicio = time.perf_counter()
+        
+        if manifiesto is not None:
+            resumen = self._procesar_manifiesto(manifiesto, particiones, limite, hilos)
+            if resumen is None:
+                return False
+        else:
+            # Cargar datos del CSV
+            df = self.cargar_datos_csv(archivo_csv)
+            if df is None:
+                return False
+            
+            self._iniciar_ejecucion()
+            resumen = self._procesar_dataframe(df, limite, hilos)
+            del df
+            
+            # Guardar resultados
+            self.guardar_datos_procesados()
+            self._cerrar_diario()
+            
+            # Eliminar CSV procesado para evitar confusión
+            self.eliminar_csv_procesado()
+        
+        self.cerrar_executor_render()
+        if self.precarga_fotos is not None:
+            self.precarga_fotos.cerrar()
+        self._cerrar_movedor_usadas()
+        
+        # Resumen final
+        print(f"\n PROCESAMIENTO COMPLETADO")
+        print(f" Total procesados: {resumen['procesados']}")
+        print(f" Pasaportes generados: {resumen['generados']}")
+        print(f"️ Registros omitidos: {resumen['omitidos']}")
+        self._mostrar_resumen_memoria()
+        self._mostrar_resumen_concurrencia()
+        self._mostrar_resumen_precarga()
+        self._mostrar_resumen_fotos()
+        if self.incremental:
+            estadisticas = self.estadisticas_incremental
+            self._mostrar_estadisticas_incremental(
+                resumen['generados'] - estadisticas['sin_cambios'] - estadisticas['reconstruidos'])
+            print(f"⏱️ Tiempo total: {time.perf_counter() - t_inicio:.1f}s")
+        if self.guardar_capas:
+            print(f" Capas reutilizadas: {self.capas_reutilizadas['foto']} de foto, "
+                  f"{self.capas_reutilizadas['texto']} de texto (en {self.capas_path})")
+        
+        return True
+    
+    def _verificar_fuentes_una_vez(self):
+        """Verifica las fuentes solo la primera vez en el proceso (no cambian entre archivos)"""
+        if not self._fuentes_verificadas:
+            if not self.validador_fuentes.verificar_fuentes():
+                print(" ERROR: Faltan fuentes requeridas")
+                self.validador_fuentes.mostrar_estado_fuentes()
+                return False
+            self._fuentes_verificadas = True
+        return True
+    
+    def _listar_csv_lote(self, entrada):
+        """CSV de un directorio o patrón glob, en orden (sin resultados ni backups)"""
+        import glob
+        
+        ruta = Path(entrada)
+        if ruta.is_dir():
+            candidatos = ruta.glob('*.csv')
+        else:
+            candidatos = (Path(p) for p in glob.glob(str(entrada)))
+        return sorted(
+            p for p in candidatos
+            if p.suffix.lower() == '.csv' and '_RESULT_' not in p.name and p.is_file()
+        )
+    
+    def procesar_lote_csv(self, entrada, limite=None, hilos=None):
+        """Procesa varios CSV (directorio o patrón glob) con este mismo generador ya inicializado
+        
+        Fuentes, script maestro (MediaPipe, rembg, fuentes precargadas), catálogo de
+        fotos y pool de hilos se preparan una sola vez; cada CSV guarda sus propios
+        resultados como en una ejecución individual. Al final se muestra un resumen
+        con el coste de arranque amortizado por archivo.
+        """
+        print(" GENERADOR MASIVO DE PASAPORTES - LOTE DE CSV")
+        print("=" * 50)
+        
+        archivos = self._listar_csv_lote(entrada)
+        if not archivos:
+            print(f" No se encontraron CSV en: {entrada}")
             return False
+        print(f" {len(archivos)} CSV a procesar")
         
-        # Cargar datos del CSV
-        df = self.cargar_datos_csv(archivo_csv)
-        if df is None:
+        # Calentamiento: todo lo que una ejecución por archivo repetiría
+        t0 = time.perf_counter()
+        self._limpieza_previa()
+        if not self._verificar_fuentes_una_vez():
+            return False
+        hilos = self._resolver_hilos(hilos)
+        self._colocar_trabajadores(hilos)
+        if self._cargar_script_maestro_lazy() is None:
             return False
+        self._sincronizar_fotos()
+        t_calentamiento = time.perf_counter() - t0
+        t_arranque = self.tiempo_inicializacion + t_calentamiento
+        print(f" Arranque: {t_arranque:.2f}s (inicialización {self.tiempo_inicializacion:.2f}s, "
+              f"calentamiento {t_calentamiento:.2f}s)")
+        print(f" Semilla de síntesis: {self.semilla_sintesis}")
         
-        # Inicializar sistema de progreso simple
         self.progreso = ProgresoSimple()
+        resumen_archivos = []
+        t_lote = time.perf_counter()
+        try:
+            for n, archivo in enumerate(archivos, 1):
+                print(f"\n [{n}/{len(archivos)}] {archivo.name}")
+                t_archivo = time.perf_counter()
+                self.estadisticas_incremental = self._estadisticas_incremental_vacias()
+                df = self.cargar_datos_csv(archivo)
+                if df is None:
+                    resumen_archivos.append({'archivo': archivo.name, 'estado': 'error', 'registros': 0,
+                                             'generados': 0, 'omitidos': 0, 'segundos': 0.0})
+                    continue
+                
+                self._iniciar_ejecucion()
+                resumen_archivo = self._procesar_dataframe(df, limite, hilos)
+                del df
+                self.guardar_datos_procesados()
+                self._cerrar_diario()
+                self.eliminar_csv_procesado()
+                
+                resumen_archivos.append({
+                    'archivo': archivo.name,
+                    'estado': 'procesado',
+                    'registros': resumen_archivo['procesados'],
+                    'generados': resumen_archivo['generados'],
+                    'omitidos': resumen_archivo['omitidos'],
+                    'segundos': round(time.perf_counter() - t_archivo, 3),
+                })
+                if self.incremental:
+                    resumen_archivos[-1].update({
+                        'sin_cambios': self.estadisticas_incremental['sin_cambios'],
+                        'reconstruidos': self.estadisticas_incremental['reconstruidos'],
+                        'segundos_ahorrados': round(self.estadisticas_incremental['segundos_ahorrados'], 3),
+                    })
+                    self._mostrar_estadisticas_incremental(
+                        resumen_archivo['generados'] - self.estadisticas_incremental['sin_cambios']
+                        - self.estadisticas_incremental['reconstruidos'])
+                self.politica_gc.tal_vez_recolectar()
+        finally:
+            self.cerrar_executor_render()
+            if self.precarga_fotos is not None:
+                self.precarga_fotos.cerrar()
+            self._cerrar_movedor_usadas()
+        
+        t_proceso = time.perf_counter() - t_lote
+        registros = sum(r['registros'] for r in resumen_archivos)
+        resumen = {
+            'entrada': str(entrada),
+            'archivos': resumen_archivos,
+            'total_archivos': len(archivos),
+            'total_registros': registros,
+            'generados': sum(r['generados'] for r in resumen_archivos),
+            'omitidos': sum(r['omitidos'] for r in resumen_archivos),
+            'segundos_arranque': round(t_arranque, 3),
+            'segundos_proceso': round(t_proceso, 3),
+            'arranque_por_archivo': round(t_arranque / len(archivos), 3),
+            # Lo que costaría lanzar un proceso por archivo, aproximado por este arranque
+            'arranque_evitado': round(t_arranque * (len(archivos) - 1), 3),
+            'semilla_sintesis': self.semilla_sintesis,
+            'memoria': self.gobernador.resumen(),
+            'gc': self.politica_gc.metricas(),
+            'concurrencia': self.controlador_concurrencia.resumen() if self.controlador_concurrencia else None,
+            'precarga': self.precarga_fotos.estadisticas() if self.precarga_fotos else None,
+        }
+        
+        print(f"\n RESUMEN DEL LOTE")
+        print("=" * 50)
+        for r in resumen_archivos:
+            print(f"   {r['archivo']}: {r['estado']}, {r['registros']} registros "
+                  f"({r['generados']} generados, {r['omitidos']} omitidos) en {r['segundos']:.1f}s")
+        print(f" Archivos: {len(archivos)} | Registros: {registros} | "
+              f"Generados: {resumen['generados']} | Omitidos: {resumen['omitidos']}")
+        print(f"⏱️ Arranque: {t_arranque:.2f}s una sola vez → {resumen['arranque_por_archivo']:.2f}s por archivo "
+              f"(≈{resumen['arranque_evitado']:.1f}s evitados frente a un proceso por archivo)")
+        print(f"⏱️ Proceso: {t_proceso:.1f}s"
+              + (f" ({registros / t_proceso:.1f} registros/s)" if t_proceso > 0 and registros else ""))
+        self._mostrar_resumen_memoria()
+        self._mostrar_resumen_concurrencia()
+        self._mostrar_resumen_precarga()
+        self._mostrar_resumen_fotos()
+        
+        try:
+            logs_path = self.base_path / 'OUTPUT' / 'logs'
+            logs_path.mkdir(parents=True, exist_ok=True)
+            resumen_path = logs_path / f"resumen_lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            with open(resumen_path, 'w', encoding='utf-8') as f:
+                json.dump(resumen, f, ensure_ascii=False, indent=2)
+            print(f" Resumen guardado en: {resumen_path}")
+        except Exception as e:
+            print(f"️ No se pudo guardar el resumen del lote: {e}")
+        
+        return all(r['estado'] == 'procesado' for r in resumen_archivos)
+    
+    def iniciar_almacen(self, sufijo=''):
+        """Crea la carpeta de resultados por segmentos de la ejecución (o partición) que empieza
+        
+        Siempre una carpeta nueva: el nombre lleva el CSV y microsegundos (en --lote
+        varios CSV comparten output_path y pueden empezar en el mismo segundo) y se
+        crea con exist_ok=False, reintentando con un contador si ya existe.
+        """
+        carpeta = self.output_path or (self.base_path / CARPETA_SALIDA)
+        carpeta.mkdir(parents=True, exist_ok=True)
+        nombre = Path(self.csv_path_used).stem if self.csv_path_used else 'sin_csv'
+        base = f'resultados_{nombre}_{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}{sufijo}'
+        directorio = carpeta / base
+        intento = 1
+        while True:
+            try:
+                directorio.mkdir()
+                break
+            except FileExistsError:
+                intento += 1
+                directorio = carpeta / f'{base}_{intento}'
+        self.almacen = AlmacenResultados(directorio)
+        return self.almacen
+    
+    def _iniciar_ejecucion(self, sufijo=''):
+        """Abre el diario del CSV en curso (o lo reanuda) y el almacén de resultados asociado
+        
+        Si hay un diario sin terminar del mismo CSV, se reutilizan su semilla (salvo
+        semilla explícita) y su almacén, y _procesar_dataframe salta los registros
+        ya completados.
+        """
+        csv_path = Path(self.csv_path_used) if self.csv_path_used else None
+        nombre = csv_path.stem if csv_path else 'sin_csv'
+        existe = csv_path is not None and csv_path.exists()
+        bytes_csv = csv_path.stat().st_size if existe else None
+        carpeta = self.output_path or (self.base_path / CARPETA_SALIDA)
+        self.diario = DiarioRegistros(carpeta / f"diario_{nombre}{sufijo}.jsonl")
+        
+        # El tamaño descarta rápido; la huella (mtime + extremos) detecta un CSV editado del mismo tamaño
+        huella = None
+        if existe and (not self.diario.reanudado or self.diario.cabecera.get('bytes_csv') == bytes_csv):
+            huella = huella_csv(csv_path)
+        if self.diario.reanudado and not self.diario.compatible(bytes_csv, huella):
+            print("️ Hay un diario de otro CSV (o del mismo CSV modificado) con el mismo nombre: "
+                  "se aparta y se empieza de cero")
+            self.diario.descartar()
+        
+        if self.diario.reanudado:
+            semilla = self.diario.cabecera.get('semilla')
+            if not self.semilla_explicita and semilla is not None:
+                self.semilla_sintesis = semilla
+            elif semilla != self.semilla_sintesis:
+                print(f"️ Semilla distinta a la del diario ({semilla}): los re-encolados tendrán otros valores")
+            self.almacen = AlmacenResultados(self.diario.cabecera['almacen'])
+            print(f" Reanudando desde {self.diario.ruta.name}: {len(self.diario.completados)} completados, "
+                  f"{len(self.diario.en_curso)} en curso se vuelven a encolar (semilla {self.semilla_sintesis})")
+        else:
+            self.iniciar_almacen(sufijo)
+            self.diario.iniciar(
+                semilla=self.semilla_sintesis,
+                almacen=str(self.almacen.directorio),
+                csv=str(csv_path) if csv_path else None,
+                bytes_csv=bytes_csv,
+                huella_csv=huella or (huella_csv(csv_path) if existe else None),
+            )
+        return self.diario
+    
+    def _cerrar_diario(self):
+        """Archiva el diario de una ejecución terminada (ya no hay nada que reanudar)"""
+        if self.diario is not None:
+            self.diario.cerrar(terminado=True)
+            self.diario = None
+    
+    def _diario_en_curso(self, clave, datos_pasaporte):
+        if self.diario is not None and clave is not None:
+            self.diario.marcar_en_curso(clave, datos_pasaporte.get('imagen_usada'))
+    
+    def _anexar_resultados(self, pares):
+        """Anexa un lote de (clave, datos_pasaporte) al almacén y después anota su estado final en el diario"""
+        self.almacen.anexar([datos for _clave, datos in pares], claves=[clave for clave, _datos in pares])
+        self.politica_gc.registrar_registros(len(pares))
+        if self.diario is not None:
+            self.diario.marcar_finalizados([(clave, datos) for clave, datos in pares if clave is not None])
+    
+    def _procesar_dataframe(self, df, limite=None, hilos=None):
+        """Prepara y renderiza los registros de `df` (hasta `limite`) anexándolos a self.almacen
+        
+        Con un diario reanudado se saltan los registros ya completados y los que
+        ya están en el almacén (corte entre anexar el segmento y anotarlo en el
+        diario); los que quedaron en curso vuelven a procesarse.
+        
+        Returns:
+            dict con procesados, generados y omitidos de este DataFrame
+        """
+        if self.almacen is None:
+            self.iniciar_almacen()
+        inicio = (self.almacen.total_registros, self.almacen.generados, self.almacen.omitidos)
+        
+        # Claves estables por registro, calculadas sobre el CSV completo
+        claves = claves_registro(df)
+        claves_texto = pd.Series(claves_hex(claves), index=df.index)
+        if self.diario is not None and (self.diario.completados or self.almacen.claves):
+            sin_diario = self.almacen.claves.difference(self.diario.completados)
+            if sin_diario:
+                print(f"️ {len(sin_diario)} registros ya estaban en el almacén sin estado final en el diario: "
+                      f"no se vuelven a procesar")
+            pendientes = ~(claves_texto.isin(self.diario.completados.keys())
+                           | claves_texto.isin(self.almacen.claves)).to_numpy()
+            print(f" Saltando {int((~pendientes).sum())} registros ya completados según el diario")
+            df, claves, claves_texto = df[pendientes], claves[pendientes], claves_texto[pendientes]
         
-        # Procesar registros
-        registros_procesados = []
         total_registros = len(df) if limite is None else min(limite, len(df))
         
         print(f" Procesando {total_registros} registros...")
         
-        for idx, registro in df.iterrows():
-            if limite and idx >= limite:
-                break
-            
-            try:
-                # Procesar registro de forma simple
-                datos_pasaporte = self._procesar_registro_simple(idx, registro)
-                if datos_pasaporte:
-                    registros_procesados.append(datos_pasaporte)
-                
-                # Mostrar progreso cada 10 registros
-                if (idx + 1) % 10 == 0:
-                    generados = sum(1 for r in registros_procesados if r.get('estado') == 'generado')
-                    omitidos = sum(1 for r in registros_procesados if r.get('estado') == 'omitido')
-                    print(f" Progreso: {idx + 1}/{total_registros} - Generados: {generados}, Omitidos: {omitidos}")
-                
-            except Exception as e:
-                print(f" Error en registro {idx + 1}: {e}")
-                continue
+        # Preparación y síntesis vectorizadas de todo el bloque (texto, fechas, edad, MRZ)
+        df = self.preparar_lote(df.iloc[:total_registros], claves=claves[:total_registros])
+        df['clave_registro'] = claves_texto.iloc[:total_registros]
         
-        # Guardar resultados
-        self.guardar_datos_procesados(registros_procesados)
+        hilos = self._resolver_hilos(hilos)
+        self._colocar_trabajadores(hilos)
+        if hilos > 1:
+            print(f" Render concurrente con {hilos} hilos")
+            cola_procesamiento = list(df.iterrows())
+            self._procesar_lotes_paralelos(cola_procesamiento, hilos)
+        else:
+            # Resultados pendientes de anexar: como mucho un lote en memoria
+            resultados_lote = []
+            anticipacion = self.precarga_fotos.capacidad // 2 if self.precarga_fotos is not None else 0
+            preparados = self._preparar_con_anticipacion(df.iterrows(), anticipacion)
+            try:
+                for posicion, (idx, registro, datos_pasaporte, error) in enumerate(preparados, 1):
+                    clave = registro['clave_registro']
+                    try:
+                        # Procesar registro de forma simple (mismos pasos que _procesar_registro_simple)
+                        if error is not None:
+                            raise error
+                        if datos_pasaporte:
+                            self._diario_en_curso(clave, datos_pasaporte)
+                            if self._requiere_render(datos_pasaporte):
+                                datos_pasaporte = self._renderizar_registro(datos_pasaporte)
+                            resultados_lote.append((clave, datos_pasaporte))
+                        if len(resultados_lote) >= self.tamano_lote:
+                            self._anexar_resultados(resultados_lote)
+                            self.gobernador.registrar_tareas(len(resultados_lote))
+                            resultados_lote = []
+                            self._controlar_memoria()
+                        
+                        # Mostrar progreso cada 10 registros
+                        if posicion % 10 == 0:
+                            generados = self.almacen.generados - inicio[1] + sum(
+                                1 for _c, r in resultados_lote if r.get('estado') == 'generado')
+                            omitidos = self.almacen.omitidos - inicio[2] + sum(
+                                1 for _c, r in resultados_lote if r.get('estado') == 'omitido')
+                            print(f" Progreso: {posicion}/{total_registros} - Generados: {generados}, Omitidos: {omitidos}")
+                        
+                    except Exception as e:
+                        print(f" Error en registro {idx + 1}: {e}")
+                        continue
+            finally:
+                preparados.close()
+            self._anexar_resultados(resultados_lote)
+            self.gobernador.registrar_tareas(len(resultados_lote))
         
-        # Eliminar CSV procesado para evitar confusión
-        self.eliminar_csv_procesado()
+        return {
+            'procesados': self.almacen.total_registros - inicio[0],
+            'generados': self.almacen.generados - inicio[1],
+            'omitidos': self.almacen.omitidos - inicio[2],
+        }
+    
+    def _procesar_manifiesto(self, ruta_manifiesto, particiones=None, limite=None, hilos=None):
+        """Procesa particiones de un manifiesto en este mismo proceso (fuentes, modelos y fotos ya cargados)
         
-        # Resumen final
-        generados = sum(1 for r in registros_procesados if r.get('estado') == 'generado')
-        omitidos = sum(1 for r in registros_procesados if r.get('estado') == 'omitido')
+        Cada partición se lee saltando a su offset en el CSV y guarda sus propios
+        resultados (sufijo _pNNN). El CSV compartido no se elimina.
+        """
+        try:
+            manifiesto = cargar_manifiesto(ruta_manifiesto)
+        except Exception as e:
+            print(f" Error al cargar manifiesto: {e}")
+            return None
         
-        print(f"\n PROCESAMIENTO COMPLETADO")
-        print(f" Total procesados: {len(registros_procesados)}")
-        print(f" Pasaportes generados: {generados}")
-        print(f"️ Registros omitidos: {omitidos}")
+        total_particiones = len(manifiesto['particiones'])
+        numeros = list(particiones) if particiones else list(range(1, total_particiones + 1))
+        fuera_de_rango = [n for n in numeros if not 1 <= n <= total_particiones]
+        if fuera_de_rango:
+            print(f" Particiones fuera de rango (1-{total_particiones}): {fuera_de_rango}")
+            return None
         
-        return True
+        self.csv_path_used = manifiesto['ruta_csv']
+        self._establecer_carpeta_salida(manifiesto['ruta_csv'])
+        print(f" Manifiesto: {Path(ruta_manifiesto).name} ({manifiesto['total_registros']} registros, "
+              f"{total_particiones} particiones)")
+        
+        procesos = min(self.procesos_fork, len(numeros))
+        if procesos > 1:
+            motivo = self._motivo_sin_fork(limite)
+            if motivo is None:
+                return self._procesar_manifiesto_fork(manifiesto, numeros, procesos)
+            print(f" Servidor fork desactivado ({motivo}): particiones en este proceso")
+        
+        resumen = {'procesados': 0, 'generados': 0, 'omitidos': 0}
+        restantes = limite
+        for numero in numeros:
+            if restantes is not None and restantes <= 0:
+                break
+            resumen_particion, filas = self._procesar_particion(manifiesto, numero, restantes, hilos)
+            for clave in resumen:
+                resumen[clave] += resumen_particion[clave]
+            if restantes is not None:
+                restantes -= filas
+        
+        return resumen
+    
+    def _procesar_particion(self, manifiesto, numero, limite=None, hilos=None):
+        """Procesa y guarda una partición (sufijo _pNNN); devuelve su resumen y sus filas"""
+        df = leer_particion(manifiesto, numero)
+        print(f"\n Partición {numero}/{len(manifiesto['particiones'])}: filas {df.index[0] + 1}-{df.index[-1] + 1}")
+        sufijo = f"_p{numero:03d}"
+        self._iniciar_ejecucion(sufijo)
+        resumen_particion = self._procesar_dataframe(df, limite, hilos)
+        procesadas = df if limite is None else df.iloc[:limite]
+        self.guardar_datos_procesados(df_entrada=procesadas, sufijo=sufijo)
+        self._cerrar_diario()
+        return resumen_particion, len(df)
+    
+    def _motivo_sin_fork(self, limite=None):
+        """Por qué no se puede usar el servidor fork (None = se puede)"""
+        if not fork_disponible():
+            return 'os.fork no disponible en este sistema'
+        if limite is not None:
+            return 'el límite de registros se reparte en orden entre particiones'
+        if self.script_maestro_cache is not None and self.script_maestro_cache.hilos_onnx != 1:
+            return 'la sesión de rembg ya se creó con varios hilos'
+        # Un hilo intra/inter-op: la sesión no tiene pool de hilos que el fork deje a medias
+        maestro = self._cargar_script_maestro_lazy(hilos_onnx=1)
+        if maestro is None:
+            return 'no se pudo cargar el script maestro'
+        if 'CUDAExecutionProvider' in maestro.rembg_providers:
+            return 'rembg usa CUDA, que no sobrevive al fork'
+        if maestro.hilos_onnx != 1:
+            return 'segmentacion.sesion_onnx fija varios hilos intra-op en config.json'
+        return None
     
-    def guardar_datos_procesados(self, registros_procesados):
-        """Guarda los datos procesados en archivos JSON y Excel"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    def _procesar_manifiesto_fork(self, manifiesto, numeros, procesos):
+        """Particiones repartidas entre procesos hijos que heredan el script maestro ya caliente
+        
+        El padre ya tiene el script maestro (ver _motivo_sin_fork), hace una
+        inferencia de calentamiento y cierra pool de render y detectores de
+        MediaPipe. Cada hijo procesa sus particiones en secuencia, fijado a su
+        bloque de núcleos; las fotos se reservan en el libro de fotos compartido
+        (cada hijo abre su propia conexión), así que ninguna le toca a dos hijos.
+        """
+        t0 = time.perf_counter()
+        plan = planificar(procesos, afinidad=self.afinidad_trabajadores)
+        self.script_maestro_cache.calentar()
+        self._sincronizar_fotos()
+        self.cerrar_executor_render()
+        if self.precarga_fotos is not None:
+            self.precarga_fotos.cerrar()
+        self._cerrar_movedor_usadas()
+        if cerrar_detectores is not None:
+            cerrar_detectores()
+        print(f" Servidor fork: calentamiento del padre {time.perf_counter() - t0:.2f}s; "
+              f"{procesos} procesos para {len(numeros)} particiones ({plan})")
+        
+        def procesar_particiones(_indice, particiones):
+            resumen = {'procesados': 0, 'generados': 0, 'omitidos': 0}
+            for numero in particiones:
+                resumen_particion, _filas = self._procesar_particion(manifiesto, numero, None, 1)
+                for clave in resumen:
+                    resumen[clave] += resumen_particion[clave]
+            self.cerrar_executor_render()
+            self._cerrar_movedor_usadas()
+            self.libro_fotos.cerrar()
+            return {'resumen': resumen, 'incremental': self.estadisticas_incremental,
+                    'capas': self.capas_reutilizadas,
+                    'precarga': self.precarga_fotos.estadisticas() if self.precarga_fotos else None}
+        
+        # Sin conexión SQLite abierta a través del fork: cada hijo abre la suya
+        self.libro_fotos.cerrar()
+        servidor = ServidorFork(plan, al_iniciar_hijo=lambda indice: self._iniciar_hijo_fork(plan, indice))
+        hijos = servidor.ejecutar([numeros[i::procesos] for i in range(procesos)], procesar_particiones)
+        
+        resumen = {'procesados': 0, 'generados': 0, 'omitidos': 0}
+        for hijo in hijos:
+            if 'error' in hijo:
+                print(f" Proceso {hijo['indice'] + 1} (pid {hijo['pid']}): {hijo['error']}")
+                continue
+            resultado = hijo['resultado']
+            for clave in resumen:
+                resumen[clave] += resultado['resumen'][clave]
+            for clave in self.estadisticas_incremental:
+                self.estadisticas_incremental[clave] += resultado['incremental'][clave]
+            for clave in self.capas_reutilizadas:
+                self.capas_reutilizadas[clave] += resultado['capas'][clave]
+            if self.precarga_fotos is not None and resultado['precarga']:
+                self.precarga_fotos.sumar(resultado['precarga'])
+        estado = servidor.resumen()
+        print(f" Servidor fork: arranque medio {estado['arranque_ms_medio']} ms por proceso; "
+              f"memoria de los hijos {estado['pss_total_mb']:.0f} MB PSS "
+              f"({estado['rss_total_mb']:.0f} MB RSS sumando páginas compartidas)")
+        if estado['errores']:
+            print(f" {estado['errores']} procesos terminaron con error; sus particiones quedan por procesar")
+        return resumen
+    
+    def _iniciar_hijo_fork(self, plan, indice):
+        """En el hijo recién creado: descarta el estado del padre que no debe compartirse"""
+        # Un solo hilo de render en el hijo, con OpenCV/BLAS limitados a su bloque de núcleos
+        self.plan_colocacion = planificar(1, cpus=plan.cpus_de(indice), afinidad=False)
+        self._aplicar_limites_nativos(self.plan_colocacion.hilos_por_trabajador)
+        # Bloques de números reservados por el padre: cada hijo reserva los suyos
+        self.asignador_pasaportes.olvidar_pendientes()
+        self.asignador_cedulas.olvidar_pendientes()
+        # psutil.Process() del padre: el gobernador mide al hijo
+        self.gobernador = GobernadorMemoria(PRESUPUESTO_RSS_MB, TAREAS_POR_TRABAJADOR)
+        # Métricas de GC propias del hijo; la política heredada quita su callback de gc
+        heredada = self.politica_gc
+        heredada.cerrar()
+        self.politica_gc = PoliticaGC(UMBRAL_BLOQUES_GC)
+        self.politica_gc.congelado = heredada.congelado
+        self.politica_gc.objetos_congelados = heredada.objetos_congelados
+        self.controlador_concurrencia = None
+    
+    def guardar_datos_procesados(self, registros_procesados=None, df_entrada=None, sufijo=''):
+        """Exporta los resultados de self.almacen a JSON, Excel y CSV RESULT (en streaming)
+        
+        `registros_procesados` (lista de dicts) se anexa antes a un almacén nuevo, para
+        quien aún acumula los registros en memoria. `df_entrada` son las filas de entrada
+        de estos resultados (por defecto el CSV completo, leído por bloques); `sufijo`
+        distingue los archivos de cada partición.
+        """
+        if registros_procesados is not None:
+            self.iniciar_almacen(sufijo)
+            self.almacen.anexar(registros_procesados)
+        if self.almacen is None:
+            self.iniciar_almacen(sufijo)
+        
+        print(f" Resultados por lotes en: {self.almacen.directorio} "
+              f"({len(self.almacen.segmentos())} segmentos, {self.almacen.total_registros} registros)")
+        if not EXPORTAR_RESULTADOS:
+            print(f"   Exportar con: python3 SCRIPTS/almacen_resultados.py {self.almacen.directorio} --json --xlsx")
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") + sufijo
         
         # Guardar como JSON
         json_path = self.output_path / f'pasaportes_procesados_{timestamp}.json'
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(registros_procesados, f, ensure_ascii=False, indent=2, default=str)
+        self.almacen.exportar_json(json_path)
         
         # Guardar como Excel
         excel_path = self.output_path / f'pasaportes_procesados_{timestamp}.xlsx'
-        df_procesados = pd.DataFrame(registros_procesados)
-        df_procesados.to_excel(excel_path, index=False)
+        try:
+            self.almacen.exportar_xlsx(excel_path)
+        except Exception as e:
+            print(f"️ No se pudo exportar Excel: {e}")
 
         # Si hay CSV de entrada, anexar resultados por registro (estado, imagen usada, salida)
         try:
-            if self.csv_path_used and Path(self.csv_path_used).exists():
-                df_in = pd.read_csv(self.csv_path_used, dtype=str, keep_default_na=False)
-                df_out = pd.DataFrame(registros_procesados)
-                # Asegurar columnas de resultado
-                if 'pasaporte_visual' not in df_out.columns:
-                    df_out['pasaporte_visual'] = ''
-                if 'estado' not in df_out.columns:
-                    df_out['estado'] = df_out['pasaporte_visual'].apply(lambda x: 'generado' if str(x) else 'omitido')
-                if 'motivo_no_generado' not in df_out.columns:
-                    df_out['motivo_no_generado'] = ''
-                # Selección de columnas útiles
-                cols_result = [
-                    'correo_original', 'numero_pasaporte', 'ruta_foto', 'imagen_usada',
-                    'pasaporte_visual', 'estado', 'motivo_no_generado'
-                ]
-                for c in cols_result:
-                    if c not in df_out.columns:
-                        df_out[c] = ''
-                # Concatenar lógicamente (mismo orden de procesamiento)
-                df_in_result = pd.concat([df_in.reset_index(drop=True), df_out[cols_result].reset_index(drop=True)], axis=1)
-                # Agregar fila meta al inicio con total de registros del CSV y timestamp
-                # Asegurar columnas meta
-                for meta_col in ['meta_total_registros', 'meta_timestamp']:
-                    if meta_col not in df_in_result.columns:
-                        df_in_result[meta_col] = ''
-                # Construir fila meta vacía con columnas del resultado
-                meta_row = {c: '' for c in df_in_result.columns}
-                meta_row['meta_total_registros'] = str(len(df_in_result))
-                meta_row['meta_timestamp'] = timestamp
-                df_meta = pd.DataFrame([meta_row])
-                final_df = pd.concat([df_meta, df_in_result], ignore_index=True)
+            if df_entrada is not None or (self.csv_path_used and Path(self.csv_path_used).exists()):
                 # Escribir un CSV resultado en carpeta separada para evitar confusión
                 csv_result = self.output_path / f"{Path(self.csv_path_used).stem}_RESULT_{timestamp}.csv"
-                final_df.to_csv(csv_result, index=False, encoding='utf-8')
+                self.almacen.exportar_resultado_csv(
+                    csv_result, timestamp,
+                    csv_entrada=None if df_entrada is not None else self.csv_path_used,
+                    df_entrada=df_entrada,
+                )
                 print(f" Resultados por registro guardados en: {csv_result.name}")
         except Exception as e:
             print(f"️ No se pudo anexar resultados al CSV: {e}")
@@ -2574,6 +3215,16 @@ class GeneradorPasaportesMasivo:
         else:
             verificaciones.append(("️ GPU", "No detectada, usando CPU"))
         
+        # 8. Verificar render por capas (ningún texto sobre el contenedor de la foto)
+        try:
+            solapados = comprobar_proyecto(self.base_path)
+        except Exception as e:
+            solapados = [f"no se pudo comprobar: {e}"]
+        if solapados:
+            verificaciones.append(("️ Render por capas", f"Desactivado: campos sobre la foto ({', '.join(solapados)})"))
+        else:
+            verificaciones.append((" Render por capas", "Disponible (ningún texto invade la foto)"))
+        
         # Mostrar resultados
         for estado, descripcion in verificaciones:
             print(f"   {estado}: {descripcion}")
@@ -2649,11 +3300,41 @@ def main():
     parser.add_argument('--verificar-produccion', action='store_true', help='Verificar preparación para producción')
     parser.add_argument('--mostrar-archivos', action='store_true', help='Mostrar qué archivos se generarán')
     parser.add_argument('--sin-gui', action='store_true', help='Ejecutar sin interfaz gráfica')
+    parser.add_argument('--hilos', type=int, default=HILOS_RENDER, help='Hilos de render concurrentes (1 = secuencial, 0 = según el host)')
+    parser.add_argument('--semilla', type=int, default=None, help='Semilla de los campos sintéticos (reproducible)')
+    parser.add_argument('--archivo-csv', default=ARCHIVO_CSV, help='CSV a procesar (sustituye a ARCHIVO_CSV)')
+    parser.add_argument('--manifiesto', help='Manifiesto de particiones generado por procesador_xlsx.py')
+    parser.add_argument('--lote', help='Directorio o patrón glob de CSV a procesar en un solo proceso')
+    parser.add_argument('--incremental', action='store_true', default=MODO_INCREMENTAL,
+                        help='Saltar registros cuyo PNG ya tiene la misma huella y re-renderizar solo los que cambiaron')
+    parser.add_argument('--capas', action='store_true', default=GUARDAR_CAPAS,
+                        help='Guardar y reutilizar por registro las capas de foto y de texto')
+    parser.add_argument('--procesos', type=int, default=PROCESOS_FORK,
+                        help='Procesos para las particiones del manifiesto (>1 = servidor fork con modelos compartidos)')
+    parser.add_argument('--precarga', type=int, default=PRECARGA_FOTOS,
+                        help='Fotos leídas por adelantado en segundo plano (0 = leer cada foto al renderizar)')
+    parser.add_argument('--sin-mover-usadas', action='store_true', default=not MOVER_USADAS,
+                        help='Dejar las fotos usadas en su carpeta (solo se marcan en el libro de fotos)')
+    parser.add_argument('--sin-afinidad', action='store_true', default=not AFINIDAD_TRABAJADORES,
+                        help='No fijar los hilos de render a núcleos (solo repartir los hilos nativos)')
+    parser.add_argument('--particion', type=int, action='append',
+                        help='Partición del manifiesto a procesar (repetible; por defecto todas)')
     
     args = parser.parse_args()
     
     # Inicializar generador
     generador = GeneradorPasaportesMasivo(args.base_path)
+    if args.semilla is not None:
+        generador.semilla_sintesis = args.semilla
+        generador.semilla_explicita = True
+    generador.incremental = args.incremental
+    generador.guardar_capas = args.capas
+    generador.afinidad_trabajadores = not args.sin_afinidad
+    generador.procesos_fork = max(1, args.procesos)
+    if args.sin_mover_usadas:
+        generador.movedor_usadas = None
+    if args.precarga != PRECARGA_FOTOS:
+        generador.precarga_fotos = PrecargaFotos(args.precarga, HILOS_PRECARGA) if args.precarga > 0 else None
     
     if args.listar_campos:
         generador.crear_lista_campos_requeridos()
@@ -2667,17 +3348,30 @@ def main():
         generador.mostrar_archivos_generados()
         return
     
+    if args.lote:
+        exito = generador.procesar_lote_csv(args.lote, LIMITE_REGISTROS, hilos=args.hilos)
+        sys.exit(0 if exito else 1)
+    
     # Mostrar configuración actual
     print("️ CONFIGURACIÓN ACTUAL:")
-    print(f"   • Archivo CSV: {ARCHIVO_CSV if ARCHIVO_CSV else 'Selección automática'}")
+    if args.manifiesto:
+        print(f"   • Manifiesto: {args.manifiesto}")
+        print(f"   • Particiones: {', '.join(map(str, args.particion)) if args.particion else 'Todas'}")
+    else:
+        print(f"   • Archivo CSV: {args.archivo_csv if args.archivo_csv else 'Selección automática'}")
     print(f"   • Límite registros: {LIMITE_REGISTROS if LIMITE_REGISTROS else 'Todos'}")
+    print(f"   • Modo incremental: {'Sí' if args.incremental else 'No'}")
+    print(f"   • Capas reutilizables: {'Sí' if args.capas else 'No'}")
     print()
     
     # Mostrar mensaje de bienvenida mínimo
     print(" GENERADOR MASIVO DE PASAPORTES VENEZOLANOS")
     
     # Generar pasaportes masivos usando configuración global
-    exito = generador.generar_pasaportes_masivos(LIMITE_REGISTROS, ARCHIVO_CSV)
+    exito = generador.generar_pasaportes_masivos(
+        LIMITE_REGISTROS, args.archivo_csv, hilos=args.hilos,
+        manifiesto=args.manifiesto, particiones=args.particion
+    )
     
     if exito:
         print("\n ¡Generación masiva de pasaportes completada exitosamente!")
@@ -332,12 +332,7 @@ class GeneradorSimple:
             if not ruta_foto or not numero_pasaporte:
                 return None
             
-            self.script_maestro_cache.datos_pasaporte = datos_pasaporte
-            
-            resultado = self.script_maestro_cache.generar_gafete_integrado(
-                ruta_foto=ruta_foto,
-                numero_pasaporte=numero_pasaporte
-            )
+            resultado = self.script_maestro_cache.render(datos_pasaporte, ruta_foto=ruta_foto)
             
             if resultado:
                 ruta_destino = self.pasaportes_visuales_path / nombre_archivo
@@ -5,9 +5,7 @@ Versión optimizada para sistemas con poca RAM o problemas de estabilidad
 """
 
 import sys
-import os
 import gc
-import time
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
@@ -34,17 +32,17 @@ class GeneradorUltraLigero:
         self.base_path = Path(base_path) if base_path else Path(__file__).parent
         self.limite_memoria = 80  # Límite de memoria más estricto
         self.tamano_lote = 5      # Lotes muy pequeños
-        self.pausa_entre_lotes = 2  # Pausa entre lotes
+        self.presupuesto_rss_mb = 2048   # RSS máximo del proceso antes de reciclar detectores
+        self.tareas_por_trabajador = 100  # Registros entre reciclados
         
-        # Configurar variables de entorno para optimización
-        os.environ['OMP_NUM_THREADS'] = '2'
-        os.environ['MKL_NUM_THREADS'] = '2'
-        os.environ['OPENBLAS_NUM_THREADS'] = '2'
+        # Sin límite de hilos de BLAS/OpenMP: renderiza registro a registro sin plan de colocación;
+        # colocacion_hilos.LimitesNativos solo se aplica con varios trabajadores
+        # (GeneradorPasaportesMasivo._aplicar_limites_nativos)
         
         print(f" Configuración ultra ligera:")
         print(f"   - Límite memoria: {self.limite_memoria}%")
         print(f"   - Tamaño lote: {self.tamano_lote}")
-        print(f"   - Pausa entre lotes: {self.pausa_entre_lotes}s")
+        print(f"   - Presupuesto RSS: {self.presupuesto_rss_mb} MB (reciclado cada {self.tareas_por_trabajador} registros)")
         
         # Inicializar generador principal con configuración ultra ligera
         self.generador = None
@@ -63,6 +61,10 @@ class GeneradorUltraLigero:
                 self.generador.gestor_memoria.liberar_cada = 1  # Liberar cada registro
                 self.generador.gestor_memoria.umbral_memoria = self.limite_memoria
             
+            # Presupuesto de RSS más estricto: el gobernador recicla en lugar de pausar
+            self.generador.gobernador.presupuesto_rss_mb = self.presupuesto_rss_mb
+            self.generador.gobernador.tareas_por_trabajador = self.tareas_por_trabajador
+            
             # Reducir tamaño de lote
             if hasattr(self.generador, 'tamano_lote'):
                 self.generador.tamano_lote = self.tamano_lote
@@ -98,19 +100,12 @@ class GeneradorUltraLigero:
     def limpiar_memoria_agresiva(self):
         """Limpieza agresiva de memoria"""
         try:
-            # Garbage collection múltiple
-            for _ in range(3):
+            # Una recolección completa (medida por la política de GC) y caché GPU
+            if self.generador is not None:
+                self.generador.politica_gc.recolectar()
+            else:
                 gc.collect()
             
-            # Limpiar cache GPU si está disponible
-            try:
-                import torch
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-                    torch.cuda.synchronize()
-            except:
-                pass
-            
             # Limpiar buffers del generador si existen
             if self.generador and hasattr(self.generador, '_limpiar_buffers_temporales'):
                 self.generador._limpiar_buffers_temporales()
@@ -133,7 +128,6 @@ class GeneradorUltraLigero:
             if memoria_inicial > self.limite_memoria:
                 print(f"️ Memoria alta ({memoria_inicial:.1f}%), limpiando...")
                 self.limpiar_memoria_agresiva()
-                time.sleep(2)
             
             # Cargar datos
             if archivo_csv:
@@ -148,8 +142,11 @@ class GeneradorUltraLigero:
             total_registros = len(df) if limite is None else min(limite, len(df))
             print(f" Total registros a procesar: {total_registros}")
             
-            # Procesar en lotes ultra pequeños
-            registros_procesados = []
+            # Preparación vectorizada de todo el bloque (texto, fechas, edad)
+            df = self.generador.preparar_lote(df.iloc[:total_registros])
+            
+            # Procesar en lotes ultra pequeños; cada lote se anexa al almacén de resultados
+            almacen = self.generador.iniciar_almacen()
             lote_actual = 0
             
             for inicio in range(0, total_registros, self.tamano_lote):
@@ -158,12 +155,8 @@ class GeneradorUltraLigero:
                 
                 print(f"\n Procesando lote {lote_actual}: registros {inicio+1}-{fin}")
                 
-                # Verificar memoria antes del lote
-                memoria_antes = self.verificar_memoria()
-                if memoria_antes > self.limite_memoria:
-                    print(f"️ Memoria alta ({memoria_antes:.1f}%), limpiando...")
-                    self.limpiar_memoria_agresiva()
-                    time.sleep(3)
+                # RSS del proceso antes del lote: el gobernador recicla los detectores si hace falta
+                self.generador._controlar_memoria()
                 
                 # Procesar lote
                 lote_registros = []
@@ -174,50 +167,34 @@ class GeneradorUltraLigero:
                         
                         if datos_pasaporte:
                             lote_registros.append(datos_pasaporte)
-                        
-                        # Limpiar memoria cada registro si es necesario
-                        if idx % 2 == 0:  # Cada 2 registros
-                            memoria_actual = self.verificar_memoria()
-                            if memoria_actual > self.limite_memoria:
-                                self.limpiar_memoria_agresiva()
                     
                     except Exception as e:
                         print(f" Error en registro {idx + 1}: {e}")
                         continue
                 
                 # Agregar lote a resultados
-                registros_procesados.extend(lote_registros)
+                almacen.anexar(lote_registros)
+                self.generador.gobernador.registrar_tareas(len(lote_registros))
+                self.generador.politica_gc.registrar_registros(len(lote_registros))
                 
                 # Mostrar progreso
-                generados = sum(1 for r in registros_procesados if r.get('estado') == 'generado')
-                omitidos = sum(1 for r in registros_procesados if r.get('estado') == 'omitido')
-                print(f" Progreso: {fin}/{total_registros} - Generados: {generados}, Omitidos: {omitidos}")
-                
-                # Limpiar memoria después del lote
-                self.limpiar_memoria_agresiva()
-                
-                # Pausa entre lotes
-                if fin < total_registros:
-                    print(f"⏸️ Pausa de {self.pausa_entre_lotes}s entre lotes...")
-                    time.sleep(self.pausa_entre_lotes)
+                print(f" Progreso: {fin}/{total_registros} - Generados: {almacen.generados}, Omitidos: {almacen.omitidos}")
             
             # Guardar resultados
             print("\n Guardando resultados...")
-            self.generador.guardar_datos_procesados(registros_procesados)
+            self.generador.guardar_datos_procesados()
             
             # Resumen final
-            generados = sum(1 for r in registros_procesados if r.get('estado') == 'generado')
-            omitidos = sum(1 for r in registros_procesados if r.get('estado') == 'omitido')
-            
             print(f"\n PROCESAMIENTO ULTRA LIGERO COMPLETADO")
-            print(f" Total procesados: {len(registros_procesados)}")
-            print(f" Pasaportes generados: {generados}")
-            print(f"️ Registros omitidos: {omitidos}")
+            print(f" Total procesados: {almacen.total_registros}")
+            print(f" Pasaportes generados: {almacen.generados}")
+            print(f"️ Registros omitidos: {almacen.omitidos}")
             
             # Verificar memoria final
             memoria_final = self.verificar_memoria()
             print(f" Memoria final: {memoria_final:.1f}%")
             print(f" Diferencia memoria: {memoria_final - memoria_inicial:+.1f}%")
+            self.generador._mostrar_resumen_memoria()
             
             return True
             
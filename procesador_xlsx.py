@@ -7,6 +7,7 @@ Extrae y convierte datos de Excel a CSV optimizado para generación de pasaporte
 import os
 import sys
 import pandas as pd
+import numpy as np
 import gc
 from datetime import datetime
 from pathlib import Path
@@ -14,8 +15,14 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import argparse
 import re
+import io
 import json
 
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
 # =============================================================================
 # CONFIGURACIÓN GLOBAL - MODIFICAR AQUÍ LOS VALORES DESEADOS
 # =============================================================================
@@ -25,9 +32,25 @@ import json
 REGISTROS_POR_ARCHIVO = 50
 
 # Activar modo división automáticamente (True/False)
-# True = Divide en múltiples archivos, False = Un solo archivo
+# True = Divide en particiones, False = Un solo archivo
 MODO_DIVISION = True
 
+# Cómo se divide (solo con MODO_DIVISION = True)
+# True = Un solo CSV normalizado + manifiesto JSON de particiones virtuales
+# False = Un CSV físico por cada REGISTROS_POR_ARCHIVO registros (método anterior)
+MODO_MANIFIESTO = True
+VERSION_MANIFIESTO = 1
+
+# Patrones de fecha reconocidos, en orden de prioridad (se busca en toda la cadena)
+PATRON_FECHA_ISO = r"(?P<anio>\d{4})-(?P<mes>\d{1,2})-(?P<dia>\d{1,2})"    # YYYY-MM-DD
+PATRON_FECHA_US = r"(?P<mes>\d{1,2})/(?P<dia>\d{1,2})/(?P<anio>\d{4})"    # MM/DD/YYYY
+
+CATEGORIAS_FECHA = ('yyyy_mm_dd', 'mm_dd_yyyy', 'vacias', 'no_reconocidas')
+MAX_CACHE_FECHAS = 200000  # Valores distintos recordados entre bloques
+
+# Filas leídas del Excel por bloque (memoria acotada en libros de cientos de miles de filas)
+TAMANO_BLOQUE_LECTURA = 5000
+
 # =============================================================================
 # EJEMPLOS DE CONFIGURACIÓN:
 # =============================================================================
@@ -37,6 +60,124 @@ MODO_DIVISION = True
 # Para archivos muy grandes (200 registros): REGISTROS_POR_ARCHIVO = 200
 # =============================================================================
 
+def _celda_a_texto(valor):
+    """Convierte una celda igual que pd.read_excel(dtype=str, keep_default_na=False)"""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _encabezados_unicos(fila):
+    """Nombres de columna como los de pandas: 'Unnamed: i' si faltan y sufijo .N si se repiten"""
+    encabezados = []
+    vistos = {}
+    for i, valor in enumerate(fila):
+        nombre = f"Unnamed: {i}" if valor is None or str(valor) == '' else _celda_a_texto(valor)
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        encabezados.append(nombre)
+    return encabezados
+
+
+def iterar_xlsx_por_bloques(ruta, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    """Lee la primera hoja de un Excel por bloques de `tamano_bloque` filas.
+
+    Con openpyxl en modo read_only recorre las filas en streaming, sin cargar el
+    libro completo. Cada bloque es un DataFrame de texto (mismo resultado que
+    pd.read_excel(dtype=str, keep_default_na=False)) con índice continuo entre
+    bloques; las filas vacías del final se omiten. Siempre produce al menos un
+    bloque (vacío, con las columnas) para poder validar el encabezado.
+    """
+    ruta = Path(ruta)
+    if load_workbook is None or ruta.suffix.lower() not in ('.xlsx', '.xlsm'):
+        # .xls u openpyxl no disponible: lectura completa y división en memoria
+        df = pd.read_excel(ruta, dtype=str, keep_default_na=False)
+        if df.empty:
+            yield df
+        for inicio in range(0, len(df), tamano_bloque):
+            yield df.iloc[inicio:inicio + tamano_bloque]
+        return
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        primera = list(next(filas, ()))
+        while primera and primera[-1] is None:  # celdas vacías al final del encabezado
+            primera.pop()
+        encabezados = _encabezados_unicos(primera)
+        ancho = len(encabezados)
+        bloque = []
+        inicio = 0
+        vacias = 0  # filas vacías pendientes: se conservan solo si les sigue una fila con datos
+        for fila in filas:
+            if all(valor is None for valor in fila):
+                vacias += 1
+                continue
+            valores = [_celda_a_texto(valor) for valor in fila[:ancho]]
+            valores.extend([''] * (ancho - len(valores)))
+            nuevas = [[''] * ancho for _ in range(vacias)] + [valores]
+            vacias = 0
+            for valores in nuevas:
+                bloque.append(valores)
+                if len(bloque) >= tamano_bloque:
+                    yield pd.DataFrame(bloque, columns=encabezados, index=range(inicio, inicio + len(bloque)), dtype=str)
+                    inicio += len(bloque)
+                    bloque = []
+        if bloque or inicio == 0:
+            yield pd.DataFrame(bloque, columns=encabezados, index=range(inicio, inicio + len(bloque)), dtype=str)
+    finally:
+        libro.close()
+
+
+def leer_xlsx(ruta, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    """Lee el Excel completo con el lector por bloques (para quien necesita todo el DataFrame)"""
+    return pd.concat(list(iterar_xlsx_por_bloques(ruta, tamano_bloque)))
+
+
+def cargar_manifiesto(ruta):
+    """Lee un manifiesto de particiones y comprueba que su CSV no haya cambiado.
+
+    Añade 'ruta_csv' (Path absoluto) al diccionario devuelto.
+    """
+    ruta = Path(ruta)
+    with open(ruta, 'r', encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    if manifiesto.get('version') != VERSION_MANIFIESTO:
+        raise ValueError(f"Versión de manifiesto no soportada: {manifiesto.get('version')}")
+    ruta_csv = ruta.parent / manifiesto['archivo_csv']
+    if not ruta_csv.exists():
+        raise FileNotFoundError(f"CSV del manifiesto no encontrado: {ruta_csv}")
+    if ruta_csv.stat().st_size != manifiesto['bytes_csv']:
+        raise ValueError(f"{ruta_csv.name} cambió después de crear el manifiesto; volver a procesar el Excel")
+    manifiesto['ruta_csv'] = ruta_csv
+    return manifiesto
+
+
+def leer_particion(manifiesto, numero):
+    """Lee solo las filas de la partición `numero` (1..N) saltando a su offset en el CSV.
+
+    El DataFrame conserva como índice el número de fila global del CSV.
+    """
+    particiones = manifiesto['particiones']
+    if not 1 <= numero <= len(particiones):
+        raise ValueError(f"Partición {numero} fuera de rango (1-{len(particiones)})")
+    particion = particiones[numero - 1]
+    with open(manifiesto['ruta_csv'], 'rb') as f:
+        f.seek(particion['offset'])
+        datos = f.read(particion['bytes'])
+    df = pd.read_csv(
+        io.BytesIO(datos), header=None, names=manifiesto['columnas'],
+        dtype=str, keep_default_na=False, encoding='utf-8'
+    )
+    df.index = range(particion['fila_inicio'], particion['fila_fin'])
+    return df
+
+
 class ProcesadorXLSX:
     def __init__(self, base_path=None):
         """Inicializa el procesador de archivos Excel"""
@@ -47,6 +188,10 @@ class ProcesadorXLSX:
         self.logs_path = self.base_path / 'OUTPUT' / 'logs'
         self.ultima_ubicacion_file = self.logs_path / 'ultima_ubicacion_excel.json'
         
+        # Coincidencias por patrón de fecha y columna (ver _normalizar_fechas_en_df)
+        self.contadores_fechas = {}
+        self._cache_fechas = ({}, {})  # valor original → (texto normalizado, categoría)
+        
         # Crear directorios necesarios
         self._crear_directorios()
     
@@ -99,21 +244,89 @@ class ProcesadorXLSX:
         return archivo_path
     
     def _normalizar_fechas_en_df(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Elimina HH:MM:SS dejando YYYY-MM-DD en columnas de fecha"""
+        """Elimina HH:MM:SS dejando YYYY-MM-DD en columnas de fecha
+        
+        Versión vectorizada de _parse_fecha_a_yyyy_mm_dd: limpieza con operaciones
+        de cadena y Series.str.extract por patrón (YYYY-MM-DD primero y MM/DD/YYYY
+        sobre lo que quede). Los valores no reconocidos se devuelven limpios y sin
+        cambios. Acumula en self.contadores_fechas cuántas celdas casó cada patrón.
+        """
         try:
             # Columnas candidatas: contienen 'FECHA' en el nombre
             cols_fecha = [c for c in df.columns if 'FECHA' in c.upper()]
             for c in cols_fecha:
                 if c in df:
-                    # Convertir a string, limpiar espacios y normalizar a YYYY-MM-DD
-                    df[c] = (
-                        df[c]
-                        .astype(str)
-                        .apply(self._parse_fecha_a_yyyy_mm_dd)
-                    )
+                    df[c] = self._normalizar_serie_fechas(df[c], c)
             return df
         except Exception:
             return df
+    
+    def _normalizar_serie_fechas(self, serie: pd.Series, columna: str) -> pd.Series:
+        """Normaliza una columna completa a YYYY-MM-DD y actualiza los contadores
+        
+        Las fechas se repiten mucho (miles de valores distintos en cientos de miles
+        de filas): solo se normalizan los valores distintos que no estén ya en la
+        cache (compartida entre bloques) y el resultado se expande por código.
+        """
+        codigos, unicos = pd.factorize(serie.astype(str), sort=False)
+        unicos = np.asarray(unicos, dtype=object).tolist()
+        
+        valores_cache, categorias_cache = self._cache_fechas
+        nuevos = [v for v in unicos if v not in valores_cache]
+        if nuevos:
+            if len(valores_cache) + len(nuevos) > MAX_CACHE_FECHAS:
+                valores_cache.clear()
+                categorias_cache.clear()
+            normalizados, categorias = self._normalizar_valores_fecha(pd.Series(nuevos, dtype=object))
+            valores_cache.update(zip(nuevos, normalizados))
+            categorias_cache.update(zip(nuevos, categorias))
+        
+        normalizados = np.array(list(map(valores_cache.__getitem__, unicos)), dtype=object)
+        categoria = np.fromiter(map(categorias_cache.__getitem__, unicos), dtype=np.int64, count=len(unicos))
+        
+        # Contadores por celda (no por valor distinto)
+        por_categoria = np.bincount(categoria[codigos], minlength=len(CATEGORIAS_FECHA))
+        contadores = self.contadores_fechas.setdefault(columna, dict.fromkeys(CATEGORIAS_FECHA, 0))
+        for clave, cantidad in zip(CATEGORIAS_FECHA, por_categoria):
+            contadores[clave] += int(cantidad)
+        
+        return pd.Series(normalizados[codigos], index=serie.index, dtype=object)
+    
+    def _normalizar_valores_fecha(self, valores: pd.Series):
+        """Normaliza valores distintos; devuelve (textos, índice en CATEGORIAS_FECHA)"""
+        texto = valores.reset_index(drop=True).str.strip()
+        categoria = np.full(len(texto), CATEGORIAS_FECHA.index('no_reconocidas'), dtype=np.int64)
+        vacias = texto.isin(['', 'nan'])
+        categoria[vacias.to_numpy()] = CATEGORIAS_FECHA.index('vacias')
+        texto = (
+            texto.str.replace(r"[\t\r\n]+", " ", regex=True)
+            .str.replace("\u200b", "", regex=False)
+            .str.strip()
+        )
+        resultado = texto.where(~vacias, '')
+        pendientes = ~vacias
+        
+        # Cada patrón solo se busca en lo que el anterior no reconoció (misma prioridad que
+        # _parse_fecha_a_yyyy_mm_dd); lo no reconocido queda limpio y sin cambios
+        for clave, patron in (('yyyy_mm_dd', PATRON_FECHA_ISO), ('mm_dd_yyyy', PATRON_FECHA_US)):
+            if not pendientes.any():
+                break
+            partes = texto[pendientes].str.extract(patron)
+            partes = partes[partes['anio'].notna()]
+            if len(partes):
+                resultado.loc[partes.index] = (
+                    partes['anio'] + '-' + partes['mes'].str.zfill(2) + '-' + partes['dia'].str.zfill(2)
+                )
+                pendientes.loc[partes.index] = False
+                categoria[partes.index.to_numpy()] = CATEGORIAS_FECHA.index(clave)
+        
+        return resultado.tolist(), categoria.tolist()
+    
+    def _mostrar_contadores_fechas(self):
+        """Resumen de formatos de fecha encontrados (indica cuán sucio viene el archivo)"""
+        for columna, contadores in self.contadores_fechas.items():
+            print(f"    {columna}: YYYY-MM-DD {contadores['yyyy_mm_dd']}, MM/DD/YYYY {contadores['mm_dd_yyyy']}, "
+                  f"vacías {contadores['vacias']}, no reconocidas {contadores['no_reconocidas']}")
 
     def _parse_fecha_a_yyyy_mm_dd(self, valor: str) -> str:
         """Normaliza una fecha a formato YYYY-MM-DD si detecta patrones comunes.
@@ -224,43 +437,29 @@ class ProcesadorXLSX:
             return None
         
         try:
-            print(f" Cargando archivo Excel: {archivo_path.name}")
-            
-            # Cargar Excel con dtype=str para evitar cambios de formato
-            df = pd.read_excel(archivo_path, dtype=str, keep_default_na=False)
-            print(f" Datos cargados: {len(df)} registros")
-            
-            # Validar columnas requeridas
-            if not self._validar_columnas_requeridas(df):
-                print("\n SOLUCIÓN:")
-                print("   1. Verificar que el archivo Excel tenga las columnas requeridas")
-                print("   2. Usar nombres de columnas exactos: GENERO, PRIMER_NOMBRE, etc.")
-                return None
-            
-            # Limpiar datos
-            print(" Limpiando y normalizando datos...")
-            df = self._limpiar_datos(df)
-            
-            # Calcular número de archivos necesarios
-            total_registros = len(df)
-            num_archivos = (total_registros + registros_por_archivo - 1) // registros_por_archivo
-            
-            print(f" División calculada:")
-            print(f"   • Total registros: {total_registros}")
-            print(f"   • Registros por archivo: {registros_por_archivo}")
-            print(f"   • Número de archivos: {num_archivos}")
+            print(f" Leyendo archivo Excel por bloques: {archivo_path.name}")
+            self.contadores_fechas = {}
             
             # Generar timestamp para todos los archivos
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             archivos_generados = []
+            total_registros = 0
             
-            # Dividir y guardar archivos
-            for i in range(num_archivos):
-                inicio = i * registros_por_archivo
-                fin = min(inicio + registros_por_archivo, total_registros)
+            # Cada bloque de lectura tiene exactamente un archivo de salida: se limpia
+            # y se guarda en cuanto se lee, sin esperar al resto del libro
+            for i, df_lote in enumerate(iterar_xlsx_por_bloques(archivo_path, registros_por_archivo)):
+                # Validar columnas requeridas (el encabezado es el mismo en todos los bloques)
+                if i == 0 and not self._validar_columnas_requeridas(df_lote):
+                    print("\n SOLUCIÓN:")
+                    print("   1. Verificar que el archivo Excel tenga las columnas requeridas")
+                    print("   2. Usar nombres de columnas exactos: GENERO, PRIMER_NOMBRE, etc.")
+                    return None
+                if df_lote.empty:
+                    continue
                 
-                # Extraer lote de datos
-                df_lote = df.iloc[inicio:fin].copy()
+                # Limpiar datos del lote
+                df_lote = self._limpiar_datos(df_lote)
+                total_registros += len(df_lote)
                 
                 # Generar nombre de archivo con numeración
                 numero_archivo = f"{i+1:03d}"  # 001, 002, 003, etc.
@@ -268,7 +467,7 @@ class ProcesadorXLSX:
                 csv_path = archivo_path.parent / csv_filename
                 
                 # Guardar CSV del lote
-                print(f" Guardando lote {i+1}/{num_archivos}: {csv_filename}")
+                print(f" Guardando lote {i+1}: {csv_filename}")
                 df_lote.to_csv(csv_path, index=False, encoding='utf-8')
                 
                 # Verificar archivo generado
@@ -283,15 +482,14 @@ class ProcesadorXLSX:
                 del df_lote
                 gc.collect()
             
-            # Liberar memoria del DataFrame principal
-            del df
-            gc.collect()
-            
             # Resumen final
             print(f"\n DIVISIÓN COMPLETADA:")
             print(f"    Archivos generados: {len(archivos_generados)}")
+            print(f"    Registros por archivo: {registros_por_archivo}")
             print(f"    Total registros procesados: {total_registros}")
             print(f"    Ubicación: {archivo_path.parent}")
+            print(f"    Formatos de fecha:")
+            self._mostrar_contadores_fechas()
             
             # Mostrar lista de archivos generados
             print(f"\n ARCHIVOS GENERADOS:")
@@ -306,6 +504,113 @@ class ProcesadorXLSX:
             print(f" Error procesando archivo Excel: {e}")
             return None
     
+    def procesar_xlsx_a_manifiesto(self, archivo_xlsx=None, registros_por_particion=None):
+        """Procesa archivo Excel a un solo CSV normalizado con particiones virtuales
+
+        En lugar de escribir un CSV por cada `registros_por_particion` filas, escribe
+        un único CSV y un manifiesto JSON con el rango de filas y el offset en bytes
+        de cada partición. El generador salta directamente a la partición pedida
+        (leer_particion) o recorre todas en el mismo proceso.
+        """
+        if registros_por_particion is None:
+            registros_por_particion = REGISTROS_POR_ARCHIVO
+            
+        print(" PROCESADOR DE ARCHIVOS EXCEL A CSV CON MANIFIESTO DE PARTICIONES")
+        print("=" * 60)
+        print(f" Particiones virtuales de {registros_por_particion} registros cada una")
+        
+        # Seleccionar archivo Excel si no se proporciona
+        if archivo_xlsx is None:
+            archivo_xlsx = self.seleccionar_archivo_excel()
+            if not archivo_xlsx:
+                print(" No se seleccionó archivo Excel")
+                return None
+        
+        archivo_path = Path(archivo_xlsx)
+        if not archivo_path.exists():
+            print(f" Archivo no encontrado: {archivo_path}")
+            return None
+        
+        try:
+            print(f" Leyendo archivo Excel por bloques: {archivo_path.name}")
+            self.contadores_fechas = {}
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            csv_path = archivo_path.parent / f"{archivo_path.stem}_{timestamp}.csv"
+            manifiesto_path = archivo_path.parent / f"{archivo_path.stem}_{timestamp}_manifiesto.json"
+            
+            # Bloques de lectura múltiplos del tamaño de partición: ninguna partición
+            # queda repartida entre dos bloques
+            tamano_bloque = registros_por_particion * max(1, TAMANO_BLOQUE_LECTURA // registros_por_particion)
+            particiones = []
+            columnas = []
+            total_registros = 0
+            with open(csv_path, 'wb') as f:
+                for i, df in enumerate(iterar_xlsx_por_bloques(archivo_path, tamano_bloque)):
+                    # Validar columnas requeridas (el encabezado es el mismo en todos los bloques)
+                    if i == 0:
+                        if not self._validar_columnas_requeridas(df):
+                            print("\n SOLUCIÓN:")
+                            print("   1. Verificar que el archivo Excel tenga las columnas requeridas")
+                            print("   2. Usar nombres de columnas exactos: GENERO, PRIMER_NOMBRE, etc.")
+                            f.close()
+                            csv_path.unlink()
+                            return None
+                        columnas = [str(c) for c in df.columns]
+                        f.write(df.iloc[:0].to_csv(index=False).encode('utf-8'))
+                    if df.empty:
+                        continue
+                    
+                    df = self._limpiar_datos(df)
+                    for inicio in range(0, len(df), registros_por_particion):
+                        parte = df.iloc[inicio:inicio + registros_por_particion]
+                        offset = f.tell()
+                        f.write(parte.to_csv(index=False, header=False).encode('utf-8'))
+                        particiones.append({
+                            'numero': len(particiones) + 1,
+                            'fila_inicio': total_registros,
+                            'fila_fin': total_registros + len(parte),
+                            'offset': offset,
+                            'bytes': f.tell() - offset,
+                        })
+                        total_registros += len(parte)
+                    print(f"    Bloque {i+1}: {total_registros} registros, {len(particiones)} particiones")
+                    
+                    # Liberar memoria del bloque
+                    del df
+                    gc.collect()
+            
+            manifiesto = {
+                'version': VERSION_MANIFIESTO,
+                'origen': archivo_path.name,
+                'archivo_csv': csv_path.name,
+                'bytes_csv': csv_path.stat().st_size,
+                'columnas': columnas,
+                'total_registros': total_registros,
+                'registros_por_particion': registros_por_particion,
+                'creado': timestamp,
+                'particiones': particiones,
+            }
+            with open(manifiesto_path, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+            
+            # Resumen final
+            file_size = csv_path.stat().st_size / 1024  # KB
+            print(f"\n MANIFIESTO GENERADO:")
+            print(f"    CSV normalizado: {csv_path.name} ({file_size:.1f} KB)")
+            print(f"    Manifiesto: {manifiesto_path.name}")
+            print(f"    Particiones: {len(particiones)} de {registros_por_particion} registros")
+            print(f"    Total registros procesados: {total_registros}")
+            print(f"    Ubicación: {archivo_path.parent}")
+            print(f"    Formatos de fecha:")
+            self._mostrar_contadores_fechas()
+            
+            return str(manifiesto_path)
+                
+        except Exception as e:
+            print(f" Error procesando archivo Excel: {e}")
+            return None
+    
     def procesar_xlsx_a_csv(self, archivo_xlsx=None):
         """Procesa archivo Excel y lo convierte a CSV optimizado (método original)"""
         print(" PROCESADOR DE ARCHIVOS EXCEL A CSV")
@@ -324,44 +629,44 @@ class ProcesadorXLSX:
             return None
         
         try:
-            print(f" Cargando archivo Excel: {archivo_path.name}")
-            
-            # Cargar Excel con dtype=str para evitar cambios de formato
-            df = pd.read_excel(archivo_path, dtype=str, keep_default_na=False)
-            print(f" Datos cargados: {len(df)} registros")
-            
-            # Validar columnas requeridas
-            if not self._validar_columnas_requeridas(df):
-                print("\n SOLUCIÓN:")
-                print("   1. Verificar que el archivo Excel tenga las columnas requeridas")
-                print("   2. Usar nombres de columnas exactos: GENERO, PRIMER_NOMBRE, etc.")
-                return None
-            
-            # Limpiar datos
-            print(" Limpiando y normalizando datos...")
-            df = self._limpiar_datos(df)
+            print(f" Leyendo archivo Excel por bloques: {archivo_path.name}")
             
             # Generar nombre de archivo CSV con timestamp en la misma carpeta del XLSX
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             csv_filename = f"{archivo_path.stem}_{timestamp}.csv"
             csv_path = archivo_path.parent / csv_filename
             
-            # Guardar CSV optimizado
+            # Limpiar y anexar cada bloque al CSV en cuanto se lee (memoria acotada)
             print(f" Guardando CSV optimizado: {csv_filename}")
-            df.to_csv(csv_path, index=False, encoding='utf-8')
+            self.contadores_fechas = {}
+            total_registros = 0
+            for i, df in enumerate(iterar_xlsx_por_bloques(archivo_path)):
+                # Validar columnas requeridas (el encabezado es el mismo en todos los bloques)
+                if i == 0 and not self._validar_columnas_requeridas(df):
+                    print("\n SOLUCIÓN:")
+                    print("   1. Verificar que el archivo Excel tenga las columnas requeridas")
+                    print("   2. Usar nombres de columnas exactos: GENERO, PRIMER_NOMBRE, etc.")
+                    return None
+                
+                df = self._limpiar_datos(df)
+                df.to_csv(csv_path, index=False, encoding='utf-8', mode='w' if i == 0 else 'a', header=(i == 0))
+                total_registros += len(df)
+                print(f"    Bloque {i+1}: {total_registros} registros escritos")
+                
+                # Liberar memoria del bloque
+                del df
+                gc.collect()
             
             # Verificar archivo generado
             if csv_path.exists():
                 file_size = csv_path.stat().st_size / 1024  # KB
                 print(f" CSV generado exitosamente:")
                 print(f"    Archivo: {csv_filename}")
-                print(f"    Registros: {len(df)}")
+                print(f"    Registros: {total_registros}")
                 print(f"    Tamaño: {file_size:.1f} KB")
                 print(f"    Ubicación: {csv_path}")
-                
-                # Liberar memoria
-                del df
-                gc.collect()
+                print(f"    Formatos de fecha:")
+                self._mostrar_contadores_fechas()
                 
                 return str(csv_path)
             else:
@@ -391,8 +696,10 @@ class ProcesadorXLSX:
         print("   • Modificar variables globales en el código:")
         print("     - REGISTROS_POR_ARCHIVO = 50  # Número de registros por archivo")
         print("     - MODO_DIVISION = True        # Activar/desactivar división")
+        print("     - MODO_MANIFIESTO = True      # Particiones virtuales en lugar de archivos")
         print("\n RESULTADO:")
-        print("   • Modo división: Genera múltiples CSV con terminación 001, 002, 003...")
+        print("   • Modo división con manifiesto: un CSV + _manifiesto.json con las particiones")
+        print("   • Modo división sin manifiesto: múltiples CSV con terminación 001, 002, 003...")
         print("   • CSV listo para usar con generador_pasaportes_masivo.py")
 
 def main():
@@ -416,17 +723,36 @@ def main():
     print(f"️ CONFIGURACIÓN ACTUAL:")
     print(f"   • Registros por archivo: {REGISTROS_POR_ARCHIVO}")
     print(f"   • Modo división: {'Activado' if MODO_DIVISION else 'Desactivado'}")
+    print(f"   • Particiones virtuales (manifiesto): {'Sí' if MODO_MANIFIESTO else 'No'}")
     print()
     
     # Procesar archivo según configuración global
-    if MODO_DIVISION:
+    if MODO_DIVISION and MODO_MANIFIESTO:
+        manifiesto_path = procesador.procesar_xlsx_a_manifiesto(args.archivo)
+        
+        if manifiesto_path:
+            total = len(cargar_manifiesto(manifiesto_path)['particiones'])
+            print(f"\n ¡DIVISIÓN COMPLETADA!")
+            print(f" Particiones: {total}")
+            print(f" Procesar todas en un solo proceso:")
+            print(f"   python3 generador_pasaportes_masivo.py --manifiesto {manifiesto_path}")
+            print(f" O una partición concreta (1-{total}):")
+            print(f"   python3 generador_pasaportes_masivo.py --manifiesto {manifiesto_path} --particion 1")
+        else:
+            print("\n Error en la división del archivo Excel")
+            sys.exit(1)
+    elif MODO_DIVISION:
         # Modo división automático
         archivos_generados = procesador.procesar_xlsx_a_csv_dividido(args.archivo)
         
         if archivos_generados:
             print(f"\n ¡DIVISIÓN COMPLETADA!")
             print(f" Archivos generados: {len(archivos_generados)}")
-            print(f" Ahora puedes procesar cada archivo por separado:")
+            carpeta = Path(archivos_generados[0]).parent
+            patron = carpeta / (Path(archivos_generados[0]).stem[:-3] + '*.csv')
+            print(f" Procesar todos en un solo proceso:")
+            print(f"   python3 generador_pasaportes_masivo.py --lote '{patron}'")
+            print(f" O cada archivo por separado:")
             for i, archivo in enumerate(archivos_generados, 1):
                 print(f"   python3 generador_pasaportes_masivo.py --archivo-csv {archivo}")
         else: